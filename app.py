@@ -2,9 +2,11 @@ from flask import request
 from werkzeug.exceptions import HTTPException
 from libs.config import config
 from libs.response import Response
-from services.app import app, logger
+from services.app import app, cache, logger
 from services.author import authorservice as authors
 from services.book import bookservice as books
+from services.search import searchservice as search
+from services.warmup import init_warmup
 
 
 # author API routes
@@ -16,6 +18,22 @@ def list_authors():
 def post_author():
   return authors.add_new_author(request)
 
+@app.route("/api/v1/authors:batch", methods=["POST"])
+def post_authors():
+  return authors.add_new_authors(request)
+
+@app.route("/api/v1/authors:import", methods=["POST"])
+def import_authors():
+  return authors.import_authors_from_request(request)
+
+@app.route("/api/v1/authors/export", methods=["GET"])
+def export_authors():
+  return authors.export_authors(request)
+
+@app.route("/api/v1/authors/search", methods=["GET"])
+def search_authors():
+  return search.search_authors(request)
+
 @app.route("/api/v1/authors/<int:id>", methods=["GET"])
 def get_author(id):
   return authors.get_author(request, id)
@@ -41,6 +59,22 @@ def list_books():
 def post_book():
   return books.add_new_book(request)
 
+@app.route("/api/v1/books:batch", methods=["POST"])
+def post_books():
+  return books.add_new_books(request)
+
+@app.route("/api/v1/books:import", methods=["POST"])
+def import_books():
+  return books.import_books_from_request(request)
+
+@app.route("/api/v1/books/export", methods=["GET"])
+def export_books():
+  return books.export_books(request)
+
+@app.route("/api/v1/books/search", methods=["GET"])
+def search_books():
+  return search.search_books(request)
+
 @app.route("/api/v1/books/<int:id>", methods=["GET"])
 def get_book(id):
   return books.get_book(request, id)
@@ -58,6 +92,10 @@ def delete_book(id):
 def ping():
   return "PONG"
 
+@app.route("/admin/cache", methods=["GET"])
+def cache_stats():
+  return Response.success(cache.stats()).resp()
+
 @app.errorhandler(HTTPException)
 def handle_exception(e):
   if ((request.method == "POST") or (request.method == "PUT")):
@@ -70,6 +108,8 @@ def handle_exception(e):
 
   return Response.error(e.code, e.description).resp()
 
+init_warmup()
+
 
 if __name__ == '__main__':
   app.run(host='0.0.0.0', port=config.app_port)
@@ -0,0 +1,51 @@
+"""Rows per second created by POST /api/v1/books one at a time vs POST /api/v1/books:batch"""
+
+import json
+import time
+from bench.seed import app, seed
+from libs.bulk import MAX_BATCH_SIZE
+import app as routes  # pylint: disable=unused-import
+
+
+AUTHORS = 100
+ROWS = 2000
+
+
+def items(count):
+    return [{
+        "author_id":    i % AUTHORS + 1,
+        "title":        f"New title {i}",
+        "description":  f"Description of new book {i}",
+        "publish_date": "2001-02-03",
+    } for i in range(count)]
+
+
+def post(client, url, body):
+    resp = client.post(url, data=json.dumps(body), content_type="application/json")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return json.loads(resp.get_data())
+
+
+def main():
+    with app.app_context():
+        client = app.test_client()
+        print(f"{ROWS} books")
+        print(f"{'endpoint':<24}{'rows/s':>12}")
+
+        seed(AUTHORS, 0)
+        start = time.perf_counter()
+        for item in items(ROWS):
+            post(client, "/api/v1/books", item)
+        print(f"{'POST /books':<24}{ROWS / (time.perf_counter() - start):>12.0f}")
+
+        seed(AUTHORS, 0)
+        batch = items(ROWS)
+        start = time.perf_counter()
+        for i in range(0, ROWS, MAX_BATCH_SIZE):
+            body = post(client, "/api/v1/books:batch", batch[i : i + MAX_BATCH_SIZE])
+            assert not body["data"]["errors"], body["data"]["errors"]
+        print(f"{'POST /books:batch':<24}{ROWS / (time.perf_counter() - start):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
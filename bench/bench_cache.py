@@ -0,0 +1,63 @@
+"""Compare hit rate and get() latency of cache eviction policies on a skewed workload"""
+
+import random
+import time
+from itertools import accumulate
+from libs.cache import Cache
+from libs.eviction import POLICIES
+
+
+MAX_KEYS = 2000
+CLEANUP_SIZE = 800
+UNIVERSE = 50000
+OPERATIONS = 300000
+ZIPF_S = 0.9
+
+
+def zipf_workload(universe, operations, s, seed=1):
+    rnd = random.Random(seed)
+    cum_weights = list(accumulate(1.0 / (rank ** s) for rank in range(1, universe + 1)))
+    keys = [f"book[{i}]" for i in range(universe)]
+    rnd.shuffle(keys)
+    return rnd.choices(keys, cum_weights=cum_weights, k=operations)
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run(policy, workload):
+    cache = Cache(MAX_KEYS, CLEANUP_SIZE, policy=policy)
+    misses = 0
+    latencies = []
+
+    def onmiss(k):
+        nonlocal misses
+        misses += 1
+        return k
+
+    for key in workload:
+        start = time.perf_counter_ns()
+        cache.get(key, onmiss)
+        latencies.append(time.perf_counter_ns() - start)
+
+    latencies.sort()
+    return {
+        "hit_rate":   1 - misses / len(workload),
+        "p50_us":     percentile(latencies, 50) / 1000,
+        "p99_us":     percentile(latencies, 99) / 1000,
+        "max_us":     latencies[-1] / 1000,
+    }
+
+
+def main():
+    workload = zipf_workload(UNIVERSE, OPERATIONS, ZIPF_S)
+    print(f"zipf s={ZIPF_S}, {UNIVERSE} keys, {OPERATIONS} gets, cache {MAX_KEYS}/{CLEANUP_SIZE}")
+    print(f"{'policy':<12}{'hit rate':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+    for name in POLICIES:
+        r = run(name, workload)
+        print(f"{name:<12}{r['hit_rate']:>10.3f}{r['p50_us']:>10.2f}{r['p99_us']:>10.2f}{r['max_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""CPU vs bandwidth of compressing the GET /api/v1/books body, by catalog size and encoding"""
+
+import time
+from sqlalchemy_serializer import serialize_collection as sc
+from bench.seed import app, seed, Book
+from libs.compression import ENCODINGS, compress
+from libs.response import Response
+
+
+SIZES = (100, 1000, 10000)
+RUNS = 5
+# time to send one byte over a 100 Mbit/s link, in milliseconds
+MS_PER_BYTE = 8 / 100e6 * 1000
+
+
+def best_ms(fn):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'books':>8}{'encoding':>10}{'KiB':>10}{'ratio':>8}{'compress ms':>13}{'send ms':>9}")
+    with app.app_context():
+        for size in SIZES:
+            seed(size // 10, 10)
+            body = Response.success(sc(Book.query.all())).encode()
+            print(f"{size:>8}{'identity':>10}{len(body) / 1024:>10.1f}{1:>8.2f}{0:>13.2f}"
+                  f"{len(body) * MS_PER_BYTE:>9.2f}")
+            for encoding in ENCODINGS:
+                data = compress(body, encoding)
+                ms = best_ms(lambda: compress(body, encoding))
+                print(f"{size:>8}{encoding:>10}{len(data) / 1024:>10.1f}{len(body) / len(data):>8.2f}"
+                      f"{ms:>13.2f}{len(data) * MS_PER_BYTE:>9.2f}")
+    print("compressed bodies are cached, so the compress time is paid once per list version, not per hit")
+
+
+if __name__ == "__main__":
+    main()
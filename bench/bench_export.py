@@ -0,0 +1,53 @@
+"""Rows per second and peak memory of GET /api/v1/books vs GET /api/v1/books/export"""
+
+import time
+import tracemalloc
+from bench.seed import app, seed
+from services.app import cache
+import app as routes  # pylint: disable=unused-import
+
+
+AUTHORS = 500
+BOOKS_PER_AUTHOR = 200
+
+
+def read(client, url):
+    """Read the whole body a chunk at a time, as a client would"""
+    resp = client.get(url, buffered=False)
+    for _ in resp.response:
+        pass
+    resp.close()
+
+
+def measure(client, url):
+    """Seconds to read the whole body, and peak traced MiB in another run (tracing slows it down)"""
+    start = time.perf_counter()
+    read(client, url)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    read(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    with app.app_context():
+        seed(AUTHORS, BOOKS_PER_AUTHOR)
+        cache.disable()
+        client = app.test_client()
+        rows = AUTHORS * BOOKS_PER_AUTHOR
+        print(f"{rows} books")
+        print(f"{'endpoint':<28}{'rows/s':>12}{'peak MiB':>10}")
+        for name, url in [
+            ("books", "/api/v1/books"),
+            ("books?stream=1", "/api/v1/books?stream=1"),
+            ("books/export (ndjson)", "/api/v1/books/export"),
+            ("books/export (csv)", "/api/v1/books/export?format=csv"),
+        ]:
+            elapsed, peak = measure(client, url)
+            print(f"{name:<28}{rows / elapsed:>12.0f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Time and body size of GET /api/v1/books: all fields vs ?fields=id,title"""
+
+import time
+from bench.seed import app, seed
+from services.app import cache
+import app as routes  # pylint: disable=unused-import
+
+
+AUTHORS = 200
+BOOKS_PER_AUTHOR = 50
+RUNS = 3
+
+
+def measure(client, url):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        body = client.get(url).get_data()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body) / 1024
+
+
+def main():
+    with app.app_context():
+        seed(AUTHORS, BOOKS_PER_AUTHOR)
+        cache.disable()
+        client = app.test_client()
+        print(f"{AUTHORS * BOOKS_PER_AUTHOR} books")
+        print(f"{'fields':<16}{'ms':>10}{'body KiB':>10}")
+        for name, url in [("all", "/api/v1/books"), ("id,title", "/api/v1/books?fields=id,title")]:
+            ms, kib = measure(client, url)
+            print(f"{name:<16}{ms:>10.1f}{kib:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
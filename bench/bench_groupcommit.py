@@ -0,0 +1,77 @@
+"""Writes per second of concurrent callers committing one at a time vs with group commit,
+on a file database so that every commit is synced to disk"""
+
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from libs.groupcommit import GroupCommit
+from models.authors import Author
+from models.books import Book  # pylint: disable=unused-import
+from services.app import db
+
+
+THREADS = 16
+WRITES = 100
+
+
+def add(i):
+    def write(session):
+        session.add(Author(f"Author {i}", f"Bio of author {i}", None))
+    return write
+
+
+def per_request(engine):
+    def call(i):
+        with Session(engine) as session:
+            add(i)(session)
+            session.commit()
+    return call, lambda: None
+
+
+def grouped(engine, max_delay):
+    group = GroupCommit(lambda: Session(engine, expire_on_commit=False), max_delay=max_delay)
+    return lambda i: group.run(add(i)), group.close
+
+
+def measure(path, mode):
+    if os.path.exists(path):
+        os.remove(path)
+    # a connection, i.e. one committer at a time, per thread
+    engine = create_engine("sqlite:///" + path, connect_args={"timeout": 60}, pool_size=THREADS)
+    db.metadata.create_all(engine)
+    call, close = mode(engine)
+
+    def work(t):
+        for i in range(WRITES):
+            call(t * WRITES + i)
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    close()
+    with Session(engine) as session:
+        assert session.query(Author).count() == THREADS * WRITES
+    engine.dispose()
+    return THREADS * WRITES / elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "bench.db")
+        print(f"{THREADS} threads x {WRITES} writes")
+        print(f"{'mode':<24}{'writes/s':>12}")
+        print(f"{'per request commit':<24}{measure(path, per_request):>12.0f}")
+        for ms in (0, 2, 5):
+            rate = measure(path, lambda engine: grouped(engine, ms / 1000))
+            print(f"{f'group commit {ms} ms':<24}{rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Queries and rows read per operation: books eagerly joined into every author
+(the previous lazy='joined') vs the per-endpoint loading strategies"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from bench.seed import app, db, seed, Author
+
+
+AUTHORS = 200
+BOOKS_PER_AUTHOR = 20
+
+
+class QueryCounter:
+    """Count statements run inside the block, and the rows they return"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.__record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.__record)
+
+    def rows(self):
+        with self.engine.connect() as conn:
+            return sum(len(conn.exec_driver_sql(s, p).all()) for s, p in self.statements)
+
+
+def operations(joined):
+    """(name, fn) of the reads done by the endpoints, with books joined or not"""
+    authors = Author.query.options(joinedload(Author.books)) if joined else Author.query
+    with_books = Author.query.options(joinedload(Author.books) if joined else selectinload(Author.books))
+    return [
+        ("GET /authors",                lambda: [a.to_dict() for a in authors.all()]),
+        ("GET /authors/<id>",           lambda: authors.get(7).to_dict()),
+        ("POST /books author check",    lambda: authors.get(7) is not None),
+        ("GET /authors/<id>/books",     lambda: [b.to_dict() for b in with_books.get(7).books]),
+        ("GET /authors?include=books",  lambda: [sc_books(a) for a in with_books.all()]),
+    ]
+
+
+def sc_books(author):
+    return {**author.to_dict(), "books": [b.to_dict() for b in author.books]}
+
+
+def main():
+    with app.app_context():
+        seed(AUTHORS, BOOKS_PER_AUTHOR)
+        print(f"{AUTHORS} authors, {AUTHORS * BOOKS_PER_AUTHOR} books")
+        print(f"{'operation':<30}{'joined q':>10}{'joined rows':>13}{'now q':>8}{'now rows':>10}")
+        results = {}
+        for joined in (True, False):
+            for name, fn in operations(joined):
+                db.session.expunge_all()
+                with QueryCounter(db.engine) as counter:
+                    fn()
+                results.setdefault(name, []).extend([len(counter.statements), counter.rows()])
+        for name, (jq, jr, nq, nr) in results.items():
+            print(f"{name:<30}{jq:>10}{jr:>13}{nq:>8}{nr:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time to encode response envelopes: the former json.dumps(OrderedDict) body vs
+Response.encode() with orjson and with the json module"""
+
+import json
+import time
+from collections import OrderedDict
+from libs import response
+from libs.response import Response
+
+
+RUNS = 5
+LIST_ROWS = 10000
+
+
+def legacy_body(resp):
+    """The body as it was built before the pre-encoded envelope"""
+    resp_dict = {
+        "meta": {"status": "success" if resp.code == 200 else "error", "message": resp.message},
+        "data": resp.data,
+    }
+    if resp.meta:
+        resp_dict["meta"].update(resp.meta)
+    return json.dumps(OrderedDict(resp_dict)).encode()
+
+
+def measure(encode, resp, repeat):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            encode(resp)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / repeat * 1e6
+
+
+def main():
+    rows = [{"id": i, "author_id": i % 100, "title": f"Title {i}", "description": f"Description of book {i}",
+        "publish_date": "2000-01-01 00:00:00"} for i in range(LIST_ROWS)]
+    cases = [
+        ("success", Response.success({"id": 1, "name": "someone"}), 20000),
+        ("error", Response.not_found("Author with id 1 not found"), 20000),
+        (f"list of {LIST_ROWS}", Response.success(rows, {"next_cursor": None}), 20),
+    ]
+    encoders = [("json.dumps(OrderedDict)", legacy_body)]
+    if response.orjson is not None:
+        encoders.append(("encode() orjson", lambda resp: resp.encode()))
+
+    def encode_stdlib(resp):
+        response.use_json_encoder(response.stdlib_dumps)
+        try:
+            return resp.encode()
+        finally:
+            response.use_json_encoder(default)
+
+    default = response.json_dumps
+    encoders.append(("encode() json", encode_stdlib))
+
+    print(f"{'case':<16}{'encoder':<26}{'us/response':>14}")
+    for name, resp, repeat in cases:
+        for encoder_name, encode in encoders:
+            print(f"{name:<16}{encoder_name:<26}{measure(encode, resp, repeat):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Per-hit CPU time of GET /api/v1/books: cached ORM objects vs cached response bodies"""
+
+import time
+from flask import request
+from sqlalchemy_serializer import serialize_collection as sc
+from bench.seed import app, seed, Book
+from libs.response import Response
+from services.app import cache
+from services.book import bookservice
+
+
+SIZES = (100, 1000, 10000)
+ORM_HITS = 5
+BODY_HITS = 1000
+
+
+def per_hit_us(fn, hits):
+    start = time.process_time()
+    for _ in range(hits):
+        fn()
+    return (time.process_time() - start) / hits * 1e6
+
+
+def main():
+    print(f"{'books':>8}{'orm hit us':>14}{'body hit us':>14}{'speedup':>10}")
+    with app.test_request_context("/api/v1/books"):
+        for size in SIZES:
+            seed(size // 10, 10)
+            cache.delete("book[]")
+            books = Book.query.all()
+
+            # previous behavior: cache hit returns ORM objects, serialized on every request
+            orm_us = per_hit_us(lambda: Response.success(sc(books)).resp(), ORM_HITS)
+
+            bookservice.list_books(request)
+            body_us = per_hit_us(lambda: bookservice.list_books(request), BODY_HITS)
+            print(f"{size:>8}{orm_us:>14.1f}{body_us:>14.1f}{orm_us / body_us:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
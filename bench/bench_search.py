@@ -0,0 +1,60 @@
+"""Query latency of the in-memory search index vs LIKE '%term%' scans, by corpus size"""
+
+import random
+import time
+from bench.seed import app, db, Book
+from libs.search import SearchIndex
+
+
+SIZES = (1000, 10000, 100000)
+QUERIES = 200
+VOCABULARY = [f"word{i}" for i in range(20000)]
+
+
+def documents(count, rnd):
+    # zipf-like word frequencies, like natural text
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for doc_id in range(1, count + 1):
+        words = rnd.choices(VOCABULARY, weights=weights, k=40)
+        yield doc_id, {"title": " ".join(words[:5]), "description": " ".join(words[5:])}
+
+
+def per_query_ms(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    rnd = random.Random(1)
+    queries = [" ".join(rnd.choices(VOCABULARY[:2000], k=2)) for _ in range(QUERIES)]
+    print(f"{'docs':>8}{'build s':>10}{'index ms':>10}{'like ms':>10}")
+    with app.app_context():
+        for size in SIZES:
+            docs = list(documents(size, rnd))
+            index = SearchIndex({"title": 3.0, "description": 1.0})
+            start = time.perf_counter()
+            index.rebuild(docs)
+            build_s = time.perf_counter() - start
+            index_ms = per_query_ms(lambda q: index.search(q, 20), queries)
+
+            db.drop_all()
+            db.create_all()
+            db.session.execute(db.insert(Book), [
+                {"author_id": 1, "title": doc["title"], "description": doc["description"]}
+                for _, doc in docs
+            ])
+            db.session.commit()
+
+            def like(query):
+                conds = [Book.title.like(f"%{w}%") | Book.description.like(f"%{w}%") for w in query.split()]
+                # every match has to be read to rank them
+                return Book.query.filter(db.or_(*conds)).all()
+
+            like_ms = per_query_ms(like, queries[:20])
+            print(f"{size:>8}{build_s:>10.2f}{index_ms:>10.2f}{like_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
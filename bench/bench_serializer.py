@@ -0,0 +1,47 @@
+"""Rows per second serialized by SerializerMixin.to_dict() vs the compiled serializer"""
+
+import datetime
+import time
+from bench.seed import app
+from libs.serializer import serializer
+from models.books import Book
+
+
+ROWS = 20000
+RUNS = 3
+
+
+def measure(serialize, rows):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for row in rows:
+            serialize(row)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(rows) / best
+
+
+def main():
+    with app.app_context():
+        books = []
+        for i in range(ROWS):
+            book = Book(i % 100 + 1, f"Title {i}", f"Description of book {i}",
+                datetime.datetime(2000, 1, 1) + datetime.timedelta(hours=i))
+            book.id = i + 1
+            books.append(book)
+        rows = [(b.id, b.author_id, b.title, b.description, b.publish_date) for b in books]
+
+        compiled = serializer(Book)
+        print(f"{ROWS} books")
+        print(f"{'serializer':<24}{'rows/s':>12}")
+        for name, serialize, items in [
+            ("to_dict", lambda book: book.to_dict(), books),
+            ("compiled (objects)", compiled, books),
+            ("compiled (tuples)", compiled.from_tuple, rows),
+        ]:
+            print(f"{name:<24}{measure(serialize, items):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
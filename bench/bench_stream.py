@@ -0,0 +1,42 @@
+"""Time to first byte, total time and peak memory of GET /api/v1/books: whole list vs ?stream=1"""
+
+import time
+import tracemalloc
+from bench.seed import app, seed
+from services.app import cache
+import app as routes  # pylint: disable=unused-import
+
+
+AUTHORS = 200
+BOOKS_PER_AUTHOR = 50
+
+
+def measure(client, url):
+    tracemalloc.start()
+    start = time.perf_counter()
+    resp = client.get(url)
+    first_byte, size = None, 0
+    for chunk in resp.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    resp.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte * 1000, total * 1000, peak / 2**20, size / 2**20
+
+
+def main():
+    with app.app_context():
+        seed(AUTHORS, BOOKS_PER_AUTHOR)
+        cache.disable()
+        client = app.test_client()
+        print(f"{AUTHORS * BOOKS_PER_AUTHOR} books")
+        print(f"{'mode':<8}{'ttfb ms':>10}{'total ms':>10}{'peak MiB':>10}{'body MiB':>10}")
+        for mode, url in [("whole", "/api/v1/books"), ("stream", "/api/v1/books?stream=1")]:
+            print(f"{mode:<8}" + "".join(f"{v:>10.1f}" for v in measure(client, url)))
+
+
+if __name__ == "__main__":
+    main()
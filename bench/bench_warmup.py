@@ -0,0 +1,91 @@
+"""Hit rate over time after a restart: cold cache vs cache preloaded from a snapshot"""
+
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+from unittest import mock
+from flask import request
+from bench.seed import app, seed
+from libs.cache import Cache
+from libs.snapshot import load_snapshot, save_snapshot
+from services.author import authorservice
+from services.book import bookservice
+from services.warmup import refetch
+
+
+AUTHORS = 200
+BOOKS_PER_AUTHOR = 20
+REQUESTS = 20000
+WINDOW = 1000
+SNAPSHOT_KEYS = 1000
+
+
+def workload(seed_val=1):
+    rnd = random.Random(seed_val)
+    requests = [("book", i) for i in range(1, AUTHORS * BOOKS_PER_AUTHOR + 1)]
+    requests += [("author", i) for i in range(1, AUTHORS + 1)]
+    requests += [("books_from", i) for i in range(1, AUTHORS + 1)]
+    rnd.shuffle(requests)
+    cum_weights = list(accumulate(1.0 / (rank ** 0.9) for rank in range(1, len(requests) + 1)))
+    return rnd.choices(requests, cum_weights=cum_weights, k=REQUESTS)
+
+
+def serve(requests, cache):
+    """Hit rate per window of requests"""
+    handlers = {
+        "book":         lambda id: bookservice.get_book(request, id),
+        "author":       lambda id: authorservice.get_author(request, id),
+        "books_from":   lambda id: authorservice.list_book_from_author(request, id),
+    }
+    rates = []
+    with mock.patch("services.author.cache", cache), mock.patch("services.book.cache", cache):
+        for i in range(0, len(requests), WINDOW):
+            before = cache.stats()
+            for kind, id in requests[i : i + WINDOW]:
+                handlers[kind](id)
+            after = cache.stats()
+            hits = after.get("hits", 0) - before.get("hits", 0)
+            misses = after.get("misses", 0) - before.get("misses", 0)
+            rates.append(hits / (hits + misses))
+    return rates
+
+
+def steady_after(rates):
+    target = 0.95 * rates[-1]
+    return next(i for i, r in enumerate(rates) if r >= target) * WINDOW
+
+
+def new_cache():
+    return Cache(2000, 800, policy="wtinylfu")
+
+
+def main():
+    requests = workload()
+    with app.test_request_context(), tempfile.TemporaryDirectory() as tmpdir:
+        seed(AUTHORS, BOOKS_PER_AUTHOR)
+        path = os.path.join(tmpdir, "cache.snapshot")
+
+        previous = new_cache()
+        serve(requests, previous)
+        save_snapshot(previous, path, SNAPSHOT_KEYS)
+
+        cold = serve(requests, new_cache())
+
+        warm_cache = new_cache()
+        start = time.perf_counter()
+        loaded = load_snapshot(warm_cache, path, refetch)
+        preload_ms = (time.perf_counter() - start) * 1000
+        warm = serve(requests, warm_cache)
+
+    print(f"snapshot: {loaded} keys refetched in {preload_ms:.0f} ms")
+    print(f"{'requests':>10}{'cold':>8}{'warm':>8}")
+    for i, (c, w) in enumerate(zip(cold, warm)):
+        print(f"{(i + 1) * WINDOW:>10}{c:>8.3f}{w:>8.3f}")
+    print(f"steady state (95% of final hit rate) after: cold {steady_after(cold)} requests, "
+          f"warm {steady_after(warm)} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Seed an in-memory SQLite database for benchmarks"""
+
+import datetime
+import os
+
+# benchmarks never touch the configured database
+os.environ["DB_URL"] = "sqlite://"
+
+# pylint: disable=wrong-import-position
+from services.app import app, db
+from models.authors import Author
+from models.books import Book
+
+
+def seed(authors, books_per_author):
+    """Create the schema and insert `authors` authors with `books_per_author` books each"""
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(Author), [
+        {
+            "name":         f"Author {i}",
+            "bio":          f"Bio of author {i}",
+            "birth_date":   datetime.datetime(1950, 1, 1) + datetime.timedelta(days=i),
+        }
+        for i in range(authors)
+    ])
+    if books_per_author:
+        db.session.execute(db.insert(Book), [
+            {
+                "author_id":    a + 1,
+                "title":        f"Title {a}-{b}",
+                "description":  f"Description of book {b} by author {a} " * 3,
+                "publish_date": datetime.datetime(2000, 1, 1) + datetime.timedelta(days=b),
+            }
+            for a in range(authors) for b in range(books_per_author)
+        ])
+    db.session.commit()
+
+
+__all__ = ["app", "db", "seed", "Author", "Book"]
@@ -0,0 +1,46 @@
+from sqlalchemy import insert
+
+
+# items accepted by one batch request
+MAX_BATCH_SIZE = 1000
+# rows inserted per transaction
+CHUNK_SIZE = 500
+
+
+def parse_batch(body, max_size=MAX_BATCH_SIZE):
+    """Items of a batch request body, a JSON list, or ValueError"""
+    if not isinstance(body, list):
+        return ValueError("Body must be a JSON list")
+    if not body:
+        return ValueError("Batch cannot be empty")
+    if len(body) > max_size:
+        return ValueError(f"Batch too large, max {max_size} items")
+    return body
+
+
+def chunks(items, size=CHUNK_SIZE):
+    """Consecutive slices of at most `size` items of the list `items`"""
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def bulk_insert(session, model, objs, columns):
+    """Insert the new `model` instances `objs` with a single executemany of `columns` and
+    set their ids. Backends that cannot return the ids of an executemany in parameter
+    order (e.g. MySQL) fall back to the ORM flush, one INSERT per row. Either way `objs`
+    are left out of the session, so the commit does not expire the values just written"""
+    if not objs:
+        return
+    dialect = session.get_bind().dialect
+    if not dialect.insert_executemany_returning_sort_by_parameter_order:
+        session.add_all(objs)
+        session.flush()
+        for obj in objs:
+            session.expunge(obj)
+        return
+
+    rows = [{column: getattr(obj, column) for column in columns} for obj in objs]
+    stmt = insert(model.__table__).returning(model.__table__.c.id, sort_by_parameter_order=True)
+    ids = session.execute(stmt, rows).scalars().all()
+    for obj, id in zip(objs, ids):
+        obj.id = id
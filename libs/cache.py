@@ -1,28 +1,347 @@
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from libs.eviction import make_policy
+from libs.metrics import NamespaceMetrics, hit_rates, merge_stats, namespace
+
+
+def sizeof(val):
+    """Estimated memory size of a cached value in bytes"""
+    size = sys.getsizeof(val)
+    if isinstance(val, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in val.items())
+    elif isinstance(val, (list, tuple, set)):
+        size += sum(sizeof(v) for v in val)
+    return size
+
+
 class CacheEntry:
-    def __init__(self, val):
+    __slots__ = ("val", "hits", "expires_at", "tags", "ns", "size")
+
+    def __init__(self, val, expires_at=None, tags=(), ns=None, size=0):
         self.val = val
         self.hits = 0
+        self.expires_at = expires_at
+        self.tags = tags
+        self.ns = ns
+        self.size = size
 
     def increment_hits(self):
         # avoid overflow
         if self.hits < 100000:
             self.hits += 1
 
+    def expired(self, now):
+        return (self.expires_at is not None) and (now >= self.expires_at)
+
+
+ENTRY_SIZE = sys.getsizeof(CacheEntry(None))
+
+
+# tags whose invalidations are counted, see TagVersions
+MAX_TAG_VERSIONS = 100000
+
+
+class TagVersions:
+    """Invalidation counters per tag, e.g. to derive ETags without loading values. Versions
+    start with a random prefix so they never repeat across restarts. Beyond `max_tags`
+    counted tags, all counters are dropped and the prefix changes, which changes every
+    version at once instead of growing without bound"""
+    def __init__(self, max_tags=MAX_TAG_VERSIONS):
+        self.__max_tags = max_tags
+        self.__counts = {}
+        self.__instance = os.urandom(6).hex()
+        self.__lock = threading.Lock()
+
+    def bump(self, tags):
+        with self.__lock:
+            for tag in tags:
+                self.__counts[tag] = self.__counts.get(tag, 0) + 1
+            if len(self.__counts) > self.__max_tags:
+                self.__counts.clear()
+                self.__instance = os.urandom(6).hex()
+
+    def version(self, *tags):
+        with self.__lock:
+            return ".".join([self.__instance] + [str(self.__counts.get(tag, 0)) for tag in tags])
+
+
+class ByteBudget:
+    """Estimated bytes of the positive entries of one or more caches, e.g. the stripes
+    of a ConcurrentCache, against a single limit"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.__lock = threading.Lock()
+
+    def add(self, size):
+        with self.__lock:
+            self.used += size
+
+    def exceeded(self):
+        return self.used > self.max_bytes
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.val = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent loads of the same key: the first caller runs the loader,
+    the others wait up to `timeout` seconds for its result or its exception"""
+    def __init__(self, timeout=None):
+        self.__flights = {}
+        self.__lock = threading.Lock()
+        self.timeout = timeout
+
+    def in_flight(self, key):
+        return key in self.__flights
+
+    def do(self, key, fn):
+        with self.__lock:
+            flight = self.__flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight()
+                self.__flights[key] = flight
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                raise TimeoutError(f"Timed out waiting for '{key}' to be loaded")
+            if flight.error is not None:
+                raise flight.error
+            return flight.val
+
+        try:
+            flight.val = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__flights[key]
+            flight.done.set()
+        return flight.val
+
 
 class Cache:
-    def __init__(self, max_keys, cleanup_size):
+    """Thread-safe key/value cache with a pluggable eviction policy (see libs.eviction.POLICIES)
+    and optional per-entry TTL in seconds (`ttl` is the default, get/update may override it).
+    Entries may be stored with tags, invalidate(tag) removes every entry carrying that tag.
+
+    Concurrent misses of a key run `onmiss` only once. Within `stale_ttl` seconds after
+    expiry the old value is still served while it is reloaded in the background,
+    inside `context()` (e.g. Flask's app.app_context).
+
+    With `negative_ttl`, keys whose loader found nothing are remembered for that long,
+    in a separate LRU store of at most `negative_max_keys` keys.
+
+    With `max_bytes`, entries are also evicted while the estimated total size of the positive
+    entries is above that budget, entries bigger than the whole budget are not cached. Caches
+    sharing a ByteBudget (`budget`) leave evictions to their owner, see ConcurrentCache.
+
+    stats() reports counters and loader latencies per key namespace (see libs.metrics)
+
+    version(*tags) changes whenever any of the tags is invalidated, e.g. to derive ETags
+    without loading values (see TagVersions)"""
+    def __init__(self, max_keys, cleanup_size, policy="least_hits", ttl=None,
+                 stale_ttl=0, load_timeout=None, context=nullcontext,
+                 negative_ttl=0, negative_max_keys=0, max_bytes=None, budget=None, versions=None):
         self.__cache = {}
-        self.__max_keys = max_keys
-        self.__cleanup_size = cleanup_size if cleanup_size < max_keys else 1
+        self.__negative = OrderedDict()
+        self.__tags = {}
+        self.__policy = make_policy(policy, max_keys, cleanup_size)
+        self.__lock = threading.Lock()
+        self.__ttl = ttl
+        self.__stale_ttl = stale_ttl
+        self.__negative_ttl = negative_ttl if negative_max_keys > 0 else 0
+        self.__negative_max_keys = negative_max_keys
+        self.__metrics = {}
+        self.__budget = budget if budget is not None else (ByteBudget(max_bytes) if max_bytes else None)
+        self.__evicts_bytes = budget is None
+        # bytes of the positive entries of this cache, part of the budget
+        self.bytes = 0
+        self.__flights = SingleFlight(load_timeout)
+        self.__context = context
+        # bumped on every invalidation, so a load racing with a write isn't cached
+        self.__epoch = 0
+        # caches sharing TagVersions, e.g. stripes, leave counting invalidations to their owner
+        self.__versions = versions if versions is not None else TagVersions()
+        self.__counts_versions = versions is None
         self.enabled = True
 
-    def __remove_least_hits(self):
-        if len(self.__cache.keys()) >= self.__max_keys:
-            hit_list = [{"key": k, "cnt": self.__cache[k].hits} for k in self.__cache.keys()]
-            tmp_list = sorted(hit_list, key=lambda x: x["cnt"], reverse=False)
-            del_keys = list(map(lambda x: x["key"], tmp_list[0 : self.__cleanup_size : 1]))
-            for k in del_keys:
-                del self.__cache[k]
+    def __expires_at(self, ttl):
+        ttl = self.__ttl if ttl is None else ttl
+        return (time.monotonic() + ttl) if ttl else None
+
+    def __ns_metrics(self, ns):
+        metrics = self.__metrics.get(ns)
+        if metrics is None:
+            metrics = self.__metrics[ns] = NamespaceMetrics()
+        return metrics
+
+    def __entry(self, key, val, expires_at, tags):
+        entry = CacheEntry(val, expires_at, tuple(tags), namespace(key))
+        entry.size = ENTRY_SIZE + sizeof(key) + sizeof(val) + sum(sizeof(t) for t in entry.tags)
+        return entry
+
+    def __discard(self, key):
+        store = self.__cache
+        entry = store.pop(key, None)
+        if entry is not None:
+            self.__ns_metrics(entry.ns).entries -= 1
+        else:
+            store = self.__negative
+            entry = store.pop(key, None)
+            if entry is not None:
+                self.__ns_metrics(entry.ns).negative_entries -= 1
+        if entry is not None:
+            self.__ns_metrics(entry.ns).bytes -= entry.size
+            if (store is self.__cache) and self.__budget:
+                self.bytes -= entry.size
+                self.__budget.add(-entry.size)
+            for tag in entry.tags:
+                keys = self.__tags[tag]
+                keys.discard(key)
+                if not keys:
+                    del self.__tags[tag]
+
+    def __remove(self, key):
+        self.__discard(key)
+        self.__policy.remove(key)
+
+    def __store(self, store, key, entry):
+        store[key] = entry
+        self.__ns_metrics(entry.ns).bytes += entry.size
+        if store is self.__cache:
+            self.__ns_metrics(entry.ns).entries += 1
+            # negative entries are bounded by negative_max_keys instead, they can't be evicted for bytes
+            if self.__budget:
+                self.bytes += entry.size
+                self.__budget.add(entry.size)
+        else:
+            self.__ns_metrics(entry.ns).negative_entries += 1
+        for tag in entry.tags:
+            self.__tags.setdefault(tag, set()).add(key)
+
+    def __evict_bytes(self):
+        while self.__budget.exceeded() and self.__cache:
+            victim = self.__policy.evict()
+            if victim is None:
+                return
+            self.__ns_metrics(namespace(victim)).evictions += 1
+            self.__discard(victim)
+
+    def evict_bytes(self):
+        """Evict entries of this cache while the byte budget is exceeded"""
+        if self.__budget:
+            with self.__lock:
+                self.__evict_bytes()
+
+    def __put(self, key, val, ttl, tags, epoch=None, only_new=False):
+        entry = self.__entry(key, val, self.__expires_at(ttl), tags)
+        if self.__budget and (entry.size > self.__budget.max_bytes):
+            with self.__lock:
+                self.__ns_metrics(entry.ns).oversized += 1
+                # the new value replaces the old one even though it is not cached
+                if not only_new and ((epoch is None) or (epoch == self.__epoch)):
+                    self.__remove(key)
+            return
+
+        with self.__lock:
+            if (epoch is not None) and (epoch != self.__epoch):
+                return
+            if only_new and (key in self.__cache):
+                return
+
+            if key in self.__cache:
+                self.__policy.access(key)
+                self.__discard(key)
+            else:
+                self.__discard(key)
+                victims = self.__policy.insert(key)
+                for victim in victims:
+                    self.__ns_metrics(namespace(victim)).evictions += 1
+                    self.__discard(victim)
+
+                # the policy may refuse admission of the new key itself
+                if key in victims:
+                    return
+
+            self.__store(self.__cache, key, entry)
+            if self.__budget and self.__evicts_bytes:
+                self.__evict_bytes()
+
+    def __put_negative(self, key, tags, epoch=None):
+        entry = self.__entry(key, None, time.monotonic() + self.__negative_ttl, tags)
+        with self.__lock:
+            self.__ns_metrics(entry.ns).negative_misses += 1
+            if ((epoch is not None) and (epoch != self.__epoch)) or (key in self.__cache):
+                return
+
+            self.__discard(key)
+            self.__store(self.__negative, key, entry)
+            if len(self.__negative) > self.__negative_max_keys:
+                victim = next(iter(self.__negative))
+                self.__ns_metrics(self.__negative[victim].ns).evictions += 1
+                self.__discard(victim)
+
+    def __load(self, key, onmiss, ttl, tags, epoch):
+        def load():
+            start = time.perf_counter()
+            try:
+                val = onmiss(key)
+            except Exception:
+                with self.__lock:
+                    self.__ns_metrics(namespace(key)).load_errors += 1
+                raise
+            with self.__lock:
+                self.__ns_metrics(namespace(key)).load_ms.observe((time.perf_counter() - start) * 1000)
+
+            if val:
+                self.__put(key, val, ttl, tags, epoch)
+            elif self.__negative_ttl:
+                self.__put_negative(key, tags, epoch)
+            return val
+
+        return self.__flights.do(key, load)
+
+    def __refresh(self, key, onmiss, ttl, tags, epoch):
+        def run():
+            try:
+                with self.__context():
+                    self.__load(key, onmiss, ttl, tags, epoch)
+            except Exception:
+                # the stale value stays in use until it is past stale_ttl
+                pass
+
+        if not self.__flights.in_flight(key):
+            threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+
+    def __lookup(self, key, now):
+        """Returns (entry, negative) for `key`, dropping entries past their stale time"""
+        entry = self.__cache.get(key)
+        if entry is not None:
+            if not entry.expired(now - self.__stale_ttl):
+                return entry, False
+            self.__remove(key)
+
+        entry = self.__negative.get(key)
+        if entry is not None:
+            if not entry.expired(now):
+                self.__negative.move_to_end(key)
+                self.__ns_metrics(entry.ns).negative_hits += 1
+                return entry, True
+            self.__discard(key)
+
+        return None, False
 
     def enable(self):
         self.enabled = True
@@ -30,27 +349,222 @@ class Cache:
     def disable(self):
         self.enabled = False
 
-    def get(self, key, onmiss):
+    def get(self, key, onmiss, ttl=None, tags=()):
         if not self.enabled:
             return onmiss(key)
 
-        if key in self.__cache:
-            entry = self.__cache[key]
-            entry.increment_hits()
+        now = time.monotonic()
+        with self.__lock:
+            epoch = self.__epoch
+            entry, negative = self.__lookup(key, now)
+            if negative:
+                return None
+            if entry is not None:
+                entry.increment_hits()
+                self.__policy.access(key)
+                metrics = self.__ns_metrics(entry.ns)
+                metrics.hits += 1
+                if not entry.expired(now):
+                    return entry.val
+                metrics.stale_hits += 1
+            else:
+                self.__ns_metrics(namespace(key)).misses += 1
+
+        if entry is not None:
+            self.__refresh(key, onmiss, ttl, tags, epoch)
             return entry.val
 
-        val = onmiss(key)
-        if val:
+        # load outside the lock so a slow loader doesn't block other keys
+        return self.__load(key, onmiss, ttl, tags, epoch)
 
-            self.__remove_least_hits()
-            self.__cache[key] = CacheEntry(val)
+    def lookup(self, key):
+        """Returns (True, value) for a fresh entry, (True, None) for a negative entry,
+        or (False, None) when `key` is not cached. Never calls a loader"""
+        if not self.enabled:
+            return False, None
 
-        return val
+        now = time.monotonic()
+        with self.__lock:
+            entry, negative = self.__lookup(key, now)
+            if negative:
+                return True, None
+            if (entry is None) or entry.expired(now):
+                self.__ns_metrics(namespace(key)).misses += 1
+                return False, None
+            entry.increment_hits()
+            self.__policy.access(key)
+            self.__ns_metrics(entry.ns).hits += 1
+            return True, entry.val
+
+    def epoch(self, key):
+        """Token to pass to update() along with a value loaded for `key` after reading it"""
+        with self.__lock:
+            return self.__epoch
+
+    def update(self, key, val, ttl=None, tags=(), epoch=None):
+        """Store `val` for `key`, None stores a negative entry. With `epoch`, nothing is
+        stored if anything was invalidated since epoch(key) returned it"""
+        if not self.enabled:
+            return
 
-    def update(self, key, val):
+        if val is not None:
+            self.__put(key, val, ttl, tags, epoch)
+        elif self.__negative_ttl:
+            self.__put_negative(key, tags, epoch)
+
+    def add(self, key, val, ttl=None, tags=()):
+        """Store `val` for `key` unless it is already cached"""
+        if self.enabled and (val is not None):
+            self.__put(key, val, ttl, tags, only_new=True)
+
+    def delete(self, key):
         if self.enabled:
-            self.__cache[key] = CacheEntry(val)
+            with self.__lock:
+                self.__epoch += 1
+                self.__remove(key)
+
+    def invalidate(self, *tags):
+        """Remove all entries carrying any of `tags`, returns number of removed entries"""
+        if self.__counts_versions:
+            self.__versions.bump(tags)
+        if not self.enabled:
+            return 0
+
+        with self.__lock:
+            self.__epoch += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self.__tags.get(tag, ()))
+            for k in keys:
+                self.__remove(k)
+        return len(keys)
+
+    def version(self, *tags):
+        """Token that changes whenever any of `tags` is invalidated, even while disabled"""
+        return self.__versions.version(*tags)
+
+    def purge_expired(self):
+        """Remove all expired entries, returns number of removed entries"""
+        now = time.monotonic()
+        with self.__lock:
+            expired = [k for k, e in self.__cache.items() if e.expired(now - self.__stale_ttl)]
+            expired += [k for k, e in self.__negative.items() if e.expired(now)]
+            for k in expired:
+                self.__remove(k)
+        return len(expired)
+
+    def hottest(self, limit):
+        """Up to `limit` (key, val, tags, hits) of the most hit fresh entries"""
+        now = time.monotonic()
+        with self.__lock:
+            entries = [(k, e.val, e.tags, e.hits) for k, e in self.__cache.items() if not e.expired(now)]
+        return heapq.nlargest(limit, entries, key=lambda x: x[3])
+
+    def stats(self):
+        """Counters in total and per key namespace, with hit rates"""
+        with self.__lock:
+            namespaces = {ns: m.to_dict() for ns, m in self.__metrics.items()}
+
+        stats = {}
+        for ns_stats in namespaces.values():
+            merge_stats(stats, ns_stats)
+        stats["namespaces"] = namespaces
+        return hit_rates(stats)
+
+
+class ConcurrentCache:
+    """Cache split into independently locked stripes, so concurrent requests
+    for different keys don't serialize on a single lock. `max_bytes` is one budget
+    for all stripes, entries are evicted from the biggest stripes first"""
+    def __init__(self, max_keys, cleanup_size, stripes=16, negative_max_keys=0, max_bytes=None, **kwargs):
+        stripe_keys = max(1, max_keys // stripes)
+        stripe_cleanup = max(1, cleanup_size // stripes)
+        stripe_negative_keys = -(-negative_max_keys // stripes)
+        self.__budget = ByteBudget(max_bytes) if max_bytes else None
+        self.__versions = TagVersions()
+        self.__stripes = [
+            Cache(stripe_keys, stripe_cleanup, negative_max_keys=stripe_negative_keys,
+                  budget=self.__budget, versions=self.__versions, **kwargs)
+            for _ in range(stripes)
+        ]
+        self.enabled = True
+
+    def __stripe(self, key):
+        return self.__stripes[hash(key) % len(self.__stripes)]
+
+    def enable(self):
+        self.enabled = True
+        for stripe in self.__stripes:
+            stripe.enable()
+
+    def disable(self):
+        self.enabled = False
+        for stripe in self.__stripes:
+            stripe.disable()
+
+    def __evict_bytes(self):
+        if self.__budget and self.__budget.exceeded():
+            for stripe in sorted(self.__stripes, key=lambda stripe: stripe.bytes, reverse=True):
+                stripe.evict_bytes()
+                if not self.__budget.exceeded():
+                    return
+
+    def get(self, key, onmiss, ttl=None, tags=()):
+        val = self.__stripe(key).get(key, onmiss, ttl, tags)
+        # also catches up with values stored by background refreshes
+        self.__evict_bytes()
+        return val
+
+    def lookup(self, key):
+        return self.__stripe(key).lookup(key)
+
+    def epoch(self, key):
+        return self.__stripe(key).epoch(key)
+
+    def update(self, key, val, ttl=None, tags=(), epoch=None):
+        self.__stripe(key).update(key, val, ttl, tags, epoch)
+        self.__evict_bytes()
+
+    def add(self, key, val, ttl=None, tags=()):
+        self.__stripe(key).add(key, val, ttl, tags)
+        self.__evict_bytes()
 
     def delete(self, key):
-        if self.enabled and (key in self.__cache):
-            del self.__cache[key]
+        self.__stripe(key).delete(key)
+
+    def invalidate(self, *tags):
+        """Remove all entries carrying any of `tags`, returns number of removed entries"""
+        self.__versions.bump(tags)
+        return sum(stripe.invalidate(*tags) for stripe in self.__stripes)
+
+    def version(self, *tags):
+        """See Cache.version(), one set of counters for all stripes"""
+        return self.__versions.version(*tags)
+
+    def purge_expired(self):
+        """Remove all expired entries, returns number of removed entries"""
+        return sum(stripe.purge_expired() for stripe in self.__stripes)
+
+    def hottest(self, limit):
+        """Up to `limit` (key, val, tags, hits) of the most hit fresh entries"""
+        entries = [e for stripe in self.__stripes for e in stripe.hottest(limit)]
+        return heapq.nlargest(limit, entries, key=lambda x: x[3])
+
+    def stats(self):
+        """Counters summed over all stripes, see Cache.stats()"""
+        totals = {"namespaces": {}}
+        for stripe in self.__stripes:
+            merge_stats(totals, stripe.stats())
+        return hit_rates(totals)
+
+
+def start_expiry_thread(cache, interval):
+    """Purge expired entries of `cache` every `interval` seconds in a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            cache.purge_expired()
+
+    thread = threading.Thread(target=run, name="cache-expiry", daemon=True)
+    thread.start()
+    return thread
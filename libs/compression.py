@@ -0,0 +1,54 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+def available_encodings():
+    """Content codings this process can produce, most preferred first"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def negotiate(accept_encodings, encodings=ENCODINGS):
+    """Best of `encodings` accepted by the client, None for identity. `accept_encodings`
+    is werkzeug's parsed Accept-Encoding header (request.accept_encodings)"""
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    """`body` (str or bytes) compressed with the content coding `encoding`"""
+    data = body.encode() if isinstance(body, str) else body
+    if encoding == "gzip":
+        # fixed mtime, so the same body always compresses to the same bytes
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
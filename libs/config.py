@@ -9,11 +9,27 @@ class Config:
             self.__conf = yaml.safe_load(stream)
         self.app_port = self.__get_int("APP_PORT")
         self.db_url = self.__get_string("DB_URL")
+        self.cache_socket = self.__get_optional("CACHE_SOCKET")
+        self.cache_authkey = self.__get_optional("CACHE_AUTHKEY")
+        self.cache_snapshot = self.__get_optional("CACHE_SNAPSHOT")
+        self.group_commit_max_delay_ms = self.__get_optional_float("GROUP_COMMIT_MAX_DELAY_MS")
+        self.group_commit_max_items = self.__get_optional_int("GROUP_COMMIT_MAX_ITEMS", 100)
 
     def __get_string(self, key):
         return os.environ.get(key) if key in os.environ else self.__conf[key]
 
+    def __get_optional(self, key, default=None):
+        return self.__get_string(key) if (key in os.environ or key in self.__conf) else default
+
     def __get_int(self, key):
         return int(self.__get_string(key))
 
+    def __get_optional_int(self, key, default=None):
+        val = self.__get_optional(key)
+        return default if val is None or val == "" else int(val)
+
+    def __get_optional_float(self, key, default=None):
+        val = self.__get_optional(key)
+        return default if val is None or val == "" else float(val)
+
 config = Config(os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yml"))
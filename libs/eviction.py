@@ -0,0 +1,271 @@
+from collections import OrderedDict
+
+
+# max hit/frequency count tracked per key
+MAX_HITS = 100000
+
+
+class LeastHitsPolicy:
+    """Evict a batch of least hit keys once the cache is full (original behavior)"""
+    def __init__(self, max_keys, cleanup_size):
+        self.__hits = {}
+        self.__max_keys = max_keys
+        self.__cleanup_size = cleanup_size if cleanup_size < max_keys else 1
+
+    def access(self, key):
+        if self.__hits[key] < MAX_HITS:
+            self.__hits[key] += 1
+
+    def insert(self, key):
+        victims = []
+        if len(self.__hits) >= self.__max_keys:
+            tmp_list = sorted(self.__hits.keys(), key=lambda k: self.__hits[k])
+            victims = tmp_list[0 : self.__cleanup_size]
+            for k in victims:
+                del self.__hits[k]
+
+        self.__hits[key] = 0
+        return victims
+
+    def evict(self):
+        if not self.__hits:
+            return None
+        victim = min(self.__hits.keys(), key=lambda k: self.__hits[k])
+        del self.__hits[victim]
+        return victim
+
+    def remove(self, key):
+        self.__hits.pop(key, None)
+
+
+class LRUPolicy:
+    """Evict the least recently used key"""
+    def __init__(self, max_keys):
+        self.__order = OrderedDict()
+        self.__max_keys = max_keys
+
+    def access(self, key):
+        self.__order.move_to_end(key)
+
+    def insert(self, key):
+        victims = []
+        if len(self.__order) >= self.__max_keys:
+            victim, _ = self.__order.popitem(last=False)
+            victims.append(victim)
+
+        self.__order[key] = None
+        return victims
+
+    def evict(self):
+        if not self.__order:
+            return None
+        victim, _ = self.__order.popitem(last=False)
+        return victim
+
+    def remove(self, key):
+        self.__order.pop(key, None)
+
+
+class LFUPolicy:
+    """Evict the least frequently used key, with O(1) frequency buckets and periodic aging"""
+    def __init__(self, max_keys, aging_period=10):
+        self.__freqs = {}
+        self.__buckets = {}
+        self.__min_freq = 0
+        self.__max_keys = max_keys
+        self.__aging_period = max(1, max_keys * aging_period)
+        self.__ops = 0
+
+    def __bucket(self, freq):
+        if freq not in self.__buckets:
+            self.__buckets[freq] = OrderedDict()
+        return self.__buckets[freq]
+
+    def __unlink(self, key, freq):
+        bucket = self.__buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[freq]
+            if self.__min_freq == freq:
+                self.__min_freq = freq + 1
+
+    def __age(self):
+        """Halve all frequencies so keys that were hot long ago can be evicted"""
+        self.__ops = 0
+        old_buckets = self.__buckets
+        self.__buckets = {}
+        for freq in sorted(old_buckets.keys()):
+            new_freq = max(1, freq // 2)
+            for k in old_buckets[freq]:
+                self.__freqs[k] = new_freq
+                self.__bucket(new_freq)[k] = None
+        self.__min_freq = min(self.__buckets.keys()) if self.__buckets else 0
+
+    def __tick(self):
+        self.__ops += 1
+        if self.__ops >= self.__aging_period:
+            self.__age()
+
+    def access(self, key):
+        freq = self.__freqs[key]
+        if freq < MAX_HITS:
+            self.__unlink(key, freq)
+            self.__freqs[key] = freq + 1
+            self.__bucket(freq + 1)[key] = None
+        else:
+            self.__buckets[freq].move_to_end(key)
+        self.__tick()
+
+    def evict(self):
+        if not self.__freqs:
+            return None
+        victim, _ = self.__buckets[self.__min_freq].popitem(last=False)
+        if not self.__buckets[self.__min_freq]:
+            del self.__buckets[self.__min_freq]
+            if self.__buckets:
+                self.__min_freq = min(self.__buckets.keys())
+        del self.__freqs[victim]
+        return victim
+
+    def insert(self, key):
+        victims = []
+        if len(self.__freqs) >= self.__max_keys:
+            victims.append(self.evict())
+
+        self.__freqs[key] = 1
+        self.__bucket(1)[key] = None
+        self.__min_freq = 1
+        self.__tick()
+        return victims
+
+    def remove(self, key):
+        if key in self.__freqs:
+            freq = self.__freqs.pop(key)
+            self.__unlink(key, freq)
+            if self.__buckets and self.__min_freq not in self.__buckets:
+                self.__min_freq = min(self.__buckets.keys())
+
+
+class FrequencySketch:
+    """Count-min sketch of access frequencies with saturating counters and periodic halving"""
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, max_keys):
+        bits = 4
+        while (1 << bits) < max_keys:
+            bits += 1
+        self.__bits = bits
+        self.__mask = (1 << bits) - 1
+        self.__table = [0] * ((1 << bits) * self.DEPTH)
+        self.__sample_size = max(10, max_keys * 10)
+        self.__additions = 0
+
+    def __indexes(self, key):
+        # one multiplicative hash, sliced into DEPTH independent-ish row indexes
+        h = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        bits, mask = self.__bits, self.__mask
+        return (
+            h & mask,
+            ((h >> bits) & mask) | (1 << bits),
+            ((h >> (2 * bits)) & mask) | (2 << bits),
+            ((h >> (3 * bits)) & mask) | (3 << bits),
+        )
+
+    def frequency(self, key):
+        table = self.__table
+        a, b, c, d = self.__indexes(key)
+        return min(table[a], table[b], table[c], table[d])
+
+    def increment(self, key):
+        table = self.__table
+        indexes = self.__indexes(key)
+        count = min(table[i] for i in indexes)
+        if count >= self.MAX_COUNT:
+            return
+
+        # conservative update: only raise the counters holding the minimum
+        for i in indexes:
+            if table[i] == count:
+                table[i] = count + 1
+
+        self.__additions += 1
+        if self.__additions >= self.__sample_size:
+            self.__additions //= 2
+            self.__table = [v >> 1 for v in table]
+
+
+class WTinyLFUPolicy:
+    """Window TinyLFU: a small LRU window in front of a segmented LRU main area,
+    where a frequency sketch decides whether a new key may displace a main key"""
+    def __init__(self, max_keys, window_ratio=0.01, protected_ratio=0.8):
+        self.__sketch = FrequencySketch(max_keys)
+        self.__window_max = max(1, int(max_keys * window_ratio))
+        main_max = max(1, max_keys - self.__window_max)
+        self.__protected_max = max(1, int(main_max * protected_ratio))
+        self.__main_max = main_max
+        self.__window = OrderedDict()
+        self.__probation = OrderedDict()
+        self.__protected = OrderedDict()
+
+    def access(self, key):
+        self.__sketch.increment(key)
+        if key in self.__window:
+            self.__window.move_to_end(key)
+        elif key in self.__protected:
+            self.__protected.move_to_end(key)
+        elif key in self.__probation:
+            del self.__probation[key]
+            self.__protected[key] = None
+            if len(self.__protected) > self.__protected_max:
+                demoted, _ = self.__protected.popitem(last=False)
+                self.__probation[demoted] = None
+
+    def insert(self, key):
+        self.__sketch.increment(key)
+        self.__window[key] = None
+        if len(self.__window) <= self.__window_max:
+            return []
+
+        candidate, _ = self.__window.popitem(last=False)
+        if len(self.__probation) + len(self.__protected) < self.__main_max:
+            self.__probation[candidate] = None
+            return []
+
+        segment = self.__probation if self.__probation else self.__protected
+        victim = next(iter(segment))
+        if self.__sketch.frequency(candidate) > self.__sketch.frequency(victim):
+            del segment[victim]
+            self.__probation[candidate] = None
+            return [victim]
+        return [candidate]
+
+    def evict(self):
+        for segment in (self.__probation, self.__window, self.__protected):
+            if segment:
+                victim, _ = segment.popitem(last=False)
+                return victim
+        return None
+
+    def remove(self, key):
+        for segment in (self.__window, self.__probation, self.__protected):
+            if key in segment:
+                del segment[key]
+                return
+
+
+POLICIES = {
+    "least_hits":   LeastHitsPolicy,
+    "lru":          LRUPolicy,
+    "lfu":          LFUPolicy,
+    "wtinylfu":     WTinyLFUPolicy,
+}
+
+
+def make_policy(name, max_keys, cleanup_size):
+    """Create eviction policy by name"""
+    if name not in POLICIES:
+        raise ValueError(f"Unknown eviction policy: {name}")
+    if name == "least_hits":
+        return LeastHitsPolicy(max_keys, cleanup_size)
+    return POLICIES[name](max_keys)
@@ -0,0 +1,38 @@
+import csv
+import io
+from libs import response
+
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def ndjson_chunks(partitions, serialize):
+    """NDJSON of the rows of every partition of rows, one encoded chunk per partition"""
+    for rows in partitions:
+        dumps = response.json_dumps
+        yield b"\n".join([dumps(serialize(row)) for row in rows]) + b"\n"
+
+
+def csv_chunks(partitions, names, serialize):
+    """CSV with a header row of `names` and a row of the values of every dict `serialize(row)`,
+    one encoded chunk per partition of rows"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(names)
+    for rows in partitions:
+        writer.writerows([serialize(row).values() for row in rows])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    # the header of an empty export
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def export_chunks(format, partitions, names, serialize):
+    if format == "csv":
+        return csv_chunks(partitions, names, serialize)
+    return ndjson_chunks(partitions, serialize)
@@ -0,0 +1,90 @@
+import datetime
+from urllib.parse import quote
+from libs.dateutil import parse_date
+
+
+def parse_int(val):
+    val = val.strip()
+    if not val.lstrip("-").isdigit():
+        return ValueError(f"Invalid number: '{val}'")
+    return int(val)
+
+
+def parse_day(val):
+    day = parse_date(val.strip()[0:10], "%Y-%m-%d")
+    return ValueError(f"Invalid date: '{val}'") if isinstance(day, ValueError) else day
+
+
+def parse_day_end(val):
+    """Start of the day after `val`, the exclusive upper bound of every time on that day"""
+    day = parse_day(val)
+    return day if isinstance(day, ValueError) else day + datetime.timedelta(days=1)
+
+
+def prefix_bound(prefix):
+    """Smallest string greater than every string starting with `prefix`, None if there is none"""
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+class Filter:
+    """Query param `param` filtering a list on `column`. Operators are
+    'eq', 'gte', 'lt', 'lte' and 'prefix', all of them can use a b-tree index on the column"""
+    def __init__(self, param, column, op, parse=str):
+        self.param = param
+        self.column = column
+        self.op = op
+        self.parse = parse
+
+    def condition(self, val):
+        if self.op == "eq":
+            return self.column == val
+        if self.op == "gte":
+            return self.column >= val
+        if self.op == "lt":
+            return self.column < val
+        if self.op == "lte":
+            return self.column <= val
+
+        # a range instead of LIKE, so the index is used whatever the collation is
+        upper = prefix_bound(val)
+        if upper is None:
+            return self.column >= val
+        return (self.column >= val) & (self.column < upper)
+
+
+class Filters:
+    """Filters given in the query params of a request, as (filter, parsed value, raw value)"""
+    def __init__(self, values):
+        self.values = values
+
+    def __bool__(self):
+        return bool(self.values)
+
+    def apply(self, query):
+        for flt, val, _ in self.values:
+            query = query.filter(flt.condition(val))
+        return query
+
+    def cache_key(self, key):
+        if not self.values:
+            return key
+        sep = "&" if "?" in key else "?"
+        return key + sep + "&".join(f"{flt.param}={quote(raw)}" for flt, _, raw in self.values)
+
+    @staticmethod
+    def from_args(args, filters):
+        """Filters of `filters` found in `args`, ValueError if a value is invalid"""
+        values = []
+        for flt in filters:
+            raw = args.get(flt.param)
+            if raw is None:
+                continue
+            val = flt.parse(raw)
+            if isinstance(val, ValueError):
+                return ValueError(f"Invalid {flt.param}: '{raw}'")
+            if flt.op == "prefix" and not val:
+                return ValueError(f"{flt.param} cannot be empty")
+            values.append((flt, val, raw))
+        return Filters(values)
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+
+class GroupCommit:
+    """Commits the writes of concurrent callers together, so they share the cost of one
+    commit (i.e. one fsync of the database log). A write waits at most `max_delay` seconds
+    for others to join its group, at most `max_items` writes are committed together. Writes
+    queued while a group is being committed always join the next group, so with `max_delay`
+    0 groups only form under load and a lone write is never delayed. Every write runs in its
+    own savepoint, a failing write fails only its own caller"""
+    def __init__(self, session_factory, max_delay=0.002, max_items=100, context=nullcontext):
+        self.max_delay = max_delay
+        self.max_items = max_items
+        self.__session_factory = session_factory
+        self.__context = context
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__run, name="group-commit", daemon=True)
+        self.__thread.start()
+
+    def submit(self, write):
+        """Future of the result of `write(session)`, set once its group has been committed.
+        `write` must only use the session it is given"""
+        future = Future()
+        self.__queue.put((write, future))
+        return future
+
+    def run(self, write):
+        """Result of `write(session)` once it is committed, or the exception it raised"""
+        return self.submit(write).result()
+
+    def close(self):
+        """Commit the writes queued so far and stop"""
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def __collect(self):
+        """Next group of writes, None once closed"""
+        item = self.__queue.get()
+        if item is None:
+            return None
+        items = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(items) < self.max_items:
+            try:
+                item = self.__queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.__queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                # stop after this group
+                self.__queue.put(None)
+                break
+            items.append(item)
+        return items
+
+    def __begin(self, session):
+        # pysqlite only begins a transaction at the first DML statement, a SAVEPOINT
+        # before that would be a transaction, and a commit, of its own
+        if session.get_bind().dialect.driver == "pysqlite":
+            session.connection().exec_driver_sql("BEGIN")
+
+    def __commit(self, items):
+        done = []
+        with self.__context():
+            session = self.__session_factory()
+            try:
+                self.__begin(session)
+                for write, future in items:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = write(session)
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        done.append((future, result))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                for future, _ in done:
+                    future.set_exception(e)
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                session.close()
+        for future, result in done:
+            future.set_result(result)
+
+    def __run(self):
+        while True:
+            items = self.__collect()
+            if items is None:
+                return
+            try:
+                self.__commit(items)
+            except Exception as e:
+                # e.g. no session could be made, every caller still gets an answer
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
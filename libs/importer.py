@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from libs.bulk import CHUNK_SIZE
+
+
+FORMATS = ("ndjson", "csv")
+MIMETYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+# errors listed in an import summary, the others are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def text_stream(stream):
+    """UTF-8 text reader of the binary `stream`, e.g. a request body, read a buffer at a time"""
+    return io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8", newline="")
+
+
+def read_ndjson(lines):
+    """(record number, dict or ValueError) of every non blank line of `lines`"""
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, ValueError("Invalid JSON")
+
+
+def read_csv(lines):
+    """(record number, dict) of every row of `lines`, a CSV with a header row"""
+    for number, row in enumerate(csv.DictReader(lines), 1):
+        yield number, row
+
+
+def read_records(lines, format):
+    return read_csv(lines) if format == "csv" else read_ndjson(lines)
+
+
+def run_import(records, validate, insert, skip=0, chunk_size=CHUNK_SIZE, progress=None):
+    """Import the (record number, params) of `records` after the first `skip` ones.
+    `validate(params)` returns the object to insert or ValueError, `insert(chunk)` saves the
+    (record number, object) pairs of a chunk in one transaction and returns the saved
+    objects and the (record number, message) of the others, or ValueError when the
+    transaction failed. That stops the import. Returns a summary whose `checkpoint` is the
+    number of records done, to resume from with `skip` after a failure: records before it
+    are either saved or invalid. `progress(summary)` is called after every chunk"""
+    summary = {"checkpoint": skip, "created": 0, "failed": 0, "errors": []}
+
+    def fail(number, message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"record": number, "message": message})
+
+    def flush(chunk, last):
+        """Whether the chunk was committed"""
+        result = insert(chunk) if chunk else ([], [])
+        if isinstance(result, ValueError):
+            # nothing of the chunk was saved, a resumed import starts with its first record
+            summary["error"] = f"Import stopped at record {chunk[0][0]}: {result}"
+            summary["checkpoint"] = chunk[0][0] - 1
+            return False
+        created, failed = result
+        summary["created"] += len(created)
+        for number, message in failed:
+            fail(number, message)
+        summary["checkpoint"] = last
+        if progress:
+            progress(summary)
+        return True
+
+    chunk, last, stopped = [], skip, False
+    try:
+        for number, params in records:
+            if number <= skip:
+                continue
+            obj = params if isinstance(params, ValueError) else validate(params)
+            if isinstance(obj, ValueError):
+                fail(number, str(obj))
+            else:
+                chunk.append((number, obj))
+            last = number
+            if len(chunk) >= chunk_size:
+                stopped = not flush(chunk, last)
+                chunk = []
+                if stopped:
+                    break
+    except (UnicodeDecodeError, csv.Error) as e:
+        summary["error"] = f"Unreadable input after record {last}: {e}"
+    if not stopped:
+        flush(chunk, last)
+    summary["errors"].sort(key=lambda error: error["record"])
+    return summary
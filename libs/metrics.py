@@ -0,0 +1,71 @@
+from bisect import bisect_left
+
+
+# upper bounds of the loader latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def namespace(key):
+    """Namespace of a cache key, the part before '[' (e.g. 'author' for 'author[1]')"""
+    key = str(key)
+    i = key.find("[")
+    return key[:i] if i > 0 else key
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, val):
+        self.counts[bisect_left(self.bounds, val)] += 1
+        self.total += val
+
+    def to_dict(self):
+        buckets = {f"le_{b}": c for b, c in zip(self.bounds, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        buckets["count"] = sum(self.counts)
+        buckets["sum"] = self.total
+        return buckets
+
+
+class NamespaceMetrics:
+    """Counters of one cache key namespace"""
+    COUNTERS = ("entries", "bytes", "hits", "stale_hits", "misses", "evictions", "oversized",
+                "load_errors", "negative_entries", "negative_hits", "negative_misses")
+    __slots__ = COUNTERS + ("load_ms",)
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.load_ms = Histogram()
+
+    def to_dict(self):
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats["load_ms"] = self.load_ms.to_dict()
+        return stats
+
+
+def merge_stats(total, stats):
+    """Add numeric counters of `stats` into `total` recursively, skipping derived rates"""
+    for k, v in stats.items():
+        if k.endswith("_hit_rate") or k == "hit_rate":
+            continue
+        if isinstance(v, dict):
+            merge_stats(total.setdefault(k, {}), v)
+        else:
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def hit_rates(stats):
+    """Add `hit_rate` for hits/misses, and `<name>_hit_rate` for every
+    `<name>_hits`/`<name>_misses` pair, in `stats` and its namespaces"""
+    for name in [k[:-len("hits")] for k in stats if k.endswith("hits") and k != "stale_hits"]:
+        hits = stats[f"{name}hits"]
+        lookups = hits + stats.get(f"{name}misses", 0)
+        stats[f"{name}hit_rate"] = (hits / lookups) if lookups else 0.0
+    for ns_stats in stats.get("namespaces", {}).values():
+        hit_rates(ns_stats)
+    return stats
@@ -0,0 +1,145 @@
+import base64
+import datetime
+import json
+from sqlalchemy import and_, or_
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(values):
+    """Opaque cursor for the sort key values of the last row of a page"""
+    values = [v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Sort key values of a cursor made by encode_cursor, ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        return ValueError(f"Invalid cursor: '{cursor}'")
+    if not isinstance(values, list) or not values or \
+            not all(isinstance(v, (int, float, str)) and not isinstance(v, bool) for v in values):
+        return ValueError(f"Invalid cursor: '{cursor}'")
+    return values
+
+
+class Sort:
+    """Order of a list by `column`, ties broken by the unique key column. Rows with
+    NULL in `column` are not reachable by keyset paging, sort columns must be filled"""
+    def __init__(self, column, descending=False):
+        self.column = column
+        self.descending = descending
+
+    def cache_key(self, key):
+        sep = "&" if "?" in key else "?"
+        return f"{key}{sep}sort={'-' if self.descending else ''}{self.column.key}"
+
+    def order_by(self, key_column):
+        if self.descending:
+            return self.column.desc(), key_column.desc()
+        return self.column, key_column
+
+    def after(self, key_column, values):
+        """Condition selecting the rows after the row with sort key `values`"""
+        val, key = values
+        # the redundant bound on the column alone lets the planner seek in the index
+        if self.descending:
+            return and_(self.column <= val, or_(self.column < val, key_column < key))
+        return and_(self.column >= val, or_(self.column > val, key_column > key))
+
+    def parse_cursor(self, values):
+        """Cursor values converted to the column type, ValueError if they do not match"""
+        if len(values) != 2:
+            return ValueError("Cursor does not match the sort order")
+        val, key = values
+        if self.column.type.python_type is datetime.datetime:
+            try:
+                val = datetime.datetime.fromisoformat(val)
+            except (TypeError, ValueError):
+                return ValueError("Cursor does not match the sort order")
+        return [val, key]
+
+    @staticmethod
+    def from_args(args, columns):
+        """Sort from the `sort` query param, a column name optionally prefixed with '-' for
+        descending order. None if it was not given, ValueError if the column is not in `columns`"""
+        sort = args.get("sort")
+        if sort is None:
+            return None
+
+        name = sort[1:] if sort.startswith("-") else sort
+        for column in columns:
+            if column.key == name:
+                return Sort(column, sort.startswith("-"))
+        return ValueError(f"Invalid sort: '{sort}'")
+
+
+class Page:
+    """Keyset page request: `limit` rows after the row the cursor points at"""
+    def __init__(self, limit, cursor=None, after=None):
+        self.limit = limit
+        self.cursor = cursor
+        self.after = after
+
+    def cache_key(self, key):
+        """Cache key of this page of the list cached under `key`"""
+        sep = "&" if "?" in key else "?"
+        return f"{key}{sep}limit={self.limit}&cursor={self.cursor or ''}"
+
+    def fetch(self, query, column, sort=None):
+        """Rows of this page of `query` ordered by `sort` (or the unique `column`), and the
+        next cursor (None on the last page). Uses `column > last` instead of OFFSET, so
+        every page costs the same however deep it is"""
+        if sort is None:
+            if self.after is not None:
+                query = query.filter(column > self.after[0])
+            query = query.order_by(column)
+        else:
+            if self.after is not None:
+                query = query.filter(sort.after(column, self.after))
+            query = query.order_by(*sort.order_by(column))
+        rows = query.limit(self.limit + 1).all()
+        if len(rows) <= self.limit:
+            return rows, None
+
+        rows = rows[:self.limit]
+        last = [getattr(rows[-1], column.key)]
+        if sort is not None:
+            last.insert(0, getattr(rows[-1], sort.column.key))
+        return rows, encode_cursor(last)
+
+    @staticmethod
+    def from_args(args, sort=None):
+        """Page from `limit`/`cursor` query params, None if neither was given
+        (i.e. the whole list), ValueError if they are invalid"""
+        limit_str = args.get("limit")
+        cursor = args.get("cursor")
+        if limit_str is None and cursor is None:
+            return None
+
+        limit = DEFAULT_LIMIT
+        if limit_str is not None:
+            if not limit_str.strip().isdigit():
+                return ValueError(f"Invalid limit: '{limit_str}'")
+            limit = int(limit_str)
+            if not 1 <= limit <= MAX_LIMIT:
+                return ValueError(f"Limit must be between 1 and {MAX_LIMIT}")
+
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if isinstance(after, ValueError):
+                return after
+            if sort is not None:
+                after = sort.parse_cursor(after)
+            elif len(after) != 1:
+                after = ValueError("Cursor does not match the sort order")
+            if isinstance(after, ValueError):
+                return after
+
+        return Page(limit, cursor or None, after)
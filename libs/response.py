@@ -1,30 +1,82 @@
 import json
-from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# the envelope around `data`, encoded once
+SUCCESS_HEAD = b'{"meta":{"status":"success","message":'
+ERROR_HEAD = b'{"meta":{"status":"error","message":'
+EMPTY_MESSAGE = b'""'
+DATA_HEAD = b'},"data":'
+
+
+def stdlib_dumps(obj):
+    """Compact JSON of `obj` as UTF-8 bytes, with the json module"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def use_json_encoder(dumps):
+    """Encode response data with `dumps(obj) -> bytes` from now on"""
+    global json_dumps
+    json_dumps = dumps
+
+
+# orjson is several times faster, the json module is used when it is not installed
+json_dumps = orjson.dumps if orjson is not None else stdlib_dumps
 
 
 class Response:
     """HTTP response formatter"""
-    def __init__(self, code, message, data):
+    def __init__(self, code, message, data, meta=None):
         self.code = code
         self.message = message
         self.data = data
+        self.meta = meta
 
-    def __response_status(self):
-        return "success" if self.code == 200 else "error"
+    def __head(self):
+        head = SUCCESS_HEAD if self.code == 200 else ERROR_HEAD
+        head += json_dumps(self.message) if self.message else EMPTY_MESSAGE
+        if self.meta:
+            head += b"," + json_dumps(self.meta)[1:-1]
+        return head + DATA_HEAD
+
+    def encode(self):
+        """JSON response body as bytes, as it is cached and sent"""
+        return self.__head() + json_dumps(self.data) + b"}"
 
     def resp(self):
-        resp_dict = {
-            "meta": {
-                "status":   self.__response_status(),
-                "message":  self.message,
-            },
-            "data": self.data,
-        }
-        return json.dumps(OrderedDict(resp_dict)), self.code
+        return self.encode(), self.code, JSON_HEADERS
+
+    @staticmethod
+    def from_body(body, code=200, headers=None):
+        """Response for a body that was already encoded, e.g. by encode() and then cached"""
+        return body, code, {**JSON_HEADERS, **headers} if headers else JSON_HEADERS
+
+    @staticmethod
+    def stream(items, serialize, chunk_size=100):
+        """Generator of the same body as success(data).encode() for a data list of
+        `serialize(item)` for every item, encoding `chunk_size` items at a time so
+        the whole list is never held in memory"""
+        head = Response.success([]).encode()
+        yield head[:-2]
+        chunk, sep = [], b""
+        for item in items:
+            chunk.append(serialize(item))
+            if len(chunk) >= chunk_size:
+                yield sep + json_dumps(chunk)[1:-1]
+                chunk, sep = [], b","
+        if chunk:
+            yield sep + json_dumps(chunk)[1:-1]
+        yield head[-2:]
 
     @staticmethod
-    def success(data):
-        return Response(200, "", data)
+    def success(data, meta=None):
+        return Response(200, "", data, meta)
 
     @staticmethod
     def error(code, message):
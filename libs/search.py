@@ -0,0 +1,87 @@
+import heapq
+import math
+import re
+import threading
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase word tokens of `text`"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking. `fields` maps the name of every
+    indexed field to its weight, e.g. a title match can count more than a description match"""
+    def __init__(self, fields, k1=1.2, b=0.75):
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self.lock = threading.RLock()
+        self.__postings = {}    # term -> {doc id: weighted term frequency}
+        self.__docs = {}        # doc id -> (terms, weighted length)
+        self.__total_length = 0.0
+
+    def __len__(self):
+        return len(self.__docs)
+
+    def __remove(self, doc_id):
+        terms, length = self.__docs.pop(doc_id, ((), 0.0))
+        for term in terms:
+            postings = self.__postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.__postings[term]
+        self.__total_length -= length
+
+    def __add(self, doc_id, doc):
+        self.__remove(doc_id)
+        freqs, length = {}, 0.0
+        for field, weight in self.fields.items():
+            tokens = tokenize(doc.get(field))
+            length += weight * len(tokens)
+            for token in tokens:
+                freqs[token] = freqs.get(token, 0.0) + weight
+        for term, freq in freqs.items():
+            self.__postings.setdefault(term, {})[doc_id] = freq
+        self.__docs[doc_id] = (tuple(freqs), length)
+        self.__total_length += length
+
+    def add(self, doc_id, doc):
+        """Index (or re-index) the fields of the mapping `doc`"""
+        with self.lock:
+            self.__add(doc_id, doc)
+
+    def remove(self, doc_id):
+        with self.lock:
+            self.__remove(doc_id)
+
+    def rebuild(self, docs):
+        """Replace the whole index with the (doc id, doc) pairs of `docs`"""
+        with self.lock:
+            self.__postings, self.__docs, self.__total_length = {}, {}, 0.0
+            for doc_id, doc in docs:
+                self.__add(doc_id, doc)
+            self.ready = True
+
+    def search(self, query, limit):
+        """Up to `limit` (doc id, score) of the documents matching any term of `query`, best first"""
+        terms = set(tokenize(query))
+        with self.lock:
+            count = len(self.__docs)
+            if not count:
+                return []
+            avg_length = (self.__total_length / count) or 1.0
+            scores = {}
+            for term in terms:
+                postings = self.__postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.__docs[doc_id][1] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,173 @@
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from libs.cache import SingleFlight
+
+
+class CacheServer:
+    """Serve a local Cache to other processes over a unix socket, so every
+    worker process shares one copy of the cache and sees every invalidation.
+    Messages are pickles, so clients must prove they know `authkey` before any is read"""
+    METHODS = ("lookup", "epoch", "update", "add", "delete", "invalidate", "version", "purge_expired",
+               "hottest", "stats")
+
+    def __init__(self, address, cache, authkey=None):
+        if os.path.exists(address):
+            os.unlink(address)
+        self.cache = cache
+        self.__address = address
+        self.__authkey = authkey
+        # the socket is created accessible to the owner only, not chmod-ed after the bind
+        umask = os.umask(0o177)
+        try:
+            self.__listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(umask)
+        self.__closed = False
+        self.__stopped = False
+
+    def __serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if method not in self.METHODS:
+                    conn.send(("error", f"Unsupported cache method: {method}"))
+                    continue
+                try:
+                    conn.send(("ok", getattr(self.cache, method)(*args)))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self.__listener.accept()
+            except Exception:
+                # e.g. a client that failed authentication, keep accepting until
+                # the connection of close() arrives or the listener is closed
+                if self.__stopped:
+                    return
+                continue
+            if self.__closed:
+                conn.close()
+                return
+            threading.Thread(target=self.__serve, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self.__closed = True
+        try:
+            # wake up the blocking accept() so serve_forever can return
+            Client(self.__address, family="AF_UNIX", authkey=self.__authkey).close()
+        except Exception:
+            pass
+        self.__listener.close()
+        self.__stopped = True
+
+
+class SharedCache:
+    """Client of CacheServer with the same interface as Cache. When the server
+    cannot be reached, it behaves like a disabled cache instead of failing requests.
+    Concurrent misses of a key within this process run `onmiss` only once"""
+    def __init__(self, address, authkey=None, load_timeout=None):
+        self.__address = address
+        self.__authkey = authkey
+        self.__local = threading.local()
+        self.__flights = SingleFlight(load_timeout)
+        self.enabled = True
+
+    def __connection(self):
+        # connections are per thread, and must not be reused by a forked child
+        pid = os.getpid()
+        if getattr(self.__local, "pid", None) != pid:
+            self.__local.pid = pid
+            self.__local.conn = None
+        if self.__local.conn is None:
+            self.__local.conn = Client(self.__address, family="AF_UNIX", authkey=self.__authkey)
+        return self.__local.conn
+
+    def __disconnect(self):
+        conn = getattr(self.__local, "conn", None)
+        self.__local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def __call(self, method, *args):
+        """Returns (True, result) on success, (False, None) when the server is unavailable"""
+        try:
+            conn = self.__connection()
+            conn.send((method, args))
+            status, result = conn.recv()
+        except (OSError, EOFError, AuthenticationError):
+            self.__disconnect()
+            return False, None
+
+        if status == "error":
+            raise RuntimeError(result)
+        return True, result
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def get(self, key, onmiss, ttl=None, tags=()):
+        if not self.enabled:
+            return onmiss(key)
+
+        # loaders run in the client process, the server only stores values
+        _, found = self.__call("lookup", key)
+        if found and found[0]:
+            return found[1]
+
+        def load():
+            # a write invalidating the key while it loads makes the server drop the value
+            _, epoch = self.__call("epoch", key)
+            val = onmiss(key)
+            if epoch is not None:
+                self.__call("update", key, val if val else None, ttl, tuple(tags), epoch)
+            return val
+
+        return self.__flights.do(key, load)
+
+    def update(self, key, val, ttl=None, tags=()):
+        if self.enabled:
+            self.__call("update", key, val, ttl, tuple(tags))
+
+    def add(self, key, val, ttl=None, tags=()):
+        if self.enabled and (val is not None):
+            self.__call("add", key, val, ttl, tuple(tags))
+
+    def delete(self, key):
+        if self.enabled:
+            self.__call("delete", key)
+
+    def invalidate(self, *tags):
+        # also while disabled, tag versions must follow every write
+        _, removed = self.__call("invalidate", *tags)
+        return removed or 0
+
+    def version(self, *tags):
+        """See Cache.version(), None when the server is unavailable"""
+        _, version = self.__call("version", *tags)
+        return version
+
+    def purge_expired(self):
+        _, removed = self.__call("purge_expired")
+        return removed or 0
+
+    def hottest(self, limit):
+        _, entries = self.__call("hottest", limit)
+        return entries or []
+
+    def stats(self):
+        _, stats = self.__call("stats")
+        return stats or {}
@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+from contextlib import nullcontext
+from libs.metrics import namespace
+
+
+def save_snapshot(cache, path, limit, select=None):
+    """Write the keys, tags and hits of the `limit` most hit entries of `cache` to a gzipped
+    JSON file, returns the number of saved entries. Values are not saved, they are refetched
+    when the snapshot is loaded. With `select`, only keys for which select(key) is true are
+    saved (e.g. not compressed copies of other entries). Every process writes its own
+    temporary file, the last one to finish replaces the snapshot"""
+    entries = [[k, list(tags), hits] for k, _, tags, hits in cache.hottest(limit) if select is None or select(k)]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as stream:
+            json.dump(entries, stream, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(entries)
+
+
+def load_snapshot(cache, path, refetch, batch_size=500):
+    """Fill `cache` with the entries of a snapshot file, keeping entries cached meanwhile.
+    Values are reloaded by calling refetch(keys) -> {key: value} once per batch of keys.
+    Returns the number of loaded entries"""
+    if not os.path.isfile(path):
+        return 0
+
+    with gzip.open(path, "rt", encoding="utf-8") as stream:
+        entries = json.load(stream)
+
+    loaded = 0
+    for i in range(0, len(entries), batch_size):
+        batch = entries[i : i + batch_size]
+        vals = refetch([k for k, _, _ in batch])
+        for k, tags, _ in batch:
+            if vals.get(k) is not None:
+                cache.add(k, vals[k], tags=tags)
+                loaded += 1
+    return loaded
+
+
+def start_preload(cache, path, refetch, context=nullcontext, onerror=None):
+    """Run load_snapshot() in a daemon thread inside `context()`, so startup isn't blocked"""
+    def run():
+        try:
+            with context():
+                load_snapshot(cache, path, refetch)
+        except Exception as e:
+            if onerror:
+                onerror(e)
+
+    thread = threading.Thread(target=run, name="cache-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def ids_by_namespace(keys):
+    """Group keys like 'book[12]' into {'book': {12}}, 'book[]' adds None to its namespace"""
+    ids = {}
+    for key in keys:
+        key = str(key)
+        if "[" in key and not key.endswith("]"):
+            # e.g. a page of a list, 'book[]?limit=10&cursor=...'
+            continue
+        inner = key[key.find("[") + 1 : -1] if key.endswith("]") else ""
+        if inner and not inner.isdigit():
+            continue
+        ids.setdefault(namespace(key), set()).add(int(inner) if inner else None)
+    return ids
@@ -0,0 +1,40 @@
+"""initial
+
+Revision ID: 2a28ab06c866
+Revises: 
+Create Date: 2026-10-18 16:34:10.888535
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a28ab06c866'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('authors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=30), nullable=True),
+    sa.Column('bio', sa.String(length=200), nullable=True),
+    sa.Column('birth_date', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=50), nullable=True),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.Column('publish_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['author_id'], ['authors.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('books')
+    op.drop_table('authors')
@@ -0,0 +1,38 @@
+"""indexes for filtering and sorting books and authors
+
+Revision ID: 7c41d2e9b0a3
+Revises: 2a28ab06c866
+Create Date: 2026-10-18 16:40:02.512406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c41d2e9b0a3'
+down_revision = '2a28ab06c866'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('authors', schema=None) as batch_op:
+        batch_op.create_index('ix_authors_birth_date_id', ['birth_date', 'id'], unique=False)
+        batch_op.create_index('ix_authors_name_id', ['name', 'id'], unique=False)
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_author_id_id', ['author_id', 'id'], unique=False)
+        batch_op.create_index('ix_books_publish_date_id', ['publish_date', 'id'], unique=False)
+        batch_op.create_index('ix_books_title_id', ['title', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_title_id')
+        batch_op.drop_index('ix_books_publish_date_id')
+        batch_op.drop_index('ix_books_author_id_id')
+
+    with op.batch_alter_table('authors', schema=None) as batch_op:
+        batch_op.drop_index('ix_authors_name_id')
+        batch_op.drop_index('ix_authors_birth_date_id')
@@ -9,12 +9,17 @@ MAX_BIO_LENGTH = 200
 class Author(db.Model, SerializerMixin):
     __tablename__ = "authors"
     serialize_only = ('id', 'name', 'bio', 'birth_date')
+    # the trailing id keeps keyset pagination within the index
+    __table_args__ = (
+        db.Index('ix_authors_name_id', 'name', 'id'),
+        db.Index('ix_authors_birth_date_id', 'birth_date', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(MAX_NAME_LENGTH))
     bio = db.Column(db.String(MAX_BIO_LENGTH))
     birth_date = db.Column(db.DateTime())
-    books = db.relationship('models.books.Book', lazy='joined', cascade="all,delete", backref='author')
+    books = db.relationship('models.books.Book', lazy='select', order_by='Book.id', cascade="all,delete", backref='author')
 
     def __init__(self, name, bio, birth_date):
         self.name = name
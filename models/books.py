@@ -9,6 +9,12 @@ MAX_DESCRIPTION_LENGTH  = 200
 class Book(db.Model, SerializerMixin):
     __tablename__ = "books"
     serialize_only = ('id', 'author_id', 'title', 'description', 'publish_date')
+    # the trailing id keeps keyset pagination within the index
+    __table_args__ = (
+        db.Index('ix_books_author_id_id', 'author_id', 'id'),
+        db.Index('ix_books_publish_date_id', 'publish_date', 'id'),
+        db.Index('ix_books_title_id', 'title', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), unique=False, nullable=False)
@@ -1,13 +1,24 @@
 import os
 import logging
+import click
 from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.orm import Session
 from libs.config import config
-from libs.cache import Cache
+from libs.cache import ConcurrentCache, start_expiry_thread
+from libs.sharedcache import CacheServer, SharedCache
+from libs.groupcommit import GroupCommit
 
 
 LOG_FORMAT = '[%(asctime)s] [%(levelname)s] %(message)s'
+CACHE_TTL = 600
+CACHE_STALE_TTL = 60
+CACHE_LOAD_TIMEOUT = 10
+CACHE_EXPIRY_INTERVAL = 60
+CACHE_NEGATIVE_TTL = 30
+CACHE_NEGATIVE_MAX_KEYS = 1000
+CACHE_MAX_BYTES = 64 * 1024 * 1024
 
 def init_flask_app():
     logdir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
@@ -25,8 +36,95 @@ def init_flask_app():
     return flask_app
 
 
+def init_local_cache():
+    local_cache = ConcurrentCache(2000, 800, policy="wtinylfu", ttl=CACHE_TTL,
+        stale_ttl=CACHE_STALE_TTL, load_timeout=CACHE_LOAD_TIMEOUT, context=app.app_context,
+        negative_ttl=CACHE_NEGATIVE_TTL, negative_max_keys=CACHE_NEGATIVE_MAX_KEYS,
+        max_bytes=CACHE_MAX_BYTES)
+    start_expiry_thread(local_cache, CACHE_EXPIRY_INTERVAL)
+    return local_cache
+
+
+def cache_authkey():
+    """CACHE_AUTHKEY as bytes. The cache server and its clients unpickle what they
+    receive, so the socket is only used by processes that know the key"""
+    if not config.cache_authkey:
+        raise ValueError("CACHE_AUTHKEY is required with CACHE_SOCKET")
+    return config.cache_authkey.encode()
+
+
+def init_cache():
+    """Use the shared cache server when configured, otherwise a per-process cache"""
+    if config.cache_socket:
+        return SharedCache(config.cache_socket, authkey=cache_authkey(), load_timeout=CACHE_LOAD_TIMEOUT)
+    return init_local_cache()
+
+
+def init_group_commit():
+    """Group commit of the writes of concurrent requests when GROUP_COMMIT_MAX_DELAY_MS
+    is configured, otherwise None and every request commits its own writes"""
+    if config.group_commit_max_delay_ms is None:
+        return None
+    # objects written keep their values after the commit, the caller reads them in its own thread
+    return GroupCommit(lambda: Session(db.engine, expire_on_commit=False),
+        max_delay=config.group_commit_max_delay_ms / 1000, max_items=config.group_commit_max_items,
+        context=app.app_context)
+
+
+def transact(session, write):
+    """Run `write(session)`, commit it and return its result. With group commit, `write` is
+    given the session of a shared transaction instead, and this waits until it is committed.
+    `session` is closed first, a request waiting for the group must not hold a pooled
+    connection the group commit needs, so `write` loads what it changes itself"""
+    if group_commit is None:
+        result = write(session)
+        session.commit()
+        return result
+    session.close()
+    return group_commit.run(write)
+
+
 app = init_flask_app()
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 logger = app.logger
-cache = Cache(2000, 800)
+cache = init_cache()
+group_commit = init_group_commit()
+
+
+@app.cli.command("cache-server")
+def cache_server():
+    """Run the shared cache server on CACHE_SOCKET for all worker processes"""
+    if not config.cache_socket:
+        raise click.UsageError("CACHE_SOCKET is not configured")
+    if not config.cache_authkey:
+        raise click.UsageError("CACHE_AUTHKEY is not configured")
+    CacheServer(config.cache_socket, init_local_cache(), authkey=cache_authkey()).serve_forever()
+
+
+@app.cli.command("import")
+@click.argument("kind", type=click.Choice(["authors", "books"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["ndjson", "csv"]),
+    help="Format of the file, by default told by its extension")
+@click.option("--skip", default=0, show_default=True,
+    help="Records to skip, the checkpoint of an interrupted import")
+def import_file(kind, path, format, skip):
+    """Import the authors or books of an NDJSON or CSV file, a chunk per transaction"""
+    # pylint: disable=import-outside-toplevel
+    from libs.importer import read_records
+    from services.author import authorservice
+    from services.book import bookservice
+
+    format = format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    run = authorservice.import_authors if kind == "authors" else bookservice.import_books
+
+    def progress(summary):
+        click.echo(f"checkpoint {summary['checkpoint']}: {summary['created']} created, {summary['failed']} failed")
+
+    with open(path, encoding="utf-8", newline="") as lines:
+        summary = run(read_records(lines, format), skip, progress)
+    for error in summary["errors"]:
+        click.echo(f"record {error['record']}: {error['message']}", err=True)
+    if "error" in summary:
+        raise click.ClickException(f"{summary['error']}, resume with --skip {summary['checkpoint']}")
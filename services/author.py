@@ -1,72 +1,225 @@
-from sqlalchemy_serializer import serialize_collection as sc
-from services.app import db, cache, logger
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from services.app import db, cache, logger, transact
+from services import tags
 from models.authors import Author
+from models.books import Book
 from libs.response import Response
 from libs.dateutil import parse_date
+from libs.snapshot import ids_by_namespace
+from libs.pagination import Page, Sort
+from libs.filtering import Filter, Filters, parse_day, parse_day_end
+from libs.fieldset import FieldSet
+from libs.serializer import serializer
+from libs.bulk import parse_batch, chunks, bulk_insert
+from libs.importer import run_import
+from services.streaming import wants_stream, stream_response
+from services.search import searchservice
+from services.etag import etag, etag_headers, not_modified, precondition_failed
+from services.compression import body_response
+from services.importer import import_response
+from services.authorids import authorids
+from services.export import export_response
+
+# filters and sort orders of GET /api/v1/authors, each backed by an index of the authors table
+FILTERS = (
+    Filter("born_from", Author.birth_date, "gte", parse_day),
+    Filter("born_to", Author.birth_date, "lt", parse_day_end),
+    Filter("name_prefix", Author.name, "prefix"),
+)
+SORTS = (Author.id, Author.name, Author.birth_date)
+serialize_author = serializer(Author)
+serialize_book = serializer(Book)
+# columns written by POST /api/v1/authors:batch
+INSERT_COLUMNS = ("name", "bio", "birth_date")
 
 
 class AuthorService:
     def __get_author_from_request(self, req):
         try:
-            if not "name" in req.json:
-                return ValueError("Missing 'name'")
-            if not "bio" in req.json:
-                return ValueError("Missing 'bio'")
-            if not "birth_date" in req.json:
-                return ValueError("Missing 'birth_date'")
-
-            name = req.json["name"].strip()
-            bio = req.json["bio"].strip()
-            birth_date_str = str(req.json["birth_date"]).strip()
-            birth_date = parse_date(birth_date_str[0:10], "%Y-%m-%d")
-            if not name:
-                return ValueError("Name cannot be empty")
-            if len(name) > Author.max_name_length():
-                return ValueError(f"Name too long, max {Author.max_name_length()} chars")
-            if not bio:
-                return ValueError("Bio cannot be empty")
-            if len(bio) > Author.max_bio_length():
-                return ValueError(f"Bio too long, max {Author.max_bio_length()} chars")
-            if not birth_date_str:
-                return ValueError("Birth date cannot be empty")
-            if isinstance(birth_date, ValueError):
-                return ValueError(f"Invalid birth date: '{birth_date_str}'")
-
-            return Author(name, bio, birth_date)
+            return self.__get_author_from_dict(req.json)
         except Exception as e:
             logger.fatal("Unexpected error in services.AuthorService.__get_author_from_request: %s", str(e))
             return e
 
+    def __get_author_from_dict(self, params):
+        """Validate the params of a new or updated author, POST/PUT body or batch item"""
+        if not isinstance(params, dict):
+            return ValueError("Author must be a JSON object")
+        if not "name" in params:
+            return ValueError("Missing 'name'")
+        if not "bio" in params:
+            return ValueError("Missing 'bio'")
+        if not "birth_date" in params:
+            return ValueError("Missing 'birth_date'")
+        if not isinstance(params["name"], str):
+            return ValueError("Name must be a string")
+        if not isinstance(params["bio"], str):
+            return ValueError("Bio must be a string")
+
+        name = params["name"].strip()
+        bio = params["bio"].strip()
+        birth_date_str = str(params["birth_date"]).strip()
+        birth_date = parse_date(birth_date_str[0:10], "%Y-%m-%d")
+        if not name:
+            return ValueError("Name cannot be empty")
+        if len(name) > Author.max_name_length():
+            return ValueError(f"Name too long, max {Author.max_name_length()} chars")
+        if not bio:
+            return ValueError("Bio cannot be empty")
+        if len(bio) > Author.max_bio_length():
+            return ValueError(f"Bio too long, max {Author.max_bio_length()} chars")
+        if not birth_date_str:
+            return ValueError("Birth date cannot be empty")
+        if isinstance(birth_date, ValueError):
+            return ValueError(f"Invalid birth date: '{birth_date_str}'")
+
+        return Author(name, bio, birth_date)
+
+    def __insert_authors(self, chunk):
+        """Insert the (position, author) pairs of `chunk` in one transaction, returns the
+        inserted authors and the (position, message) of the authors that were not, or
+        ValueError when the transaction failed"""
+        authors = [author for _, author in chunk]
+        try:
+            bulk_insert(db.session, Author, authors, INSERT_COLUMNS)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Failed to insert a chunk of %d authors: %s", len(authors), e)
+            return ValueError("Authors cannot be saved")
+
+        authorids.add(*[author.id for author in authors])
+        cache.invalidate(tags.AUTHORS, *[tags.author(author.id) for author in authors])
+        for author in authors:
+            searchservice.index_author(author)
+        return authors, []
+
     def __author_not_found(self, id):
         return Response.not_found(f"Author ID '{str(id)}' cannot be found")
 
-    def __author_cache_key(self, id):
-        return "author[{}]".format(str(id) if id else "")
+    def __get_author_view(self, req):
+        """(include_books, fields) from ?include=books and ?fields=, or ValueError"""
+        include = req.args.get("include")
+        if include not in (None, "books"):
+            return ValueError(f"Invalid include: '{include}'")
+        fields = FieldSet.from_args(req.args, Author)
+        if isinstance(fields, ValueError):
+            return fields
+        if include and fields:
+            return ValueError("Fields cannot be combined with include")
+        return include == "books", fields
+
+    def __author_cache_key(self, id, include_books=False, fields=None):
+        key = "author[{}]".format(str(id) if id else "")
+        if include_books:
+            key += "?include=books"
+        return fields.cache_key(key) if fields else key
+
+    def __author_query(self, include_books, fields=None, sort=None):
+        if fields:
+            return fields.query(Author.query, *([sort.column.key] if sort else []))
+        # books are only loaded when asked for, in one extra query for all authors
+        return Author.query.options(selectinload(Author.books)) if include_books else Author.query
+
+    def __serializer(self, include_books, fields=None):
+        if fields:
+            return fields.serialize
+        if not include_books:
+            return serialize_author
+        return lambda author: {**serialize_author(author), "books": serialize_book.many(author.books)}
+
+    def __author_etag(self, id):
+        """ETag of GET /api/v1/authors/<id>, the representation If-Match refers to"""
+        return etag(self.__author_cache_key(id), (tags.author(id),))
 
     def __books_cache_key(self, id):
         return f"books_from[{id}]"
 
-    def __get_author_from_cache(self, id):
+    def __page_response(self, page, query, column, serialize=serialize_author, sort=None):
+        rows, next_cursor = page.fetch(query, column, sort)
+        return Response.success([serialize(row) for row in rows], {"next_cursor": next_cursor})
+
+    def __cached_response(self, key, loader, entry_tags):
+        """Encoded response body from cache, `loader` returns the Response or None if not found"""
         def onmiss(_):
-            return Author.query.get(id)
+            resp = loader()
+            return None if resp is None else resp.encode()
 
-        return cache.get(self.__author_cache_key(id), onmiss)
+        return cache.get(key, onmiss, tags=entry_tags)
 
     def list_authors(self, req):
         """API handler for GET /api/v1/authors"""
-        def onmiss(_):
-            return Author.query.all()
+        sort = Sort.from_args(req.args, SORTS)
+        if isinstance(sort, ValueError):
+            return Response.bad_request(str(sort)).resp()
+        page = Page.from_args(req.args, sort)
+        if isinstance(page, ValueError):
+            return Response.bad_request(str(page)).resp()
+        filters = Filters.from_args(req.args, FILTERS)
+        if isinstance(filters, ValueError):
+            return Response.bad_request(str(filters)).resp()
+        view = self.__get_author_view(req)
+        if isinstance(view, ValueError):
+            return Response.bad_request(str(view)).resp()
+
+        include_books, fields = view
+        serialize = self.__serializer(include_books, fields)
+
+        def query():
+            # built where it runs, a stale entry is reloaded in another thread than the request's
+            return filters.apply(self.__author_query(include_books, fields, sort))
+
+        def loader():
+            if page is None:
+                authors = query().order_by(*sort.order_by(Author.id)).all() if sort else query().all()
+                return Response.success([serialize(author) for author in authors])
+            return self.__page_response(page, query(), Author.id, serialize, sort)
+
+        key = filters.cache_key(self.__author_cache_key(None, include_books, fields))
+        if sort is not None:
+            key = sort.cache_key(key)
+        if page is not None:
+            key = page.cache_key(key)
+        entry_tags = (tags.AUTHORS, tags.BOOKS) if include_books else (tags.AUTHORS,)
+        tag = etag(key, entry_tags)
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+        if page is None and wants_stream(req):
+            return stream_response(query(), Author.id, serialize, sort, etag_headers(tag))
 
-        authors = cache.get(self.__author_cache_key(None), onmiss)
-        return Response.success(sc(authors)).resp()
+        body = self.__cached_response(key, loader, entry_tags)
+        return body_response(req, key, body, entry_tags, tag)
+
+    def export_authors(self, req):
+        """API handler for GET /api/v1/authors/export"""
+        return export_response(req, Author, FILTERS)
 
     def get_author(self, req, id):
         """API handler for GET /api/v1/authors/<id>"""
-        author = self.__get_author_from_cache(id)
-        if not author:
+        view = self.__get_author_view(req)
+        if isinstance(view, ValueError):
+            return Response.bad_request(str(view)).resp()
+
+        include_books, fields = view
+        def loader():
+            query = self.__author_query(include_books, fields)
+            author = query.filter(Author.id == id).first() if fields else query.get(id)
+            return Response.success(self.__serializer(include_books, fields)(author)) if author else None
+
+        key = self.__author_cache_key(id, include_books, fields)
+        entry_tags = (tags.author(id), tags.author_books(id)) if include_books else (tags.author(id),)
+        tag = etag(key, entry_tags)
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+
+        body = self.__cached_response(key, loader, entry_tags)
+        if body is None:
             return self.__author_not_found(id).resp()
 
-        return Response.success(author.to_dict()).resp()
+        return body_response(req, key, body, entry_tags, tag)
 
     def add_new_author(self, req):
         """API handler for POST /api/v1/authors"""
@@ -76,15 +229,55 @@ class AuthorService:
         if isinstance(author, Exception):
             raise author
 
-        db.session.add(author)
-        db.session.commit()
-        return Response.success(author.to_dict()).resp()
+        transact(db.session, lambda session: session.add(author))
+        authorids.add(author.id)
+        cache.invalidate(tags.AUTHORS, tags.author(author.id))
+        searchservice.index_author(author)
+        return Response.success(serialize_author(author)).resp()
+
+    def add_new_authors(self, req):
+        """API handler for POST /api/v1/authors:batch, a list of authors inserted a chunk per
+        transaction. Invalid items are reported by their index and the others are still saved"""
+        items = parse_batch(req.json)
+        if isinstance(items, ValueError):
+            return Response.bad_request(str(items)).resp()
+
+        valid, errors = [], []
+        for index, params in enumerate(items):
+            author = self.__get_author_from_dict(params)
+            if isinstance(author, ValueError):
+                errors.append({"index": index, "message": str(author)})
+            else:
+                valid.append((index, author))
+
+        created = []
+        for chunk in chunks(valid):
+            result = self.__insert_authors(chunk)
+            if isinstance(result, ValueError):
+                result = [], [(index, "Author cannot be saved") for index, _ in chunk]
+            authors, failed = result
+            created.extend(authors)
+            errors.extend({"index": index, "message": message} for index, message in failed)
+
+        errors.sort(key=lambda error: error["index"])
+        return Response.success({"created": serialize_author.many(created), "errors": errors}).resp()
+
+    def import_authors(self, records, skip=0, progress=None):
+        """Import the (record number, params) of `records` a chunk per transaction, see run_import()"""
+        return run_import(records, self.__get_author_from_dict, self.__insert_authors, skip, progress=progress)
+
+    def import_authors_from_request(self, req):
+        """API handler for POST /api/v1/authors:import"""
+        return import_response(req, self.import_authors, "authors")
 
     def update_author(self, req, id):
         """API handler for PUT /api/v1/authors/<id>"""
-        author = self.__get_author_from_cache(id)
+        author = Author.query.get(id)
         if not author:
             return self.__author_not_found(id).resp()
+        resp = precondition_failed(req, self.__author_etag(id))
+        if resp:
+            return resp
 
         params = self.__get_author_from_request(req)
         if isinstance(params, ValueError):
@@ -92,33 +285,120 @@ class AuthorService:
         if isinstance(params, Exception):
             raise params
 
-        author.name = params.name
-        author.bio = params.bio
-        db.session.commit()
-        cache.update(self.__author_cache_key(id), author)
-        return Response.success(author.to_dict()).resp()
+        def write(session):
+            # the author loaded above, unless the write runs in a group commit session
+            author = session.get(Author, id)
+            if author:
+                author.name = params.name
+                author.bio = params.bio
+            return author
+
+        author = transact(db.session, write)
+        if not author:
+            return self.__author_not_found(id).resp()
+        resp = Response.success(serialize_author(author))
+        cache.invalidate(tags.AUTHORS, tags.author(id))
+        cache.update(self.__author_cache_key(id), resp.encode(), tags=(tags.author(id),))
+        searchservice.index_author(author)
+        return Response.from_body(resp.encode(), headers=etag_headers(self.__author_etag(id)))
 
     def delete_author(self, req, id):
         """API handler for DELETE /api/v1/authors/<id>"""
-        author = self.__get_author_from_cache(id)
+        author = Author.query.get(id)
         if not author:
             return self.__author_not_found(id).resp()
+        resp = precondition_failed(req, self.__author_etag(id))
+        if resp:
+            return resp
 
-        db.session.delete(author)
-        db.session.commit()
-        cache.delete(self.__author_cache_key(id))
+        def write(session):
+            author = session.get(Author, id)
+            if not author:
+                return None
+            # books are deleted along with their author
+            book_ids = [book.id for book in author.books]
+            session.delete(author)
+            return book_ids
+
+        book_ids = transact(db.session, write)
+        if book_ids is None:
+            return self.__author_not_found(id).resp()
+        authorids.forget(id)
+        cache.invalidate(tags.AUTHORS, tags.author(id), tags.BOOKS, tags.author_books(id),
+            *[tags.book(book_id) for book_id in book_ids])
+        searchservice.remove_author(id)
+        searchservice.remove_books(*book_ids)
         return Response.success(None).resp()
 
     def list_book_from_author(self, req, id):
         """API handler for GET /api/v1/authors/<id>/books"""
-        author = self.__get_author_from_cache(id)
-        if not author:
+        page = Page.from_args(req.args)
+        if isinstance(page, ValueError):
+            return Response.bad_request(str(page)).resp()
+        fields = FieldSet.from_args(req.args, Book)
+        if isinstance(fields, ValueError):
+            return Response.bad_request(str(fields)).resp()
+
+        serialize = fields.serialize if fields else serialize_book
+
+        def books():
+            # built where it runs, a stale entry is reloaded in another thread than the request's
+            query = Book.query.filter(Book.author_id == id)
+            return fields.query(query) if fields else query
+
+        def loader():
+            if page is None and not fields:
+                author = self.__author_query(True).get(id)
+                return Response.success(serialize_book.many(author.books)) if author else None
+            if not Author.query.get(id):
+                return None
+            if page is None:
+                return Response.success([serialize(book) for book in books().order_by(Book.id).all()])
+            return self.__page_response(page, books(), Book.id, serialize)
+
+        key = self.__books_cache_key(id)
+        if fields:
+            key = fields.cache_key(key)
+        if page is not None:
+            key = page.cache_key(key)
+        entry_tags = (tags.author(id), tags.author_books(id))
+        tag = etag(key, entry_tags)
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+        if page is None and wants_stream(req):
+            if not Author.query.get(id):
+                return self.__author_not_found(id).resp()
+            return stream_response(books(), Book.id, serialize, headers=etag_headers(tag))
+
+        body = self.__cached_response(key, loader, entry_tags)
+        if body is None:
             return self.__author_not_found(id).resp()
 
-        def onmiss(_):
-            return author.books
+        return body_response(req, key, body, entry_tags, tag)
+
+    def bulk_load(self, keys):
+        """Response bodies for many author cache keys with a few batched queries (cache warm-up)"""
+        ids = ids_by_namespace(keys)
+        bodies = {}
+
+        author_ids = ids.get("author", set())
+        if None in author_ids:
+            bodies[self.__author_cache_key(None)] = Response.success(serialize_author.many(Author.query.all())).encode()
+            author_ids.discard(None)
+        if author_ids:
+            for author in Author.query.filter(Author.id.in_(author_ids)).all():
+                bodies[self.__author_cache_key(author.id)] = Response.success(serialize_author(author)).encode()
+
+        books_ids = ids.get("books_from", set()) - {None}
+        if books_ids:
+            found = [row.id for row in db.session.query(Author.id).filter(Author.id.in_(books_ids))]
+            books = {id: [] for id in found}
+            for book in Book.query.filter(Book.author_id.in_(found)).order_by(Book.id).all():
+                books[book.author_id].append(book)
+            for id, author_books in books.items():
+                bodies[self.__books_cache_key(id)] = Response.success(serialize_book.many(author_books)).encode()
 
-        books = cache.get(self.__books_cache_key(id), onmiss)
-        return Response.success(sc(books)).resp()
+        return bodies
 
 authorservice = AuthorService()
@@ -0,0 +1,40 @@
+from services.app import db
+from models.authors import Author
+
+# ids remembered at most, the set starts over when it is full
+MAX_KNOWN_IDS = 100000
+
+
+class AuthorIds:
+    """Ids of the authors known to exist, so validating a book write costs no query for an
+    author seen before. Authors deleted by this process are forgotten right away, a book of an
+    author deleted by another process is still rejected by the books.author_id foreign key"""
+    def __init__(self):
+        self.__known = set()
+
+    def existing(self, ids):
+        """The ids of `ids` that are in the authors table, only the ones not known yet are
+        looked up, in one id-only query"""
+        ids = {id for id in ids if isinstance(id, int) and not isinstance(id, bool)}
+        unknown = ids - self.__known
+        if not unknown:
+            return ids
+        found = {row.id for row in db.session.query(Author.id).filter(Author.id.in_(unknown))}
+        self.add(*found)
+        return (ids - unknown) | found
+
+    def exists(self, id):
+        return bool(self.existing((id,)))
+
+    def add(self, *ids):
+        if len(self.__known) + len(ids) > MAX_KNOWN_IDS:
+            self.__known.clear()
+        self.__known.update(ids)
+
+    def forget(self, *ids):
+        self.__known.difference_update(ids)
+
+    def clear(self):
+        self.__known.clear()
+
+authorids = AuthorIds()
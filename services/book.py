@@ -1,79 +1,233 @@
-from sqlalchemy_serializer import serialize_collection as sc
-from services.app import db, cache, logger
-from models.authors import Author
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from services.app import db, cache, logger, transact
+from services import tags
 from models.books import Book
 from libs.response import Response
 from libs.dateutil import parse_date
+from libs.snapshot import ids_by_namespace
+from libs.pagination import Page, Sort
+from libs.filtering import Filter, Filters, parse_int, parse_day, parse_day_end
+from libs.fieldset import FieldSet
+from libs.serializer import serializer
+from libs.bulk import parse_batch, chunks, bulk_insert
+from libs.importer import run_import
+from services.streaming import wants_stream, stream_response
+from services.search import searchservice
+from services.etag import etag, etag_headers, not_modified, precondition_failed
+from services.compression import body_response
+from services.importer import import_response
+from services.authorids import authorids
+from services.export import export_response
 
 NOT_FOUND_MESSAGE = "Book ID '{}' cannot be found"
 
+# filters and sort orders of GET /api/v1/books, each backed by an index of the books table
+FILTERS = (
+    Filter("author_id", Book.author_id, "eq", parse_int),
+    Filter("published_from", Book.publish_date, "gte", parse_day),
+    Filter("published_to", Book.publish_date, "lt", parse_day_end),
+    Filter("title_prefix", Book.title, "prefix"),
+)
+SORTS = (Book.id, Book.title, Book.publish_date)
+serialize_book = serializer(Book)
+# columns written by POST /api/v1/books:batch
+INSERT_COLUMNS = ("author_id", "title", "description", "publish_date")
+
 
 class BookService:
     def __get_book_from_request(self, req):
         """Validate request params for POST/PUT"""
         try:
-            if not "author_id" in req.json:
-                return ValueError("Missing 'author_id'")
-            if not "title" in req.json:
-                return ValueError("Missing 'title'")
-            if not "description" in req.json:
-                return ValueError("Missing 'description'")
-            if not "publish_date" in req.json:
-                return ValueError("Missing 'publish_date'")
-
-            author_id = req.json["author_id"]
-            title = req.json["title"].strip()
-            description = req.json["description"].strip()
-            publ_date_str = req.json["publish_date"].strip()
-            publish_date = parse_date(publ_date_str[0:10], "%Y-%m-%d")
-            if not title:
-                return ValueError("Title cannot be empty")
-            if len(title) > Book.max_title_length():
-                return ValueError(f"Title too long, max {Book.max_title_length()} chars")
-            if not description:
-                return ValueError("Description cannot be empty")
-            if len(description) > Book.max_description_length():
-                errmsg = f"Description too long, max {Book.max_description_length()} chars"
-                return ValueError(errmsg)
-            if isinstance(publish_date, ValueError):
-                return ValueError(f"Invalid publish date '{publ_date_str}'")
-
-            author = Author.query.get(author_id)
-            if not author:
-                return ValueError(f"Author ID '{author_id}' is not in database")
-
-            return Book(author_id, title, description, publish_date)
+            book = self.__get_book_from_dict(req.json)
+            if isinstance(book, Exception):
+                return book
+
+            if not authorids.exists(book.author_id):
+                return ValueError(f"Author ID '{book.author_id}' is not in database")
+
+            return book
         except Exception as e:
             logger.fatal("Unexpected error in services.BookService.__get_book_from_request: %s", e)
             return e
 
+    def __get_book_from_dict(self, params):
+        """Validate the params of a new or updated book, POST/PUT body or batch item.
+        Whether the author exists is left to the caller"""
+        if not isinstance(params, dict):
+            return ValueError("Book must be a JSON object")
+        if not "author_id" in params:
+            return ValueError("Missing 'author_id'")
+        if not "title" in params:
+            return ValueError("Missing 'title'")
+        if not "description" in params:
+            return ValueError("Missing 'description'")
+        if not "publish_date" in params:
+            return ValueError("Missing 'publish_date'")
+        if not isinstance(params["title"], str):
+            return ValueError("Title must be a string")
+        if not isinstance(params["description"], str):
+            return ValueError("Description must be a string")
+        if not isinstance(params["publish_date"], str):
+            return ValueError("Publish date must be a string")
+
+        author_id = params["author_id"]
+        # e.g. "3" of a form-like client or of a CSV import
+        if isinstance(author_id, str) and author_id.strip().isdigit():
+            author_id = int(author_id)
+        if not isinstance(author_id, int) or isinstance(author_id, bool):
+            return ValueError("Author ID must be an integer")
+        title = params["title"].strip()
+        description = params["description"].strip()
+        publ_date_str = params["publish_date"].strip()
+        publish_date = parse_date(publ_date_str[0:10], "%Y-%m-%d")
+        if not title:
+            return ValueError("Title cannot be empty")
+        if len(title) > Book.max_title_length():
+            return ValueError(f"Title too long, max {Book.max_title_length()} chars")
+        if not description:
+            return ValueError("Description cannot be empty")
+        if len(description) > Book.max_description_length():
+            errmsg = f"Description too long, max {Book.max_description_length()} chars"
+            return ValueError(errmsg)
+        if isinstance(publish_date, ValueError):
+            return ValueError(f"Invalid publish date '{publ_date_str}'")
+
+        return Book(author_id, title, description, publish_date)
+
+    def __insert_books(self, chunk, retry=True):
+        """Insert the (position, book) pairs of `chunk` in one transaction, returns the
+        inserted books and the (position, message) of the books that were not, or
+        ValueError when the transaction failed"""
+        author_ids = authorids.existing({book.author_id for _, book in chunk})
+        valid, failed = [], []
+        for pos, book in chunk:
+            if book.author_id in author_ids:
+                valid.append((pos, book))
+            else:
+                failed.append((pos, f"Author ID '{book.author_id}' is not in database"))
+
+        books = [book for _, book in valid]
+        try:
+            bulk_insert(db.session, Book, books, INSERT_COLUMNS)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if retry and isinstance(e, IntegrityError):
+                # an author was deleted by another process, check the ids in the database again
+                authorids.forget(*author_ids)
+                return self.__insert_books(chunk, False)
+            logger.error("Failed to insert a chunk of %d books: %s", len(books), e)
+            return ValueError("Books cannot be saved")
+
+        cache.invalidate(tags.BOOKS, *[tags.book(book.id) for book in books],
+            *{tags.author_books(book.author_id) for book in books})
+        for book in books:
+            searchservice.index_book(book)
+        return books, failed
+
+    def __transact(self, author_id, write):
+        """Result of the book write `write(session)` once committed, ValueError if its author does
+        not exist after all, i.e. was deleted by another process and the foreign key rejected it"""
+        try:
+            return transact(db.session, write)
+        except IntegrityError:
+            db.session.rollback()
+            authorids.forget(author_id)
+            return ValueError(f"Author ID '{author_id}' is not in database")
+
     def __book_not_found(self, book_id):
         return Response.not_found(f"Book ID '{book_id}' cannot be found")
 
-    def __cache_key(self, book_id):
-        return f"book[{str(book_id) if book_id else ''}]"
+    def __cache_key(self, book_id, fields=None):
+        key = f"book[{str(book_id) if book_id else ''}]"
+        return fields.cache_key(key) if fields else key
+
+    def __book_etag(self, book_id):
+        """ETag of GET /api/v1/books/<id>, the representation If-Match refers to"""
+        return etag(self.__cache_key(book_id), (tags.book(book_id),))
 
-    def __get_book_from_cache(self, book_id):
+    def __cached_response(self, key, loader, entry_tags):
+        """Encoded response body from cache, `loader` returns the Response or None if not found"""
         def onmiss(_):
-            return Book.query.get(book_id)
+            resp = loader()
+            return None if resp is None else resp.encode()
 
-        return cache.get(self.__cache_key(book_id), onmiss)
+        return cache.get(key, onmiss, tags=entry_tags)
 
     def list_books(self, req):
         """API handler for GET /api/v1/books"""
-        def onmiss(_):
-            return Book.query.all()
+        sort = Sort.from_args(req.args, SORTS)
+        if isinstance(sort, ValueError):
+            return Response.bad_request(str(sort)).resp()
+        page = Page.from_args(req.args, sort)
+        if isinstance(page, ValueError):
+            return Response.bad_request(str(page)).resp()
+        filters = Filters.from_args(req.args, FILTERS)
+        if isinstance(filters, ValueError):
+            return Response.bad_request(str(filters)).resp()
+        fields = FieldSet.from_args(req.args, Book)
+        if isinstance(fields, ValueError):
+            return Response.bad_request(str(fields)).resp()
+
+        serialize = fields.serialize if fields else serialize_book
 
-        books = cache.get(self.__cache_key(id), onmiss)
-        return Response.success(sc(books)).resp()
+        def query():
+            # built where it runs, a stale entry is reloaded in another thread than the request's
+            books = fields.query(Book.query, *([sort.column.key] if sort else [])) if fields else Book.query
+            return filters.apply(books)
+
+        def loader():
+            if page is None:
+                books = query().order_by(*sort.order_by(Book.id)).all() if sort else query().all()
+                return Response.success([serialize(book) for book in books])
+            books, next_cursor = page.fetch(query(), Book.id, sort)
+            return Response.success([serialize(book) for book in books], {"next_cursor": next_cursor})
+
+        key = filters.cache_key(self.__cache_key(None, fields))
+        if sort is not None:
+            key = sort.cache_key(key)
+        if page is not None:
+            key = page.cache_key(key)
+        entry_tags = (tags.BOOKS,)
+        tag = etag(key, entry_tags)
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+        if page is None and wants_stream(req):
+            return stream_response(query(), Book.id, serialize, sort, etag_headers(tag))
+
+        body = self.__cached_response(key, loader, entry_tags)
+        return body_response(req, key, body, entry_tags, tag)
+
+    def export_books(self, req):
+        """API handler for GET /api/v1/books/export"""
+        return export_response(req, Book, FILTERS)
 
     def get_book(self, req, book_id):
         """API handler for GET /api/v1/books/<id>"""
-        book = self.__get_book_from_cache(book_id)
-        if not book:
+        fields = FieldSet.from_args(req.args, Book)
+        if isinstance(fields, ValueError):
+            return Response.bad_request(str(fields)).resp()
+
+        def loader():
+            if fields:
+                book = fields.query(Book.query).filter(Book.id == book_id).first()
+                return Response.success(fields.serialize(book)) if book else None
+            book = Book.query.get(book_id)
+            return Response.success(serialize_book(book)) if book else None
+
+        key = self.__cache_key(book_id, fields)
+        entry_tags = (tags.book(book_id),)
+        tag = etag(key, entry_tags)
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+
+        body = self.__cached_response(key, loader, entry_tags)
+        if body is None:
             return self.__book_not_found(book_id).resp()
 
-        return Response.success(book.to_dict()).resp()
+        return body_response(req, key, body, entry_tags, tag)
 
     def add_new_book(self, req):
         """API handler for POST /api/v1/books"""
@@ -83,15 +237,56 @@ class BookService:
         if isinstance(book, Exception):
             raise book
 
-        db.session.add(book)
-        db.session.commit()
-        return Response.success(book.to_dict()).resp()
+        error = self.__transact(book.author_id, lambda session: session.add(book))
+        if isinstance(error, ValueError):
+            return Response.bad_request(str(error)).resp()
+        cache.invalidate(tags.BOOKS, tags.book(book.id), tags.author_books(book.author_id))
+        searchservice.index_book(book)
+        return Response.success(serialize_book(book)).resp()
+
+    def add_new_books(self, req):
+        """API handler for POST /api/v1/books:batch, a list of books inserted a chunk per
+        transaction. Invalid items are reported by their index and the others are still saved"""
+        items = parse_batch(req.json)
+        if isinstance(items, ValueError):
+            return Response.bad_request(str(items)).resp()
+
+        valid, errors = [], []
+        for index, params in enumerate(items):
+            book = self.__get_book_from_dict(params)
+            if isinstance(book, ValueError):
+                errors.append({"index": index, "message": str(book)})
+            else:
+                valid.append((index, book))
+
+        created = []
+        for chunk in chunks(valid):
+            result = self.__insert_books(chunk)
+            if isinstance(result, ValueError):
+                result = [], [(index, "Book cannot be saved") for index, _ in chunk]
+            books, failed = result
+            created.extend(books)
+            errors.extend({"index": index, "message": message} for index, message in failed)
+
+        errors.sort(key=lambda error: error["index"])
+        return Response.success({"created": serialize_book.many(created), "errors": errors}).resp()
+
+    def import_books(self, records, skip=0, progress=None):
+        """Import the (record number, params) of `records` a chunk per transaction, see run_import()"""
+        return run_import(records, self.__get_book_from_dict, self.__insert_books, skip, progress=progress)
+
+    def import_books_from_request(self, req):
+        """API handler for POST /api/v1/books:import"""
+        return import_response(req, self.import_books, "books")
 
     def update_book(self, req, book_id):
         """API handler for PUT /api/v1/books/<id>"""
-        book = self.__get_book_from_cache(book_id)
+        book = Book.query.get(book_id)
         if not book:
             return self.__book_not_found(book_id).resp()
+        resp = precondition_failed(req, self.__book_etag(book_id))
+        if resp:
+            return resp
 
         params = self.__get_book_from_request(req)
         if isinstance(params, ValueError):
@@ -99,23 +294,62 @@ class BookService:
         if isinstance(params, Exception):
             raise params
 
-        book.author_id = params.author_id
-        book.title = params.title
-        book.description = params.description
-        book.publish_date = params.publish_date
-        db.session.commit()
-        cache.update(self.__cache_key(book_id), book)
-        return Response.success(book.to_dict()).resp()
+        old_author_id = book.author_id
+
+        def write(session):
+            # the book loaded above, unless the write runs in a group commit session
+            book = session.get(Book, book_id)
+            if book:
+                book.author_id = params.author_id
+                book.title = params.title
+                book.description = params.description
+                book.publish_date = params.publish_date
+            return book
+
+        book = self.__transact(params.author_id, write)
+        if isinstance(book, ValueError):
+            return Response.bad_request(str(book)).resp()
+        if not book:
+            return self.__book_not_found(book_id).resp()
+        resp = Response.success(serialize_book(book))
+        cache.invalidate(tags.BOOKS, tags.book(book_id),
+            tags.author_books(old_author_id), tags.author_books(book.author_id))
+        cache.update(self.__cache_key(book_id), resp.encode(), tags=(tags.book(book_id),))
+        searchservice.index_book(book)
+        return Response.from_body(resp.encode(), headers=etag_headers(self.__book_etag(book_id)))
 
     def delete_book(self, req, book_id):
         """API handler for DELETE /api/v1/books/<id>"""
-        book = self.__get_book_from_cache(book_id)
+        book = Book.query.get(book_id)
         if not book:
             return self.__book_not_found(book_id).resp()
+        resp = precondition_failed(req, self.__book_etag(book_id))
+        if resp:
+            return resp
 
-        db.session.delete(book)
-        db.session.commit()
-        cache.delete(self.__cache_key(book_id))
+        def write(session):
+            book = session.get(Book, book_id)
+            if book:
+                session.delete(book)
+            return book
+
+        book = transact(db.session, write)
+        if not book:
+            return self.__book_not_found(book_id).resp()
+        cache.invalidate(tags.BOOKS, tags.book(book_id), tags.author_books(book.author_id))
+        searchservice.remove_books(book_id)
         return Response.success(None).resp()
 
+    def bulk_load(self, keys):
+        """Response bodies for many book cache keys with a few batched queries (cache warm-up)"""
+        book_ids = ids_by_namespace(keys).get("book", set())
+        bodies = {}
+        if None in book_ids:
+            bodies[self.__cache_key(None)] = Response.success(serialize_book.many(Book.query.all())).encode()
+            book_ids.discard(None)
+        if book_ids:
+            for book in Book.query.filter(Book.id.in_(book_ids)).all():
+                bodies[self.__cache_key(book.id)] = Response.success(serialize_book(book)).encode()
+        return bodies
+
 bookservice = BookService()
@@ -0,0 +1,29 @@
+from hashlib import blake2b
+from services.app import cache
+from services.etag import etag_headers
+from libs.compression import compress, negotiate
+from libs.response import Response
+
+# smaller bodies are sent as they are, compressing them costs more than it saves
+COMPRESS_MIN_BYTES = 1024
+
+
+def is_compressed_key(key):
+    """Whether `key` is the cache key of a compressed copy of another body"""
+    return "#" in str(key)
+
+
+def body_response(req, key, body, entry_tags, tag):
+    """Response of the body cached under `key`, compressed when the client accepts it and
+    the body is big enough. Compressed bodies are cached next to it, once per version"""
+    encoding = negotiate(req.accept_encodings) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding is None:
+        return Response.from_body(body, headers={"Vary": "Accept-Encoding", **(etag_headers(tag) or {})})
+
+    # the ETag, or else a digest of `body`, in the key ties the compressed body to the version of `body`
+    version = tag or blake2b(body, digest_size=16).hexdigest()
+    data = cache.get(f"{key}#{encoding}#{version}", lambda _: compress(body, encoding), tags=entry_tags)
+    headers = {"Vary": "Accept-Encoding", "Content-Encoding": encoding}
+    # a strong ETag differs for every content coding of the same version
+    headers.update(etag_headers(tag and f"{tag}-{encoding}") or {})
+    return Response.from_body(data, headers=headers)
@@ -0,0 +1,52 @@
+from hashlib import sha1
+from services.app import cache
+from libs.compression import ENCODINGS
+from libs.response import Response
+from libs.sharedcache import SharedCache
+
+
+def versions_shared():
+    """Whether tag versions follow every write. A per-process cache only counts the writes
+    of its own process, not those of other workers or of `flask import`"""
+    return isinstance(cache, SharedCache)
+
+
+def etag(key, entry_tags):
+    """Strong ETag of the response cached under `key` with `entry_tags`. It is derived from
+    the versions of the tags, bumped by every write, so no load or serialization is needed.
+    None without the shared cache server, or when its versions are unavailable"""
+    if not versions_shared():
+        return None
+    version = cache.version(*entry_tags)
+    if version is None:
+        return None
+    return sha1(f"{key}|{version}".encode()).hexdigest()
+
+
+def etag_headers(tag):
+    return {"ETag": f'"{tag}"'} if tag else None
+
+
+def variants(tag):
+    """ETags of every content coding of the version `tag` (see services.compression)"""
+    return [tag] + [f"{tag}-{encoding}" for encoding in ENCODINGS]
+
+
+def not_modified(req, tag):
+    """304 response when If-None-Match has the current ETag, otherwise None"""
+    if tag is None:
+        return None
+    for variant in variants(tag):
+        if req.if_none_match.contains_weak(variant):
+            return "", 304, etag_headers(variant)
+    return None
+
+
+def precondition_failed(req, tag):
+    """412 response when If-Match is given without the current ETag, otherwise None.
+    If-Match is ignored without the shared cache server, no ETags are sent then"""
+    if ("If-Match" not in req.headers) or not versions_shared():
+        return None
+    if tag is not None and any(req.if_match.contains(variant) for variant in variants(tag)):
+        return None
+    return Response.error(412, "Resource has been modified, If-Match does not match its ETag").resp()
@@ -0,0 +1,36 @@
+from flask import stream_with_context
+from sqlalchemy import select
+from services.app import db
+from libs.response import Response
+from libs.filtering import Filter, Filters, parse_int
+from libs.export import FORMATS, export_chunks
+from libs.serializer import serializer
+
+# rows fetched from the server-side cursor per round trip
+EXPORT_CHUNK_SIZE = 1000
+
+
+def export_response(req, model, filters=()):
+    """Streamed NDJSON or CSV (`?format=`) of every row of `model` matching `filters` and the
+    inclusive `id_from`/`id_to` bounds, in id order. Rows are read as plain tuples from a
+    server-side cursor EXPORT_CHUNK_SIZE at a time, so memory use does not grow with the table"""
+    format = req.args.get("format", "ndjson")
+    if format not in FORMATS:
+        return Response.bad_request(f"Format must be one of {', '.join(FORMATS)}").resp()
+    id_filters = (Filter("id_from", model.id, "gte", parse_int), Filter("id_to", model.id, "lte", parse_int))
+    filters = Filters.from_args(req.args, tuple(filters) + id_filters)
+    if isinstance(filters, ValueError):
+        return Response.bad_request(str(filters)).resp()
+
+    names = model.serialize_only
+    stmt = filters.apply(select(*[getattr(model, name) for name in names])).order_by(model.id)
+
+    def partitions():
+        result = db.session.execute(stmt, execution_options={"stream_results": True, "yield_per": EXPORT_CHUNK_SIZE})
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    body = stream_with_context(export_chunks(format, partitions(), names, serializer(model).from_tuple))
+    return body, 200, {"Content-Type": FORMATS[format]}
@@ -0,0 +1,23 @@
+from services.app import logger
+from libs.response import Response
+from libs.importer import MIMETYPES, read_records, text_stream
+
+
+def import_response(req, run, name):
+    """Response of the import of the request body, NDJSON or CSV as told by its content type,
+    by `run(records, skip, progress)`. `?skip=` resumes an import from its last checkpoint"""
+    format = MIMETYPES.get(req.mimetype)
+    if format is None:
+        return Response.error(415, f"Content type must be one of {', '.join(MIMETYPES)}").resp()
+    skip_str = req.args.get("skip", "0")
+    if not skip_str.strip().isdigit():
+        return Response.bad_request(f"Invalid skip: '{skip_str}'").resp()
+
+    def progress(summary):
+        logger.info("Importing %s: checkpoint %d, %d created, %d failed",
+            name, summary["checkpoint"], summary["created"], summary["failed"])
+
+    summary = run(read_records(text_stream(req.stream), format), int(skip_str), progress)
+    if "error" in summary:
+        return Response(400, summary.pop("error"), summary).resp()
+    return Response.success(summary).resp()
@@ -0,0 +1,90 @@
+from services.app import db, logger
+from models.authors import Author
+from models.books import Book
+from libs.response import Response
+from libs.search import SearchIndex
+from libs.serializer import serializer
+from services import tags
+from services.etag import etag, etag_headers, not_modified
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# rows read from the database per round trip while building an index
+BUILD_CHUNK_SIZE = 1000
+
+
+class SearchService:
+    """Full-text search over books and authors. Each process keeps its own index, built from
+    the database on the first search and then updated by the writes of this process"""
+    def __init__(self):
+        self.books = SearchIndex({"title": 3.0, "description": 1.0})
+        self.authors = SearchIndex({"name": 3.0, "bio": 1.0})
+
+    def __document(self, index, obj):
+        return {field: getattr(obj, field) for field in index.fields}
+
+    def __ensure_built(self, index, model):
+        if index.ready:
+            return
+        # writes wait for the index lock, so none is lost between the read and the rebuild
+        with index.lock:
+            if index.ready:
+                return
+            columns = [getattr(model, field) for field in index.fields]
+            rows = db.session.query(model.id, *columns).yield_per(BUILD_CHUNK_SIZE)
+            index.rebuild((row.id, self.__document(index, row)) for row in rows)
+            logger.info("Built %s search index of %d documents", model.__tablename__, len(index))
+
+    def __get_search_params(self, req):
+        query = req.args.get("q", "").strip()
+        if not query:
+            return ValueError("Missing 'q'")
+
+        limit_str = req.args.get("limit", str(DEFAULT_LIMIT))
+        if not limit_str.strip().isdigit() or not 1 <= int(limit_str) <= MAX_LIMIT:
+            return ValueError(f"Limit must be between 1 and {MAX_LIMIT}")
+        return query, int(limit_str)
+
+    def __search(self, req, index, model, entry_tag):
+        params = self.__get_search_params(req)
+        if isinstance(params, ValueError):
+            return Response.bad_request(str(params)).resp()
+        tag = etag(f"search:{model.__tablename__}?q={params[0]}&limit={params[1]}", (entry_tag,))
+        resp = not_modified(req, tag)
+        if resp:
+            return resp
+
+        self.__ensure_built(index, model)
+        ranked = index.search(*params)
+        if not ranked:
+            return Response.from_body(Response.success([]).encode(), headers=etag_headers(tag))
+
+        rows = {row.id: row for row in model.query.filter(model.id.in_([id for id, _ in ranked])).all()}
+        # rows deleted by another process since the index was built are skipped
+        serialize = serializer(model)
+        data = [{**serialize(rows[id]), "score": round(score, 4)} for id, score in ranked if id in rows]
+        return Response.from_body(Response.success(data).encode(), headers=etag_headers(tag))
+
+    def search_books(self, req):
+        """API handler for GET /api/v1/books/search"""
+        return self.__search(req, self.books, Book, tags.BOOKS)
+
+    def search_authors(self, req):
+        """API handler for GET /api/v1/authors/search"""
+        return self.__search(req, self.authors, Author, tags.AUTHORS)
+
+    def index_book(self, book):
+        self.books.add(book.id, self.__document(self.books, book))
+
+    def remove_books(self, *book_ids):
+        for book_id in book_ids:
+            self.books.remove(book_id)
+
+    def index_author(self, author):
+        self.authors.add(author.id, self.__document(self.authors, author))
+
+    def remove_author(self, id):
+        self.authors.remove(id)
+
+searchservice = SearchService()
@@ -0,0 +1,19 @@
+from flask import stream_with_context
+from libs.response import Response, JSON_HEADERS
+
+# rows fetched from the database per round trip while streaming
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(req):
+    """Whether the client asked for a streamed list with ?stream=1"""
+    return req.args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def stream_response(query, column, serialize=lambda row: row.to_dict(), sort=None, headers=None):
+    """Streamed response listing every row of `query` ordered by `sort` or `column`, fetched
+    STREAM_CHUNK_SIZE rows at a time and encoded while being sent. Not cached"""
+    query = query.order_by(*sort.order_by(column)) if sort else query.order_by(column)
+    rows = query.yield_per(STREAM_CHUNK_SIZE)
+    body = stream_with_context(Response.stream(rows, serialize))
+    return body, 200, {**JSON_HEADERS, **headers} if headers else JSON_HEADERS
@@ -0,0 +1,16 @@
+"""Cache tags shared by the author and book services, a write invalidates the tags it affects"""
+
+AUTHORS = "authors"
+BOOKS = "books"
+
+
+def author(id):
+    return f"author:{id}"
+
+
+def book(id):
+    return f"book:{id}"
+
+
+def author_books(id):
+    return f"author_books:{id}"
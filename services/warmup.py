@@ -0,0 +1,38 @@
+import atexit
+from libs.config import config
+from libs.snapshot import save_snapshot, start_preload
+from services.app import app, cache, logger
+from services.author import authorservice
+from services.book import bookservice
+from services.compression import is_compressed_key
+
+
+SNAPSHOT_KEYS = 1000
+
+
+def refetch(keys):
+    """Reload cache values for snapshot keys from the database in bulk"""
+    bodies = authorservice.bulk_load(keys)
+    bodies.update(bookservice.bulk_load(keys))
+    return bodies
+
+
+def save():
+    try:
+        # compressed copies are made again from the refetched bodies
+        saved = save_snapshot(cache, config.cache_snapshot, SNAPSHOT_KEYS, lambda key: not is_compressed_key(key))
+        logger.info("Saved %d cache entries to %s", saved, config.cache_snapshot)
+    except Exception as e:
+        logger.error("Cannot save cache snapshot: %s", e)
+
+
+def init_warmup():
+    """Preload the cache snapshot in the background and save a new one at exit"""
+    if not config.cache_snapshot:
+        return None
+
+    def onerror(e):
+        logger.error("Cannot preload cache snapshot: %s", e)
+
+    atexit.register(save)
+    return start_preload(cache, config.cache_snapshot, refetch, app.app_context, onerror)
@@ -0,0 +1,52 @@
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.orm import declarative_base, Session
+from libs.bulk import bulk_insert, chunks, parse_batch
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+
+    def test_parse_batch(self):
+        self.assertEqual(parse_batch([1, 2]), [1, 2])
+        self.assertIsInstance(parse_batch({"a": 1}), ValueError)
+        self.assertIsInstance(parse_batch([]), ValueError)
+        self.assertIsInstance(parse_batch([1, 2, 3], max_size=2), ValueError)
+
+    def test_chunks(self):
+        self.assertEqual(list(chunks(list(range(5)), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunks([], 2)), [])
+
+    def insert(self, session):
+        session.add(Item(name="existing"))
+        session.flush()
+        items = [Item(name=f"item {i}") for i in range(5)]
+        bulk_insert(session, Item, items, ("name",))
+        session.commit()
+        self.assertEqual([item.id for item in items], [2, 3, 4, 5, 6])
+        # the values written are still there after the commit, without another query
+        self.assertEqual(items[4].name, "item 4")
+        rows = session.query(Item.id, Item.name).order_by(Item.id).all()
+        self.assertEqual([tuple(row) for row in rows][1:], [(i + 2, f"item {i}") for i in range(5)])
+
+    def test_bulk_insert(self):
+        with Session(self.engine) as session:
+            self.insert(session)
+
+    def test_bulk_insert_without_returning(self):
+        with mock.patch.object(self.engine.dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+            with Session(self.engine) as session:
+                self.insert(session)
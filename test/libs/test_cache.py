@@ -1,5 +1,8 @@
+import threading
+import time
 import unittest
-from libs.cache import Cache
+from unittest import mock
+from libs.cache import Cache, ConcurrentCache, SingleFlight, TagVersions, sizeof, start_expiry_thread
 
 
 class TestCache(unittest.TestCase):
@@ -98,3 +101,321 @@ class TestCache(unittest.TestCase):
         cache.delete(100)
         cache.enable()
         self.assertEqual(cache.get(100, onmiss), "dummy")
+
+    @mock.patch("libs.cache.time.monotonic")
+    def test_ttl(self, mock_time):
+        def onmiss(k):
+            return "default"
+
+        def dummy(k):
+            return "dummy"
+
+        mock_time.return_value = 1000
+        cache = Cache(10, 4, ttl=60)
+        self.assertEqual(cache.get(100, onmiss), "default")
+        self.assertEqual(cache.get(200, onmiss, ttl=5), "default")
+        cache.update(300, "no expiry", ttl=0)
+
+        mock_time.return_value = 1010
+        self.assertEqual(cache.get(100, dummy), "default")
+        self.assertEqual(cache.get(200, dummy), "dummy")
+
+        mock_time.return_value = 5000
+        self.assertEqual(cache.get(300, dummy), "no expiry")
+        self.assertEqual(cache.purge_expired(), 2)
+        self.assertEqual(cache.get(100, dummy), "dummy")
+
+    def test_concurrent_cache(self):
+        cache = ConcurrentCache(100, 20, policy="lru", stripes=4)
+        loads = []
+
+        def onmiss(k):
+            loads.append(k)
+            return f"value {k}"
+
+        def worker(offset):
+            for i in range(2000):
+                k = (i * 7 + offset) % 150
+                self.assertEqual(cache.get(k, onmiss), f"value {k}")
+                if i % 10 == 0:
+                    cache.update(k, f"value {k}")
+                if i % 15 == 0:
+                    cache.delete(k)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertLess(len(loads), 8 * 2000)
+        cache.disable()
+        self.assertFalse(cache.enabled)
+        self.assertEqual(cache.get(1, lambda k: "dummy"), "dummy")
+        cache.enable()
+        self.assertTrue(cache.enabled)
+
+    def test_expiry_thread(self):
+        cache = ConcurrentCache(100, 20, ttl=0.01, stripes=2)
+        cache.update(1, "value")
+        start_expiry_thread(cache, 0.01)
+        time.sleep(0.1)
+        self.assertEqual(cache.purge_expired(), 0)
+        self.assertEqual(cache.get(1, lambda k: "dummy"), "dummy")
+
+    def test_invalidate_tags(self):
+        def dummy(k):
+            return "dummy"
+
+        cache = Cache(10, 4)
+        cache.update("author[]", "all authors", tags=["authors"])
+        cache.update("author[1]", "author 1", tags=["author:1"])
+        cache.update("books_from[1]", "books of author 1", tags=["author:1", "author_books:1"])
+
+        self.assertEqual(cache.invalidate("authors"), 1)
+        self.assertEqual(cache.get("author[]", dummy), "dummy")
+        self.assertEqual(cache.get("author[1]", dummy), "author 1")
+
+        self.assertEqual(cache.invalidate("author:1", "unknown"), 2)
+        self.assertEqual(cache.get("author[1]", dummy), "dummy")
+        self.assertEqual(cache.get("books_from[1]", dummy), "dummy")
+        self.assertEqual(cache.invalidate("author_books:1"), 0)
+
+        # a load racing with an invalidation must not be cached
+        def stale(k):
+            cache.invalidate("books")
+            return "stale"
+
+        self.assertEqual(cache.get("book[]", stale, tags=["books"]), "stale")
+        self.assertEqual(cache.get("book[]", dummy, tags=["books"]), "dummy")
+
+        # the same for a value loaded by the caller, e.g. a shared cache client
+        for c in (cache, ConcurrentCache(10, 4, stripes=2)):
+            epoch = c.epoch("book[1]")
+            c.invalidate("book:1")
+            c.update("book[1]", "stale", tags=["book:1"], epoch=epoch)
+            self.assertEqual(c.lookup("book[1]"), (False, None))
+            c.update("book[1]", "fresh", tags=["book:1"], epoch=c.epoch("book[1]"))
+            self.assertEqual(c.lookup("book[1]"), (True, "fresh"))
+
+    def test_single_flight(self):
+        cache = Cache(10, 4)
+        loads = []
+        results = []
+        release = threading.Event()
+
+        def slow(k):
+            loads.append(k)
+            release.wait(5)
+            return "loaded"
+
+        def worker():
+            results.append(cache.get("author[]", slow))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(loads, ["author[]"])
+        self.assertEqual(results, ["loaded"] * 8)
+
+    def test_single_flight_error_and_timeout(self):
+        flights = SingleFlight(timeout=5)
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError("db down")
+
+        def worker():
+            try:
+                flights.do("book[1]", failing)
+            except Exception as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.02)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, ["db down"] * 3)
+        self.assertFalse(flights.in_flight("book[1]"))
+
+        flights = SingleFlight(timeout=0.02)
+        leader = threading.Thread(target=flights.do, args=("book[1]", lambda: time.sleep(0.2)))
+        leader.start()
+        time.sleep(0.02)
+        with self.assertRaises(TimeoutError):
+            flights.do("book[1]", lambda: "never called")
+        leader.join()
+
+    @mock.patch("libs.cache.time.monotonic")
+    def test_stale_while_revalidate(self, mock_time):
+        refreshed = threading.Event()
+
+        def refresh(k):
+            refreshed.set()
+            return "fresh"
+
+        mock_time.return_value = 1000
+        cache = Cache(10, 4, ttl=60, stale_ttl=30)
+        cache.update("book[]", "old")
+
+        mock_time.return_value = 1070
+        self.assertEqual(cache.get("book[]", refresh), "old")
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(100):
+            if cache.get("book[]", lambda k: "dummy") == "fresh":
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("book[]", lambda k: "dummy"), "fresh")
+
+        # past the stale window the value is loaded synchronously
+        mock_time.return_value = 1200
+        self.assertEqual(cache.get("book[]", lambda k: "reloaded"), "reloaded")
+
+    @mock.patch("libs.cache.time.monotonic")
+    def test_negative_cache(self, mock_time):
+        loads = []
+
+        def missing(k):
+            loads.append(k)
+            return None
+
+        mock_time.return_value = 1000
+        cache = Cache(10, 4, negative_ttl=30, negative_max_keys=2)
+        self.assertIsNone(cache.get("author[1]", missing, tags=["author:1"]))
+        self.assertIsNone(cache.get("author[1]", missing, tags=["author:1"]))
+        self.assertEqual(loads, ["author[1]"])
+        self.assertEqual(cache.lookup("author[1]"), (True, None))
+
+        # a created id invalidates its negative entry
+        cache.invalidate("author:1")
+        self.assertEqual(cache.lookup("author[1]"), (False, None))
+        self.assertEqual(cache.get("author[1]", lambda k: "found"), "found")
+
+        # negative entries are bounded on their own, and expire with negative_ttl
+        for k in ["author[2]", "author[3]", "author[4]"]:
+            cache.get(k, missing)
+        self.assertEqual(cache.lookup("author[2]"), (False, None))
+        self.assertEqual(cache.lookup("author[4]"), (True, None))
+        self.assertEqual(cache.lookup("author[1]"), (True, "found"))
+        mock_time.return_value = 1031
+        self.assertEqual(cache.lookup("author[4]"), (False, None))
+
+        stats = cache.stats()
+        self.assertEqual(stats["negative_entries"], 1)
+        self.assertEqual(stats["negative_hits"], 3)
+        self.assertEqual(stats["negative_misses"], 4)
+        self.assertEqual(stats["negative_hit_rate"], 3 / 7)
+
+    def test_negative_cache_disabled(self):
+        cache = ConcurrentCache(10, 4, stripes=2)
+        self.assertIsNone(cache.get("author[1]", lambda k: None))
+        self.assertEqual(cache.get("author[1]", lambda k: "found"), "found")
+        cache.update("author[2]", None)
+        self.assertEqual(cache.lookup("author[2]"), (False, None))
+        self.assertEqual(cache.stats()["negative_misses"], 0)
+
+    def test_max_bytes(self):
+        for policy in ["least_hits", "lru", "lfu", "wtinylfu"]:
+            cache = Cache(100, 10, policy=policy, max_bytes=5000)
+            for i in range(20):
+                cache.update(f"book[{i}]", "x" * 1000)
+            cache.update("author[1]", "y" * 100)
+
+            stats = cache.stats()
+            self.assertLessEqual(stats["bytes"], 5000, policy)
+            self.assertLessEqual(stats["entries"], 4, policy)
+            self.assertGreater(stats["evictions"], 0, policy)
+            self.assertGreater(stats["namespaces"]["author"]["bytes"], 100, policy)
+
+            # entries bigger than the whole budget are not cached
+            cache.update("book[]", "z" * 10000)
+            self.assertEqual(cache.get("book[]", lambda k: "dummy"), "dummy")
+
+        cache = Cache(100, 10, policy="lru", max_bytes=5000)
+        cache.update("book[1]", "x" * 1000)
+        cache.update("book[2]", "x" * 1000)
+        cache.delete("book[1]")
+        cache.invalidate()
+        self.assertEqual(cache.stats()["namespaces"]["book"]["entries"], 1)
+        self.assertLess(cache.stats()["bytes"], 1500)
+        cache.delete("book[2]")
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+        # a value too big to cache replaces the cached one all the same
+        cache = Cache(100, 10, max_bytes=2000)
+        cache.update("book[1]", "small")
+        cache.update("book[1]", "x" * 5000)
+        self.assertEqual(cache.lookup("book[1]"), (False, None))
+        self.assertEqual(cache.stats()["oversized"], 1)
+
+        # negative entries don't count against the budget, they can't push out positive ones
+        cache = Cache(100, 10, max_bytes=3000, negative_ttl=60, negative_max_keys=100)
+        for i in range(5):
+            cache.update(f"book[{i}]", "x" * 100)
+        for i in range(50):
+            cache.get(f"author[{i}]", lambda k: None)
+        cache.update("book[5]", "x" * 100)
+        self.assertEqual(cache.stats()["entries"], 6)
+        self.assertEqual(cache.stats()["negative_entries"], 50)
+
+    def test_max_bytes_shared_by_stripes(self):
+        cache = ConcurrentCache(1000, 100, stripes=4, max_bytes=20000)
+        # bigger than the share of a stripe, not than the whole budget
+        cache.update("book[]", "x" * 8000)
+        self.assertEqual(cache.lookup("book[]"), (True, "x" * 8000))
+
+        for i in range(100):
+            cache.update(f"book[{i}]", "y" * 1000)
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 20000)
+        self.assertGreater(stats["entries"], 10)
+        self.assertGreater(stats["evictions"], 0)
+
+        cache.update("book[]", "z" * 30000)
+        self.assertEqual(cache.lookup("book[]"), (False, None))
+        self.assertEqual(cache.stats()["oversized"], 1)
+
+    def test_sizeof(self):
+        self.assertGreater(sizeof("x" * 1000), 1000)
+        self.assertGreater(sizeof({"data": ["x" * 1000]}), 1000)
+        self.assertGreater(sizeof(("x" * 500, "y" * 500)), 1000)
+
+    def test_version(self):
+        for cache in (Cache(10, 2), ConcurrentCache(16, 4, stripes=4)):
+            v1 = cache.version("a", "b")
+            self.assertEqual(cache.version("a", "b"), v1)
+            cache.invalidate("b")
+            v2 = cache.version("a", "b")
+            self.assertNotEqual(v2, v1)
+            self.assertEqual(cache.version("a"), cache.version("a"))
+            self.assertEqual(cache.version("c"), cache.version("c"))
+
+            # versions follow writes even while the cache is disabled
+            cache.disable()
+            cache.invalidate("a")
+            self.assertNotEqual(cache.version("a", "b"), v2)
+
+        # a restarted process must not hand out versions of the old one
+        self.assertNotEqual(Cache(10, 2).version("a"), Cache(10, 2).version("a"))
+
+    def test_tag_versions_bounded(self):
+        versions = TagVersions(max_tags=3)
+        versions.bump(["a", "b"])
+        v1 = versions.version("a", "c")
+        versions.bump(["c"])
+        v2 = versions.version("a", "c")
+        self.assertNotEqual(v2, v1)
+        # one tag too many drops every counter, and changes every version
+        versions.bump(["d"])
+        self.assertNotIn(versions.version("a", "c"), (v1, v2))
+        self.assertTrue(versions.version("a", "c").endswith(".0.0"))
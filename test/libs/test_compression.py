@@ -0,0 +1,29 @@
+import gzip
+import unittest
+from werkzeug.http import parse_accept_header
+from libs.compression import ENCODINGS, compress, negotiate
+
+
+class TestCompression(unittest.TestCase):
+    def test_negotiate(self):
+        encodings = ["br", "gzip"]
+        examples = [
+            ("", None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("gzip, deflate, br", "br"),
+            ("br;q=0.5, gzip", "gzip"),
+            ("br;q=0, *", "gzip"),
+            ("*;q=0", None),
+        ]
+        for header, expected in examples:
+            self.assertEqual(negotiate(parse_accept_header(header), encodings), expected, header)
+
+    def test_compress(self):
+        body = '{"data": [' + ", ".join(['{"title": "Some Title"}'] * 100) + "]}"
+        for encoding in ENCODINGS:
+            data = compress(body, encoding)
+            self.assertLess(len(data), len(body))
+            self.assertEqual(compress(body.encode(), encoding), data)
+        self.assertEqual(gzip.decompress(compress(body, "gzip")).decode(), body)
+        self.assertRaises(ValueError, compress, body, "deflate")
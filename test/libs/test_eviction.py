@@ -0,0 +1,102 @@
+import unittest
+from libs.cache import Cache
+from libs.eviction import LeastHitsPolicy, LRUPolicy, LFUPolicy, WTinyLFUPolicy, make_policy
+
+
+class TestEviction(unittest.TestCase):
+    def test_make_policy(self):
+        self.assertIsInstance(make_policy("least_hits", 10, 3), LeastHitsPolicy)
+        self.assertIsInstance(make_policy("lru", 10, 3), LRUPolicy)
+        self.assertIsInstance(make_policy("lfu", 10, 3), LFUPolicy)
+        self.assertIsInstance(make_policy("wtinylfu", 10, 3), WTinyLFUPolicy)
+        with self.assertRaises(ValueError):
+            make_policy("random", 10, 3)
+
+    def test_least_hits(self):
+        policy = LeastHitsPolicy(3, 2)
+        for k in ["a", "b", "c"]:
+            self.assertEqual(policy.insert(k), [])
+        policy.access("a")
+        policy.access("c")
+        self.assertEqual(policy.insert("d"), ["b", "a"])
+
+    def test_lru(self):
+        policy = LRUPolicy(3)
+        for k in ["a", "b", "c"]:
+            self.assertEqual(policy.insert(k), [])
+        policy.access("a")
+        self.assertEqual(policy.insert("d"), ["b"])
+        policy.remove("c")
+        self.assertEqual(policy.insert("e"), [])
+        self.assertEqual(policy.insert("f"), ["a"])
+
+    def test_lfu(self):
+        policy = LFUPolicy(3)
+        for k in ["a", "b", "c"]:
+            self.assertEqual(policy.insert(k), [])
+        policy.access("a")
+        policy.access("a")
+        policy.access("c")
+        self.assertEqual(policy.insert("d"), ["b"])
+        self.assertEqual(policy.insert("e"), ["d"])
+        policy.remove("e")
+        self.assertEqual(policy.insert("f"), [])
+        self.assertEqual(policy.insert("g"), ["f"])
+
+    def test_lfu_aging(self):
+        policy = LFUPolicy(2, aging_period=5)
+        policy.insert("a")
+        for _ in range(20):
+            policy.access("a")
+        policy.insert("b")
+        for _ in range(12):
+            policy.access("b")
+
+        # "a" was hot long ago, aging lets recent "b" outrank it
+        self.assertEqual(policy.insert("c"), ["a"])
+
+    def test_wtinylfu_admission(self):
+        policy = WTinyLFUPolicy(100)
+        for i in range(100):
+            self.assertEqual(policy.insert(i), [])
+        for _ in range(5):
+            for i in range(100):
+                policy.access(i)
+
+        # one-hit wonders leaving the window are rejected instead of displacing frequent keys
+        policy.insert(1000)
+        for i in range(1001, 1010):
+            self.assertEqual(policy.insert(i), [i - 1])
+
+    def test_evict(self):
+        for policy in [LeastHitsPolicy(10, 3), LRUPolicy(10), LFUPolicy(10), WTinyLFUPolicy(10)]:
+            self.assertIsNone(policy.evict())
+            for k in ["a", "b", "c"]:
+                policy.insert(k)
+            policy.access("a")
+            policy.access("c")
+            self.assertEqual(sorted(policy.evict() for _ in range(3)), ["a", "b", "c"])
+            self.assertIsNone(policy.evict())
+
+        policy = LRUPolicy(10)
+        for k in ["a", "b", "c"]:
+            policy.insert(k)
+        policy.access("a")
+        self.assertEqual(policy.evict(), "b")
+
+        policy = LFUPolicy(10)
+        for k in ["a", "b", "c"]:
+            policy.insert(k)
+        policy.access("a")
+        policy.access("b")
+        self.assertEqual(policy.evict(), "c")
+        self.assertEqual(policy.evict(), "a")
+
+    def test_cache_policy_bounded(self):
+        for name in ["least_hits", "lru", "lfu", "wtinylfu"]:
+            cache = Cache(50, 10, policy=name)
+            for i in range(500):
+                self.assertEqual(cache.get(i % 120, lambda k: f"v{k}"), f"v{i % 120}")
+            cached = [k for k in range(120) if cache.get(k, lambda k: None) is not None]
+            self.assertLessEqual(len(cached), 50, name)
+            self.assertGreater(len(cached), 0, name)
@@ -0,0 +1,34 @@
+import csv
+import io
+import json
+import unittest
+from libs.export import csv_chunks, export_chunks, ndjson_chunks
+
+
+NAMES = ("id", "name")
+
+
+def serialize(row):
+    return {"id": row[0], "name": row[1]}
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.partitions = [[(1, "a"), (2, None)], [(3, 'with "quotes", commas\nand lines')]]
+
+    def test_ndjson(self):
+        chunks = list(ndjson_chunks(iter(self.partitions), serialize))
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+            [serialize(row) for rows in self.partitions for row in rows])
+
+    def test_csv(self):
+        chunks = list(csv_chunks(iter(self.partitions), NAMES, serialize))
+        self.assertEqual(len(chunks), 2)
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode(), newline="")))
+        self.assertEqual(rows, [["id", "name"], ["1", "a"], ["2", ""], ["3", 'with "quotes", commas\nand lines']])
+
+    def test_empty(self):
+        self.assertEqual(list(export_chunks("ndjson", iter([]), NAMES, serialize)), [])
+        self.assertEqual(b"".join(export_chunks("csv", iter([]), NAMES, serialize)), b"id,name\r\n")
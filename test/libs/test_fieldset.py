@@ -0,0 +1,57 @@
+import datetime
+import unittest
+from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy_serializer import SerializerMixin
+from libs.fieldset import FieldSet
+from models.authors import Author
+from models.books import Book
+
+
+Base = declarative_base()
+
+
+class Item(Base, SerializerMixin):
+    __tablename__ = "items"
+    serialize_only = ("id", "name", "created_at")
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+    created_at = Column(DateTime())
+
+
+class TestFieldSet(unittest.TestCase):
+    def test_from_args(self):
+        self.assertIsNone(FieldSet.from_args({}, Book))
+        self.assertEqual(FieldSet.from_args({"fields": "title, id"}, Book).names, ("id", "title"))
+        self.assertEqual(FieldSet.from_args({"fields": "title,id,title"}, Book).names, ("id", "title"))
+        self.assertIsInstance(FieldSet.from_args({"fields": "id,author"}, Book), ValueError)
+        self.assertIsInstance(FieldSet.from_args({"fields": ","}, Book), ValueError)
+
+    def test_serialize_like_to_dict(self):
+        author = Author("someone", "somebio", datetime.datetime(1984, 10, 12))
+        author.id = 3
+        book = Book(3, "Some Title", "Some Description", datetime.datetime(2000, 1, 1))
+        book.id = 5
+        for obj in (author, book):
+            fields = FieldSet.from_args({"fields": ",".join(obj.serialize_only)}, type(obj))
+            self.assertEqual(fields.serialize(obj), obj.to_dict())
+
+    def test_cache_key(self):
+        fields = FieldSet.from_args({"fields": "title,id"}, Book)
+        self.assertEqual(fields.cache_key("book[]"), "book[]?fields=id,title")
+        self.assertEqual(fields.cache_key("author[]?include=books"), "author[]?include=books&fields=id,title")
+
+    def test_query_projection(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Item(id=1, name="item 1", created_at=datetime.datetime(2020, 1, 2)))
+            session.commit()
+
+            fields = FieldSet.from_args({"fields": "created_at"}, Item)
+            query = fields.query(session.query(Item))
+            self.assertEqual(len(query.statement.selected_columns), 2)
+            rows = query.all()
+            self.assertEqual(rows[0].id, 1)
+            self.assertEqual([fields.serialize(row) for row in rows], [{"created_at": "2020-01-02 00:00:00"}])
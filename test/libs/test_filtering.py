@@ -0,0 +1,71 @@
+import datetime
+import unittest
+from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy.orm import declarative_base, Session
+from libs.filtering import Filter, Filters, parse_int, parse_day, parse_day_end, prefix_bound
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+    created_at = Column(DateTime())
+
+
+FILTERS = (
+    Filter("id", Item.id, "eq", parse_int),
+    Filter("created_from", Item.created_at, "gte", parse_day),
+    Filter("created_to", Item.created_at, "lt", parse_day_end),
+    Filter("name_prefix", Item.name, "prefix"),
+)
+
+
+class TestFiltering(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = Session(engine)
+        names = ["apple", "apricot", "banana", "Apple", "ap"]
+        self.session.add_all([
+            Item(id=i + 1, name=name, created_at=datetime.datetime(2020, 1, i + 1, 12))
+            for i, name in enumerate(names)
+        ])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def ids(self, args):
+        filters = Filters.from_args(args, FILTERS)
+        return [item.id for item in filters.apply(self.session.query(Item)).order_by(Item.id)]
+
+    def test_parsers(self):
+        self.assertEqual(parse_int(" 12"), 12)
+        self.assertIsInstance(parse_int("1x"), ValueError)
+        self.assertEqual(parse_day("2020-01-02"), datetime.datetime(2020, 1, 2))
+        self.assertEqual(parse_day_end("2020-01-02"), datetime.datetime(2020, 1, 3))
+        self.assertIsInstance(parse_day("2020-13-01"), ValueError)
+        self.assertEqual(prefix_bound("ap"), "aq")
+        self.assertEqual(prefix_bound("a" + chr(0x10FFFF)), "b")
+        self.assertIsNone(prefix_bound(chr(0x10FFFF)))
+
+    def test_filters(self):
+        self.assertEqual(self.ids({}), [1, 2, 3, 4, 5])
+        self.assertEqual(self.ids({"id": "3"}), [3])
+        self.assertEqual(self.ids({"name_prefix": "ap"}), [1, 2, 5])
+        self.assertEqual(self.ids({"name_prefix": "apr"}), [2])
+        self.assertEqual(self.ids({"created_from": "2020-01-02", "created_to": "2020-01-03"}), [2, 3])
+        self.assertEqual(self.ids({"created_to": "2020-01-01", "name_prefix": "a"}), [1])
+
+    def test_invalid(self):
+        self.assertIsInstance(Filters.from_args({"id": "x"}, FILTERS), ValueError)
+        self.assertIsInstance(Filters.from_args({"created_from": "yesterday"}, FILTERS), ValueError)
+        self.assertIsInstance(Filters.from_args({"name_prefix": ""}, FILTERS), ValueError)
+
+    def test_cache_key(self):
+        filters = Filters.from_args({"name_prefix": "a&b", "id": "1"}, FILTERS)
+        self.assertEqual(filters.cache_key("item[]"), "item[]?id=1&name_prefix=a%26b")
+        self.assertEqual(Filters.from_args({}, FILTERS).cache_key("item[]"), "item[]")
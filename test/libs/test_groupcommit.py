@@ -0,0 +1,137 @@
+import os
+import tempfile
+import threading
+import unittest
+from sqlalchemy import create_engine, event, Column, Integer, String
+from sqlalchemy.orm import declarative_base, Session
+from libs.groupcommit import GroupCommit
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20), unique=True)
+
+
+class TestGroupCommit(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine("sqlite:///" + os.path.join(self.dir.name, "test.db"))
+        Base.metadata.create_all(self.engine)
+        self.commits = 0
+
+        def count(conn):
+            self.commits += 1
+
+        event.listen(self.engine, "commit", count)
+        self.group = None
+
+    def tearDown(self):
+        if self.group:
+            self.group.close()
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def __group(self, **kwargs):
+        self.group = GroupCommit(lambda: Session(self.engine, expire_on_commit=False), **kwargs)
+        return self.group
+
+    def __names(self):
+        with Session(self.engine) as session:
+            return sorted(item.name for item in session.query(Item))
+
+    def __add(self, name):
+        def write(session):
+            item = Item(name=name)
+            session.add(item)
+            session.flush()
+            return item
+        return write
+
+    def test_run(self):
+        item = self.__group(max_delay=0).run(self.__add("a"))
+        self.assertTrue(item.id)
+        self.assertEqual(item.name, "a")
+        self.assertEqual(self.__names(), ["a"])
+
+    def test_one_commit_per_group(self):
+        group = self.__group(max_delay=1, max_items=5)
+        futures = [group.submit(self.__add(f"item {i}")) for i in range(5)]
+        ids = [future.result(timeout=5).id for future in futures]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(self.__names(), [f"item {i}" for i in range(5)])
+
+    def test_max_items(self):
+        group = self.__group(max_delay=1, max_items=2)
+        futures = [group.submit(self.__add(f"item {i}")) for i in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(self.commits, 3)
+
+    def test_max_delay(self):
+        # a lone write is committed once the delay is over, not held for more writes
+        group = self.__group(max_delay=0.01, max_items=100)
+        group.submit(self.__add("a")).result(timeout=5)
+        self.assertEqual(self.__names(), ["a"])
+
+    def test_failing_write(self):
+        group = self.__group(max_delay=1, max_items=3)
+        ok = group.submit(self.__add("a"))
+        duplicate = group.submit(self.__add("a"))
+
+        def fail(session):
+            session.add(Item(name="c"))
+            raise ValueError("invalid")
+
+        failed = group.submit(fail)
+        self.assertEqual(ok.result(timeout=5).name, "a")
+        with self.assertRaises(Exception):
+            duplicate.result(timeout=5)
+        with self.assertRaises(ValueError):
+            failed.result(timeout=5)
+        # the writes of failing callers are undone, the others committed together
+        self.assertEqual(self.__names(), ["a"])
+        self.assertEqual(self.commits, 1)
+
+    def test_failing_commit(self):
+        group = self.__group(max_delay=1, max_items=2)
+
+        def fail(conn):
+            raise RuntimeError("disk full")
+
+        event.listen(self.engine, "commit", fail)
+        futures = [group.submit(self.__add(name)) for name in ("a", "b")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        event.remove(self.engine, "commit", fail)
+        self.assertEqual(self.__names(), [])
+
+    def test_concurrent_callers(self):
+        group = self.__group(max_delay=0.005)
+        results = []
+
+        def call(i):
+            results.append(group.run(self.__add(f"item {i}")).id)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 20)
+        self.assertEqual(len(self.__names()), 20)
+        self.assertLessEqual(self.commits, 20)
+
+    def test_close(self):
+        group = self.__group(max_delay=1)
+        future = group.submit(self.__add("a"))
+        group.close()
+        self.group = None
+        self.assertTrue(future.done())
+        self.assertEqual(self.__names(), ["a"])
@@ -0,0 +1,89 @@
+import io
+import unittest
+from libs import importer
+from libs.importer import read_csv, read_ndjson, read_records, run_import, text_stream
+
+
+def validate(params):
+    if not params.get("name"):
+        return ValueError("Name cannot be empty")
+    return params["name"]
+
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.chunks = []
+
+    def insert(self, chunk):
+        self.chunks.append([name for _, name in chunk])
+        return [name for _, name in chunk if name != "dup"], [(n, "Duplicate") for n, name in chunk if name == "dup"]
+
+    def test_read_ndjson(self):
+        lines = io.StringIO('{"name": "a"}\n\n{bad\n[1]\n')
+        records = list(read_ndjson(lines))
+        self.assertEqual(records[0], (1, {"name": "a"}))
+        self.assertIsInstance(records[1][1], ValueError)
+        self.assertEqual(records[2], (3, [1]))
+
+    def test_read_csv(self):
+        lines = io.StringIO('name,bio\na,"two\nlines"\nb,\n')
+        self.assertEqual(list(read_csv(lines)), [(1, {"name": "a", "bio": "two\nlines"}), (2, {"name": "b", "bio": ""})])
+
+    def test_text_stream(self):
+        stream = text_stream(io.BytesIO('{"name": "é"}\n'.encode()))
+        self.assertEqual(list(read_records(stream, "ndjson")), [(1, {"name": "é"})])
+
+    def test_run_import(self):
+        records = [(1, {"name": "a"}), (2, {"name": ""}), (3, {"name": "dup"}), (4, ValueError("Invalid JSON")),
+            (5, {"name": "b"}), (6, {"name": "c"})]
+        progress = []
+        summary = run_import(records, validate, self.insert, chunk_size=2,
+            progress=lambda s: progress.append(s["checkpoint"]))
+        self.assertEqual(self.chunks, [["a", "dup"], ["b", "c"]])
+        self.assertEqual(progress, [3, 6, 6])
+        self.assertEqual(summary, {"checkpoint": 6, "created": 3, "failed": 3, "errors": [
+            {"record": 2, "message": "Name cannot be empty"},
+            {"record": 3, "message": "Duplicate"},
+            {"record": 4, "message": "Invalid JSON"},
+        ]})
+
+    def test_resume(self):
+        records = [(n, {"name": f"n{n}"}) for n in range(1, 6)]
+        summary = run_import(records, validate, self.insert, skip=3)
+        self.assertEqual(self.chunks, [["n4", "n5"]])
+        self.assertEqual(summary["checkpoint"], 5)
+
+    def test_error_count(self):
+        records = [(n, {"name": ""}) for n in range(1, importer.MAX_REPORTED_ERRORS + 11)]
+        summary = run_import(records, validate, self.insert)
+        self.assertEqual(summary["failed"], importer.MAX_REPORTED_ERRORS + 10)
+        self.assertEqual(len(summary["errors"]), importer.MAX_REPORTED_ERRORS)
+
+    def test_unreadable_input(self):
+        stream = text_stream(io.BytesIO(b'{"name": "a"}\n' * 3 + b"\xff\n"))
+        summary = run_import(read_records(stream, "ndjson"), validate, self.insert)
+        self.assertIn("error", summary)
+        self.assertEqual(summary["checkpoint"], 0)
+
+    def test_failed_transaction(self):
+        records = [(1, {"name": "a"}), (2, {"name": "b"}), (3, {"name": ""}), (4, {"name": "c"}),
+            (5, {"name": "d"}), (6, {"name": "e"})]
+
+        def insert(chunk):
+            self.chunks.append([name for _, name in chunk])
+            if "c" in self.chunks[-1]:
+                return ValueError("Names cannot be saved")
+            return [name for _, name in chunk], []
+
+        summary = run_import(records, validate, insert, chunk_size=2)
+        # the import stops, and resumes with the first record of the chunk that was not saved
+        self.assertEqual(self.chunks, [["a", "b"], ["c", "d"]])
+        self.assertEqual(summary["checkpoint"], 3)
+        self.assertEqual(summary["created"], 2)
+        self.assertEqual(summary["error"], "Import stopped at record 4: Names cannot be saved")
+        self.assertEqual(summary["errors"], [{"record": 3, "message": "Name cannot be empty"}])
+
+        self.chunks = []
+        summary = run_import(records, validate, self.insert, skip=summary["checkpoint"], chunk_size=2)
+        self.assertEqual(self.chunks, [["c", "d"], ["e"]])
+        self.assertNotIn("error", summary)
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+from libs.cache import Cache, ConcurrentCache
+from libs.metrics import Histogram, hit_rates, merge_stats, namespace
+
+
+class TestMetrics(unittest.TestCase):
+    def test_namespace(self):
+        self.assertEqual(namespace("author[1]"), "author")
+        self.assertEqual(namespace("author[]"), "author")
+        self.assertEqual(namespace("books_from[3]"), "books_from")
+        self.assertEqual(namespace("plain"), "plain")
+        self.assertEqual(namespace(100), "100")
+
+    def test_histogram(self):
+        hist = Histogram((1, 10))
+        for v in [0.5, 1, 5, 50]:
+            hist.observe(v)
+        self.assertEqual(hist.to_dict(), {"le_1": 2, "le_10": 1, "le_inf": 1, "count": 4, "sum": 56.5})
+
+    def test_merge_and_rates(self):
+        total = merge_stats({}, {"hits": 1, "misses": 1, "hit_rate": 0.5, "namespaces": {"a": {"hits": 1}}})
+        merge_stats(total, {"hits": 2, "misses": 0, "namespaces": {"a": {"hits": 2}, "b": {"misses": 4}}})
+        hit_rates(total)
+        self.assertEqual(total["hits"], 3)
+        self.assertEqual(total["hit_rate"], 0.75)
+        self.assertEqual(total["namespaces"]["a"]["hit_rate"], 1.0)
+        self.assertEqual(total["namespaces"]["b"], {"misses": 4})
+
+    @mock.patch("libs.cache.time.monotonic")
+    def test_cache_stats(self, mock_time):
+        mock_time.return_value = 1000
+        cache = Cache(2, 1, policy="lru", negative_ttl=10, negative_max_keys=10)
+        cache.get("author[1]", lambda k: "a1")
+        cache.get("author[1]", lambda k: "dummy")
+        cache.get("book[1]", lambda k: "b1")
+        cache.get("book[2]", lambda k: "b2")
+        cache.get("book[3]", lambda k: None)
+        with self.assertRaises(RuntimeError):
+            cache.get("book[4]", lambda k: (_ for _ in ()).throw(RuntimeError("db down")))
+
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 5)
+        self.assertEqual(stats["evictions"], 1)
+        author = stats["namespaces"]["author"]
+        self.assertEqual((author["entries"], author["hits"], author["misses"]), (0, 1, 1))
+        self.assertEqual(author["hit_rate"], 0.5)
+        book = stats["namespaces"]["book"]
+        self.assertEqual((book["entries"], book["negative_entries"], book["load_errors"]), (2, 1, 1))
+        self.assertEqual(book["load_ms"]["count"], 3)
+
+    def test_concurrent_cache_stats(self):
+        cache = ConcurrentCache(100, 10, stripes=4)
+        for i in range(20):
+            cache.get(f"book[{i}]", lambda k: "book")
+            cache.get(f"book[{i}]", lambda k: "dummy")
+        stats = cache.stats()
+        self.assertEqual(stats["namespaces"]["book"]["entries"], 20)
+        self.assertEqual(stats["hit_rate"], 0.5)
@@ -0,0 +1,77 @@
+import unittest
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.orm import declarative_base, Session
+from libs.pagination import Page, Sort, encode_cursor, decode_cursor
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = Session(engine)
+        # names repeat, so pages sorted by name have ties broken by id
+        self.session.add_all([Item(id=i, name=f"item {i % 7}") for i in range(1, 26)])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_cursor(self):
+        self.assertEqual(decode_cursor(encode_cursor([12])), [12])
+        self.assertEqual(decode_cursor(encode_cursor(["title", 3])), ["title", 3])
+        for cursor in ["!!", encode_cursor([]), "e30", encode_cursor([[1]])]:
+            self.assertIsInstance(decode_cursor(cursor), ValueError)
+
+    def test_from_args(self):
+        self.assertIsNone(Page.from_args({}))
+        self.assertEqual(Page.from_args({"limit": "10"}).limit, 10)
+        self.assertEqual(Page.from_args({"cursor": encode_cursor([5])}).after, [5])
+        for args in [{"limit": "0"}, {"limit": "-1"}, {"limit": "x"}, {"limit": "1001"}, {"cursor": "!!"}]:
+            self.assertIsInstance(Page.from_args(args), ValueError)
+
+    def test_walk_pages(self):
+        ids, cursor, pages = [], None, 0
+        while True:
+            page = Page.from_args({"limit": "10", "cursor": cursor} if cursor else {"limit": "10"})
+            rows, cursor = page.fetch(self.session.query(Item), Item.id)
+            ids += [row.id for row in rows]
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, list(range(1, 26)))
+
+    def test_walk_sorted_pages(self):
+        for sort_arg, reverse in [("name", False), ("-name", True)]:
+            sort = Sort.from_args({"sort": sort_arg}, [Item.id, Item.name])
+            ids, cursor = [], None
+            while True:
+                args = {"limit": "4", "cursor": cursor} if cursor else {"limit": "4"}
+                rows, cursor = Page.from_args(args, sort).fetch(self.session.query(Item), Item.id, sort)
+                ids += [row.id for row in rows]
+                if cursor is None:
+                    break
+            expected = sorted(range(1, 26), key=lambda i: (f"item {i % 7}", i), reverse=reverse)
+            self.assertEqual(ids, expected)
+
+    def test_sort_args(self):
+        self.assertIsNone(Sort.from_args({}, [Item.id]))
+        self.assertTrue(Sort.from_args({"sort": "-name"}, [Item.id, Item.name]).descending)
+        self.assertIsInstance(Sort.from_args({"sort": "title"}, [Item.id, Item.name]), ValueError)
+        sort = Sort.from_args({"sort": "name"}, [Item.id, Item.name])
+        self.assertIsInstance(Page.from_args({"cursor": encode_cursor([5])}, sort), ValueError)
+        self.assertIsInstance(Page.from_args({"cursor": encode_cursor(["a", 5])}), ValueError)
+
+    def test_cache_key(self):
+        self.assertEqual(Page(10).cache_key("book[]"), "book[]?limit=10&cursor=")
+        self.assertEqual(Page(10).cache_key("author[]?include=books"), "author[]?include=books&limit=10&cursor=")
+        self.assertNotEqual(Page(10, "abc").cache_key("book[]"), Page(20, "abc").cache_key("book[]"))
@@ -1,5 +1,6 @@
 import unittest, json
-from libs.response import Response
+from libs import response
+from libs.response import Response, JSON_HEADERS
 
 
 class TestResponse(unittest.TestCase):
@@ -20,7 +21,45 @@ class TestResponse(unittest.TestCase):
             self.assertEqual(ex[0].message, ex[2])
             self.assertEqual(ex[0].data, ex[3])
 
-            r, c = ex[0].resp()
+            r, c, headers = ex[0].resp()
+            self.assertEqual(headers["Content-Type"], "application/json")
             status = "success" if ex[1] == 200 else "error"
             self.assertEqual(json.loads(r), {"meta": {"status": status, "message": ex[2]}, "data": ex[3]})
             self.assertEqual(c, ex[1])
+
+    def test_from_body(self):
+        body = Response.success([{"key": "value"}]).encode()
+        self.assertEqual(Response.from_body(body), (body, 200, JSON_HEADERS))
+        self.assertEqual(Response.from_body(body, 404), (body, 404, JSON_HEADERS))
+        self.assertEqual(Response.from_body(body, headers={"ETag": '"x"'}),
+            (body, 200, {"Content-Type": "application/json", "ETag": '"x"'}))
+
+    def test_extra_meta(self):
+        body = Response.success([], {"next_cursor": None}).encode()
+        self.assertEqual(json.loads(body), {
+            "meta": {"status": "success", "message": "", "next_cursor": None},
+            "data": [],
+        })
+
+    def test_stream(self):
+        items = list(range(7))
+        serialize = lambda i: {"id": i, "name": f"item {i}"}
+        for chunk_size in (1, 3, 7, 100):
+            chunks = list(Response.stream(iter(items), serialize, chunk_size))
+            self.assertEqual(b"".join(chunks), Response.success([serialize(i) for i in items]).encode())
+        self.assertEqual(b"".join(Response.stream([], serialize)), Response.success([]).encode())
+
+    def test_stdlib_encoder(self):
+        examples = [
+            Response.success([{"key": "välue", "n": [1, None, True]}]),
+            Response.success({}, {"next_cursor": None}),
+            Response.error(412, 'say "no"'),
+        ]
+        fast = [resp.encode() for resp in examples]
+        response.use_json_encoder(response.stdlib_dumps)
+        try:
+            for resp, encoded in zip(examples, fast):
+                self.assertEqual(json.loads(resp.encode()), json.loads(encoded))
+                self.assertEqual(resp.encode(), encoded)
+        finally:
+            response.use_json_encoder(response.orjson.dumps if response.orjson else response.stdlib_dumps)
@@ -0,0 +1,49 @@
+import unittest
+from libs.search import SearchIndex, tokenize
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex({"title": 3.0, "description": 1.0})
+        self.index.rebuild([
+            (1, {"title": "The Hobbit", "description": "A hobbit goes on an adventure"}),
+            (2, {"title": "Dune", "description": "Politics and spice on a desert planet"}),
+            (3, {"title": "Desert Solitaire", "description": "A season in the wilderness"}),
+            (4, {"title": "Planet of Exile", "description": None}),
+        ])
+
+    def ids(self, query, limit=10):
+        return [doc_id for doc_id, _ in self.index.search(query, limit)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The Hobbit, or There and Back Again!"),
+            ["the", "hobbit", "or", "there", "and", "back", "again"])
+        self.assertEqual(tokenize(None), [])
+
+    def test_ranking(self):
+        self.assertTrue(self.index.ready)
+        self.assertEqual(self.ids("hobbit"), [1])
+        # a title match weighs more than a description match
+        self.assertEqual(self.ids("desert"), [3, 2])
+        self.assertEqual(self.ids("PLANET"), [4, 2])
+        # matching both terms beats matching one
+        self.assertEqual(self.ids("desert planet")[0], 2)
+        self.assertEqual(set(self.ids("desert planet")), {2, 3, 4})
+        self.assertEqual(self.ids("desert planet", limit=1), [2])
+        self.assertEqual(self.ids("unknown"), [])
+
+    def test_incremental_updates(self):
+        self.index.add(5, {"title": "Hobbit Recipes", "description": "Second breakfast"})
+        self.assertEqual(set(self.ids("hobbit")), {1, 5})
+
+        self.index.add(1, {"title": "Untitled", "description": "Nothing here"})
+        self.assertEqual(self.ids("hobbit"), [5])
+        self.assertEqual(self.ids("untitled"), [1])
+
+        self.index.remove(5)
+        self.index.remove(42)
+        self.assertEqual(self.ids("hobbit"), [])
+        self.assertEqual(len(self.index), 4)
+
+    def test_empty(self):
+        self.assertEqual(SearchIndex({"name": 1.0}).search("anything", 10), [])
@@ -0,0 +1,113 @@
+import datetime
+import decimal
+import json
+import unittest
+from sqlalchemy import create_engine, Column, Date, DateTime, Integer, Numeric, String
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy_serializer import SerializerMixin
+from libs.serializer import Serializer, serializer
+from models.authors import Author
+from models.books import Book
+
+
+Base = declarative_base()
+
+
+class Item(Base, SerializerMixin):
+    __tablename__ = "items"
+    serialize_only = ("id", "name", "created_on", "created_at", "price")
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+    created_on = Column(Date())
+    created_at = Column(DateTime())
+    price = Column(Numeric(10, 2))
+
+
+class CustomItem(Base, SerializerMixin):
+    __tablename__ = "custom_items"
+    serialize_only = ("id", "created_at")
+    datetime_format = "%d/%m/%Y %H:%M"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime())
+
+
+DATETIMES = [
+    None,
+    datetime.datetime(1984, 10, 12),
+    datetime.datetime(2000, 1, 1, 23, 59, 59, 999999),
+    datetime.datetime(2024, 2, 29, 7, 8, 9, tzinfo=datetime.timezone.utc),
+    datetime.datetime(999, 5, 6, 1, 2, 3),
+    datetime.datetime(1, 1, 1),
+]
+
+
+class TestSerializer(unittest.TestCase):
+    def test_author_parity(self):
+        for birth_date in DATETIMES:
+            author = Author("someone", "somebio", birth_date)
+            author.id = 3
+            self.assertEqual(serializer(Author)(author), author.to_dict())
+
+    def test_book_parity(self):
+        for publish_date in DATETIMES:
+            book = Book(3, "Some Title", None, publish_date)
+            book.id = 5
+            self.assertEqual(serializer(Book)(book), book.to_dict())
+
+    def test_parity_of_unusual_values(self):
+        # values of another type than the column's, e.g. not flushed yet, are formatted like to_dict() does
+        book = Book(3, "Some Title", "Some Description", datetime.date(2001, 2, 3))
+        book.id = 5
+        self.assertEqual(serializer(Book)(book), book.to_dict())
+        book.publish_date = "2001-02-03"
+        self.assertEqual(serializer(Book)(book), book.to_dict())
+
+    def test_key_order(self):
+        book = Book(3, "Some Title", "Some Description", datetime.datetime(2000, 1, 1))
+        book.id = 5
+        self.assertEqual(list(serializer(Book)(book)), list(Book.serialize_only))
+        self.assertEqual(json.dumps(serializer(Book)(book)), json.dumps({k: book.to_dict()[k] for k in Book.serialize_only}))
+
+    def test_subset(self):
+        book = Book(3, "Some Title", "Some Description", datetime.datetime(2000, 1, 1))
+        self.assertEqual(serializer(Book, ("id", "title"))(book), {"id": None, "title": "Some Title"})
+
+    def test_from_tuple(self):
+        row = (5, 3, "Some Title", None, datetime.datetime(2000, 1, 1))
+        self.assertEqual(serializer(Book).from_tuple(row), {
+            "id": 5, "author_id": 3, "title": "Some Title", "description": None, "publish_date": "2000-01-01 00:00:00",
+        })
+
+    def test_many(self):
+        books = [Book(3, f"Title {i}", "", datetime.datetime(2000, 1, i)) for i in range(1, 4)]
+        self.assertEqual(serializer(Book).many(books), [book.to_dict() for book in books])
+
+    def test_compiled_once(self):
+        self.assertIs(serializer(Book), serializer(Book))
+        self.assertIsNot(serializer(Book), serializer(Book, ("id",)))
+
+    def test_date_and_decimal_columns(self):
+        item = Item(id=1, name="item", created_on=datetime.date(2020, 1, 2),
+            created_at=datetime.datetime(2020, 1, 2, 3, 4, 5), price=decimal.Decimal("1.50"))
+        self.assertEqual(Serializer(Item)(item), item.to_dict())
+        item.created_on = datetime.date(12, 1, 2)
+        self.assertEqual(Serializer(Item)(item), item.to_dict())
+
+    def test_custom_format(self):
+        item = CustomItem(id=1, created_at=datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertEqual(Serializer(CustomItem)(item), {"id": 1, "created_at": "02/01/2020 03:04"})
+
+    def test_query_rows(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Item(id=1, name="item 1", created_on=datetime.date(2020, 1, 2),
+                created_at=datetime.datetime(2020, 1, 2, 3, 4, 5), price=decimal.Decimal("2.25")))
+            session.commit()
+
+            item = session.get(Item, 1)
+            rows = session.query(*[getattr(Item, name) for name in Item.serialize_only]).all()
+            self.assertEqual(Serializer(Item)(rows[0]), item.to_dict())
+            self.assertEqual(Serializer(Item).from_tuple(tuple(rows[0])), item.to_dict())
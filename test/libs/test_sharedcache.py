@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+from libs.cache import Cache
+from libs.sharedcache import CacheServer, SharedCache
+
+
+AUTHKEY = b"secret"
+
+
+def worker_update(address, key, val):
+    SharedCache(address, AUTHKEY).update(key, val)
+
+
+def worker_get(address, key, queue):
+    queue.put(SharedCache(address, AUTHKEY).get(key, lambda k: "loaded by worker"))
+
+
+def worker_delete(address, key):
+    SharedCache(address, AUTHKEY).delete(key)
+
+
+class TestSharedCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmpdir.name, "cache.sock")
+        self.server = CacheServer(self.address, Cache(100, 20, negative_ttl=60, negative_max_keys=10),
+            authkey=AUTHKEY)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.close()
+        self.thread.join(5)
+        self.tmpdir.cleanup()
+
+    def run_worker(self, target, *args):
+        proc = multiprocessing.Process(target=target, args=(self.address, *args))
+        proc.start()
+        proc.join(10)
+        self.assertEqual(proc.exitcode, 0)
+
+    def test_get_update_delete(self):
+        cache = SharedCache(self.address, AUTHKEY)
+        self.assertEqual(cache.get("author[1]", lambda k: "default"), "default")
+        self.assertEqual(cache.get("author[1]", lambda k: "dummy"), "default")
+
+        cache.update("author[1]", {"id": 1})
+        self.assertEqual(cache.get("author[1]", lambda k: "dummy"), {"id": 1})
+
+        cache.delete("author[1]")
+        self.assertEqual(cache.get("author[1]", lambda k: "dummy"), "dummy")
+
+        cache.update("author[]", "all authors", tags=["authors"])
+        self.assertEqual(cache.invalidate("authors"), 1)
+        self.assertEqual(cache.get("author[]", lambda k: "dummy"), "dummy")
+
+        version = cache.version("authors")
+        cache.invalidate("authors")
+        self.assertNotEqual(cache.version("authors"), version)
+
+        self.assertIsNone(cache.get("author[2]", lambda k: None))
+        self.assertIsNone(cache.get("author[2]", lambda k: "dummy"))
+        self.assertEqual(cache.stats()["negative_hits"], 1)
+
+        cache.disable()
+        self.assertEqual(cache.get("author[1]", lambda k: "disabled"), "disabled")
+        cache.enable()
+        self.assertEqual(cache.get("author[1]", lambda k: "disabled"), "dummy")
+
+    def test_load_racing_with_invalidation(self):
+        cache = SharedCache(self.address, AUTHKEY)
+
+        def stale(k):
+            # another worker commits a write and invalidates while this one loads
+            SharedCache(self.address, AUTHKEY).invalidate("books")
+            return "stale"
+
+        self.assertEqual(cache.get("book[]", stale, tags=["books"]), "stale")
+        self.assertEqual(cache.get("book[]", lambda k: "fresh", tags=["books"]), "fresh")
+        self.assertEqual(cache.get("book[]", lambda k: "dummy", tags=["books"]), "fresh")
+
+    def test_shared_between_processes(self):
+        queue = multiprocessing.Queue()
+        cache = SharedCache(self.address, AUTHKEY)
+
+        self.run_worker(worker_update, "book[1]", "from worker 1")
+        self.assertEqual(cache.get("book[1]", lambda k: "dummy"), "from worker 1")
+
+        self.run_worker(worker_get, "book[1]", queue)
+        self.assertEqual(queue.get(timeout=5), "from worker 1")
+
+        # an invalidation by one worker reaches every other worker
+        self.run_worker(worker_delete, "book[1]")
+        self.run_worker(worker_get, "book[1]", queue)
+        self.assertEqual(queue.get(timeout=5), "loaded by worker")
+        self.assertEqual(cache.get("book[1]", lambda k: "dummy"), "loaded by worker")
+
+    def test_server_unavailable(self):
+        cache = SharedCache(os.path.join(self.tmpdir.name, "missing.sock"), AUTHKEY)
+        self.assertEqual(cache.get("book[1]", lambda k: "default"), "default")
+        self.assertEqual(cache.get("book[1]", lambda k: "dummy"), "dummy")
+        cache.update("book[1]", "value")
+        cache.delete("book[1]")
+        self.assertIsNone(cache.version("books"))
+
+    def test_wrong_authkey(self):
+        SharedCache(self.address, AUTHKEY).update("book[1]", "value")
+        # a client without the key is refused before anything it sends is read
+        cache = SharedCache(self.address, b"wrong")
+        self.assertEqual(cache.get("book[1]", lambda k: "default"), "default")
+        self.assertIsNone(cache.version("books"))
+        self.assertEqual(SharedCache(self.address, AUTHKEY).get("book[1]", lambda k: "dummy"), "value")
+
+    def test_socket_mode(self):
+        self.assertEqual(os.stat(self.address).st_mode & 0o777, 0o600)
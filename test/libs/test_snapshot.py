@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from libs.cache import Cache
+from libs.snapshot import ids_by_namespace, load_snapshot, save_snapshot, start_preload
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.snapshot")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def hot_cache(self):
+        cache = Cache(100, 10)
+        for i in range(10):
+            cache.update(f"book[{i}]", f"book {i}", tags=[f"book:{i}"])
+            for _ in range(i):
+                cache.get(f"book[{i}]", lambda k: "dummy")
+        return cache
+
+    def refetch(self, keys):
+        return {k: f"fresh {k}" for k in keys}
+
+    def test_save_and_load(self):
+        self.assertEqual(save_snapshot(self.hot_cache(), self.path, 3), 3)
+
+        cache = Cache(100, 10)
+        cache.update("book[8]", "newer book 8")
+        self.assertEqual(load_snapshot(cache, self.path, self.refetch), 3)
+        self.assertEqual(cache.get("book[9]", lambda k: "dummy"), "fresh book[9]")
+        self.assertEqual(cache.get("book[8]", lambda k: "dummy"), "newer book 8")
+        self.assertEqual(cache.get("book[6]", lambda k: "dummy"), "dummy")
+
+        # tags are kept
+        cache.invalidate("book:7")
+        self.assertEqual(cache.get("book[7]", lambda k: "dummy"), "dummy")
+
+    def test_values_not_saved(self):
+        save_snapshot(self.hot_cache(), self.path, 2)
+        with gzip.open(self.path, "rt", encoding="utf-8") as stream:
+            self.assertEqual(json.load(stream), [["book[9]", ["book:9"], 9], ["book[8]", ["book:8"], 8]])
+
+    def test_concurrent_saves(self):
+        # e.g. every worker saving at shutdown, each through its own temporary file
+        cache = self.hot_cache()
+        threads = [threading.Thread(target=save_snapshot, args=(cache, self.path, 10)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(load_snapshot(Cache(100, 10), self.path, self.refetch), 10)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["cache.snapshot"])
+
+    def test_load_with_refetch(self):
+        save_snapshot(self.hot_cache(), self.path, 5)
+        batches = []
+
+        def refetch(keys):
+            batches.append(keys)
+            return {k: f"fresh {k}" for k in keys if k != "book[9]"}
+
+        cache = Cache(100, 10)
+        self.assertEqual(load_snapshot(cache, self.path, refetch, batch_size=2), 4)
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(cache.get("book[8]", lambda k: "dummy"), "fresh book[8]")
+        self.assertEqual(cache.get("book[9]", lambda k: "dummy"), "dummy")
+
+    def test_preload_thread(self):
+        save_snapshot(self.hot_cache(), self.path, 10)
+        cache = Cache(100, 10)
+        start_preload(cache, self.path, self.refetch).join(5)
+        self.assertEqual(cache.get("book[1]", lambda k: "dummy"), "fresh book[1]")
+
+        errors = []
+        with open(self.path, "w") as stream:
+            stream.write("corrupt")
+        start_preload(Cache(100, 10), self.path, self.refetch, onerror=errors.append).join(5)
+        self.assertEqual(len(errors), 1)
+
+    def test_missing_snapshot(self):
+        self.assertEqual(load_snapshot(Cache(100, 10), self.path, self.refetch), 0)
+
+    def test_select(self):
+        cache = self.hot_cache()
+        cache.update("book[]#gzip#abc", b"compressed")
+        for _ in range(20):
+            cache.get("book[]#gzip#abc", lambda k: b"dummy")
+        self.assertEqual(save_snapshot(cache, self.path, 3, lambda k: "#" not in k), 2)
+        self.assertEqual(save_snapshot(cache, self.path, 3), 3)
+
+    def test_ids_by_namespace(self):
+        ids = ids_by_namespace(["author[1]", "author[]", "books_from[2]", "book[3]", "book[x]", "book[]?limit=5&cursor=", "ping"])
+        self.assertEqual(ids, {"author": {1, None}, "books_from": {2}, "book": {3}, "ping": {None}})
@@ -1,11 +1,22 @@
 """Unit test to make sure all enpoints working as expected"""
 
 import datetime
+import gzip
 import json
+import os
+import tempfile
 import coverage
 from unittest import TestCase, mock
-from services.app import cache
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from services.app import cache, db
+from services.book import bookservice as books
+from services.search import searchservice
+from services.authorids import authorids
 from app import app
+from libs.compression import compress
+from libs.groupcommit import GroupCommit
 from models.authors import Author
 from models.books import Book
 
@@ -16,6 +27,7 @@ class TestApp(TestCase):
         self.ctx = app.app_context()
         self.ctx.push()
         self.client = app.test_client()
+        authorids.clear()
         self.author_dict_sample = {
             "name":           "somename",
             "bio":            "somebio",
@@ -179,6 +191,12 @@ class TestApp(TestCase):
                     "publish_date": "2000-21-10"},
                 "message": "Invalid publish date '2000-21-10'"
             },
+            {
+                "desc": "Must fail when author_id is not an integer",
+                "data": {"author_id": "one", "title": "abc", "description": "def",
+                    "publish_date": "2000-10-21"},
+                "message": "Author ID must be an integer"
+            },
         ]
 
     @mock.patch("models.authors.Author.query")
@@ -191,8 +209,25 @@ class TestApp(TestCase):
         body = json.loads(resp.get_data(as_text=True))
         mock_query.all.assert_called_once()
         self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content_type, "application/json")
         self.assertEqual(body["data"], expected_data)
 
+    @mock.patch("services.author.db")
+    @mock.patch("models.authors.Author.query")
+    def test_list_authors_invalidated(self, mock_query, mock_db):
+        """Test author list is cached, and reloaded after a new author is added"""
+        mock_query.all.return_value = self.__saved_authors()
+        cache.delete("author[]")
+        self.client.get("/api/v1/authors")
+        self.client.get("/api/v1/authors")
+        mock_query.all.assert_called_once()
+
+        self.client.post("/api/v1/authors",
+            data=json.dumps(self.author_dict_sample),
+            content_type="application/json")
+        self.client.get("/api/v1/authors")
+        self.assertEqual(mock_query.all.call_count, 2)
+
     @mock.patch("models.authors.Author.query")
     def test_get_author_success(self, mock_query):
         """Test get author by ID, should return 200"""
@@ -205,6 +240,97 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(body["data"], expected_data)
 
+    @mock.patch("models.authors.Author.query")
+    def test_get_author_include_books(self, mock_query):
+        """Test GET author with ?include=books, should embed the books, loaded only when asked for"""
+        self.author_obj_sample.books = self.__saved_books()[:2]
+        mock_query.get.return_value = self.author_obj_sample
+        mock_query.options.return_value.get.return_value = self.author_obj_sample
+        cache.delete("author[1]")
+        cache.delete("author[1]?include=books")
+
+        body = json.loads(self.client.get("/api/v1/authors/1").get_data(as_text=True))
+        self.assertNotIn("books", body["data"])
+        mock_query.options.assert_not_called()
+
+        body = json.loads(self.client.get("/api/v1/authors/1?include=books").get_data(as_text=True))
+        mock_query.options.return_value.get.assert_called_once_with(1)
+        self.assertEqual(body["data"]["books"], [b.to_dict() for b in self.__saved_books()[:2]])
+
+        resp = self.client.get("/api/v1/authors/1?include=reviews")
+        self.assertEqual(resp.status_code, 400)
+
+    @mock.patch("services.etag.versions_shared", return_value=True)
+    @mock.patch("services.author.db")
+    @mock.patch("models.authors.Author.query")
+    def test_get_author_etag(self, mock_query, mock_db, _):
+        """Test conditional GET/PUT of an author with ETags"""
+        mock_query.get.return_value = self.author_obj_sample
+        mock_db.session.get.return_value = self.author_obj_sample
+        cache.delete("author[1]")
+        resp = self.client.get("/api/v1/authors/1")
+        tag = resp.headers["ETag"]
+        self.assertTrue(tag)
+
+        # the current ETag is answered without loading anything
+        mock_query.get.reset_mock()
+        cache.delete("author[1]")
+        resp = self.client.get("/api/v1/authors/1", headers={"If-None-Match": tag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.headers["ETag"], tag)
+        self.assertEqual(resp.get_data(), b"")
+        mock_query.get.assert_not_called()
+
+        resp = self.client.put("/api/v1/authors/1", headers={"If-Match": '"outdated"'},
+            data=json.dumps(self.author_dict_sample), content_type="application/json")
+        self.assertEqual(resp.status_code, 412)
+        mock_db.session.commit.assert_not_called()
+
+        resp = self.client.put("/api/v1/authors/1", headers={"If-Match": tag},
+            data=json.dumps(self.author_dict_sample), content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        new_tag = resp.headers["ETag"]
+        self.assertNotEqual(new_tag, tag)
+
+        # the write changed the version, the old copy is stale now
+        resp = self.client.get("/api/v1/authors/1", headers={"If-None-Match": tag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers["ETag"], new_tag)
+
+        resp = self.client.delete("/api/v1/authors/1", headers={"If-Match": tag})
+        self.assertEqual(resp.status_code, 412)
+        mock_db.session.delete.assert_not_called()
+
+    @mock.patch("services.author.db")
+    @mock.patch("models.authors.Author.query")
+    def test_no_etag_with_local_cache(self, mock_query, mock_db):
+        """Test that ETags are neither sent nor checked when writes of other processes are not seen"""
+        mock_query.get.return_value = self.author_obj_sample
+        mock_db.session.get.return_value = self.author_obj_sample
+        cache.delete("author[1]")
+        resp = self.client.get("/api/v1/authors/1", headers={"If-None-Match": "*"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp.headers)
+
+        resp = self.client.put("/api/v1/authors/1", headers={"If-Match": '"outdated"'},
+            data=json.dumps(self.author_dict_sample), content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp.headers)
+
+    @mock.patch("services.etag.versions_shared", return_value=True)
+    @mock.patch("models.books.Book.query")
+    def test_list_books_etag(self, mock_query, _):
+        """Test conditional GET of the book list, and that each list variant has its own ETag"""
+        mock_query.all.return_value = self.__saved_books()
+        tag = self.client.get("/api/v1/books").headers["ETag"]
+        self.assertNotEqual(self.client.get("/api/v1/books?sort=title").headers["ETag"], tag)
+
+        resp = self.client.get("/api/v1/books", headers={"If-None-Match": f'"other", {tag}'})
+        self.assertEqual(resp.status_code, 304)
+        cache.invalidate("books")
+        resp = self.client.get("/api/v1/books", headers={"If-None-Match": tag})
+        self.assertEqual(resp.status_code, 200)
+
     @mock.patch("models.authors.Author.query")
     def test_get_author_not_found(self, mock_query):
         """Test GET non-existing author, should return 404"""
@@ -214,6 +340,7 @@ class TestApp(TestCase):
         body = json.loads(resp.get_data(as_text=True))
         mock_query.get.assert_called_with(1)
         self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.content_type, "application/json")
         self.assertEqual(body["data"], None)
 
     @mock.patch("services.author.db")
@@ -244,6 +371,7 @@ class TestApp(TestCase):
     def test_put_author_success(self, mock_db, mock_query):
         """Test PUT author, should return 200 on successful"""
         mock_query.get.return_value = self.author_obj_sample
+        mock_db.session.get.return_value = self.author_obj_sample
         cache.delete("author[1]")
         resp = self.client.put("/api/v1/authors/1",
             data=json.dumps(self.author_dict_sample),
@@ -273,6 +401,7 @@ class TestApp(TestCase):
     def test_delete_author_success(self, mock_query, mock_db):
         """Test DELETE author, should return 200 on successful"""
         mock_query.get.return_value = self.author_obj_sample
+        mock_db.session.get.return_value = self.author_obj_sample
         cache.delete("author[1]")
         resp = self.client.delete("/api/v1/authors/1")
         mock_db.session.delete.assert_called_once()
@@ -293,16 +422,18 @@ class TestApp(TestCase):
     @mock.patch("models.authors.Author.query")
     def test_get_books_from_author_success(self, mock_query):
         """Test GET list of books from particular author, should return 200 on successful"""
-        mock_query.get.return_value = self.author_obj_sample
+        mock_query.options.return_value.get.return_value = self.author_obj_sample
         cache.delete("author[1]")
+        cache.delete("books_from[1]")
         resp = self.client.get("/api/v1/authors/1/books")
         self.assertEqual(resp.status_code, 200)
 
     @mock.patch("models.authors.Author.query")
     def test_get_books_from_author_failed(self, mock_query):
         """Test GET list of books from non existing author, should return 404"""
-        mock_query.get.return_value = None
+        mock_query.options.return_value.get.return_value = None
         cache.delete("author[1]")
+        cache.delete("books_from[1]")
         resp = self.client.get("/api/v1/authors/1/books")
         self.assertEqual(resp.status_code, 404)
 
@@ -317,6 +448,229 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(body["data"], expected_data)
 
+    @mock.patch("models.books.Book.query")
+    def test_list_books_paginated(self, mock_query):
+        """Test GET a page of books, should return the page and the cursor of the next one"""
+        saved_books = self.__saved_books()
+        for i, book in enumerate(saved_books):
+            book.id = i + 1
+        mock_query.order_by.return_value.limit.return_value.all.return_value = saved_books
+        cache.invalidate("books")
+        resp = self.client.get("/api/v1/books?limit=2")
+        body = json.loads(resp.get_data(as_text=True))
+        mock_query.order_by.return_value.limit.assert_called_once_with(3)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(body["data"], [b.to_dict() for b in saved_books[:2]])
+        self.assertTrue(body["meta"]["next_cursor"])
+
+        page = mock_query.filter.return_value.order_by.return_value.limit.return_value
+        page.all.return_value = saved_books[2:]
+        resp = self.client.get(f"/api/v1/books?limit=2&cursor={body['meta']['next_cursor']}")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(body["data"], [saved_books[2].to_dict()])
+        self.assertIsNone(body["meta"]["next_cursor"])
+
+        # pages are cached separately
+        self.client.get("/api/v1/books?limit=2")
+        mock_query.order_by.return_value.limit.assert_called_once_with(3)
+
+    @mock.patch("models.books.Book.query")
+    def test_list_books_streamed(self, mock_query):
+        """Test GET all books as a stream, should return the same body as the whole list"""
+        saved_books = self.__saved_books()
+        mock_query.order_by.return_value.yield_per.return_value = iter(saved_books)
+        resp = self.client.get("/api/v1/books?stream=1")
+        body = json.loads(resp.get_data(as_text=True))
+        mock_query.all.assert_not_called()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content_type, "application/json")
+        self.assertEqual(body["data"], [b.to_dict() for b in saved_books])
+
+    @mock.patch("models.authors.Author.query")
+    def test_get_books_from_author_streamed_not_found(self, mock_query):
+        """Test GET books of non existing author as a stream, should return 404"""
+        mock_query.get.return_value = None
+        resp = self.client.get("/api/v1/authors/1/books?stream=1")
+        self.assertEqual(resp.status_code, 404)
+
+    @mock.patch("models.books.Book.query")
+    def test_list_books_fields(self, mock_query):
+        """Test GET books with ?fields=, should select and return only those fields"""
+        mock_query.with_entities.return_value.all.return_value = self.__saved_books()
+        cache.invalidate("books")
+        resp = self.client.get("/api/v1/books?fields=title,id")
+        body = json.loads(resp.get_data(as_text=True))
+        mock_query.all.assert_not_called()
+        mock_query.with_entities.assert_called_once_with(Book.id, Book.title)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(body["data"], [{"id": b.id, "title": b.title} for b in self.__saved_books()])
+
+        # projections are cached separately from the full list
+        mock_query.all.return_value = self.__saved_books()
+        body = json.loads(self.client.get("/api/v1/books").get_data(as_text=True))
+        mock_query.all.assert_called_once()
+        self.assertIn("description", body["data"][0])
+
+        resp = self.client.get("/api/v1/books?fields=id,isbn")
+        self.assertEqual(resp.status_code, 400)
+
+    @mock.patch("models.books.Book.query")
+    def test_list_books_filtered(self, mock_query):
+        """Test GET books with filters and sort, should filter and order in the query"""
+        mock_query.filter.return_value.filter.return_value.order_by.return_value.all.return_value = \
+            self.__saved_books()[:1]
+        cache.invalidate("books")
+        resp = self.client.get("/api/v1/books?author_id=1&title_prefix=Title&sort=-publish_date")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(body["data"], [self.__saved_books()[0].to_dict()])
+        self.assertEqual(mock_query.filter.call_count, 1)
+        mock_query.all.assert_not_called()
+
+        for url in ["/api/v1/books?author_id=x", "/api/v1/books?published_from=2000-13-01",
+                    "/api/v1/books?sort=description", "/api/v1/authors?born_to=x"]:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 400, url)
+
+    @mock.patch("services.search.db")
+    @mock.patch("models.books.Book.query")
+    def test_search_books(self, mock_query, mock_db):
+        """Test GET /books/search, should return matching books best first"""
+        saved_books = self.__saved_books()
+        saved_books[1].title = "Some Other Title"
+        for i, book in enumerate(saved_books):
+            book.id = i + 1
+        mock_db.session.query.return_value.yield_per.return_value = saved_books
+        mock_query.filter.return_value.all.return_value = saved_books
+        searchservice.books.ready = False
+
+        resp = self.client.get("/api/v1/books/search?q=other+title")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([b["id"] for b in body["data"]], [2, 1, 3])
+        self.assertIn("score", body["data"][0])
+
+        # later writes update the index without rebuilding it
+        book = Book(1, "Unique", "some desc", datetime.datetime(2000, 1, 1))
+        book.id = 4
+        searchservice.index_book(book)
+        mock_query.filter.return_value.all.return_value = [book]
+        body = json.loads(self.client.get("/api/v1/books/search?q=unique").get_data(as_text=True))
+        self.assertEqual([b["id"] for b in body["data"]], [4])
+        mock_db.session.query.assert_called_once()
+
+        for url in ["/api/v1/books/search", "/api/v1/books/search?q=x&limit=0", "/api/v1/authors/search?q="]:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+    @mock.patch("services.etag.versions_shared", return_value=True)
+    @mock.patch("services.compression.compress", wraps=compress)
+    @mock.patch("models.books.Book.query")
+    def test_list_books_compressed(self, mock_query, mock_compress, _):
+        """Test GET big book list with Accept-Encoding, should be compressed once and then served from cache"""
+        saved_books = self.__saved_books() * 20
+        mock_query.all.return_value = saved_books
+        cache.invalidate("books")
+        plain = self.client.get("/api/v1/books")
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(plain.headers["Vary"], "Accept-Encoding")
+
+        for _ in range(2):
+            resp = self.client.get("/api/v1/books", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(resp.get_data()), plain.get_data())
+            self.assertLess(len(resp.get_data()), len(plain.get_data()))
+        mock_compress.assert_called_once()
+
+        # each content coding has its own ETag, any of them is a valid If-None-Match
+        tag = resp.headers["ETag"]
+        self.assertNotEqual(tag, plain.headers["ETag"])
+        resp = self.client.get("/api/v1/books", headers={"If-None-Match": tag, "Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, 304)
+
+    @mock.patch("services.compression.compress", wraps=compress)
+    @mock.patch("models.books.Book.query")
+    def test_compressed_without_etag(self, mock_query, mock_compress):
+        """Test GET big book list with Accept-Encoding and no ETags, should still be compressed once"""
+        mock_query.all.return_value = self.__saved_books() * 20
+        cache.invalidate("books")
+        for _ in range(2):
+            resp = self.client.get("/api/v1/books", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+            self.assertNotIn("ETag", resp.headers)
+        mock_compress.assert_called_once()
+
+        # a new body is compressed again
+        cache.invalidate("books")
+        mock_query.all.return_value = self.__saved_books() * 10
+        resp = self.client.get("/api/v1/books", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(len(json.loads(gzip.decompress(resp.get_data()))["data"]), len(self.__saved_books()) * 10)
+        self.assertEqual(mock_compress.call_count, 2)
+
+    @mock.patch("models.authors.Author.query")
+    def test_small_response_not_compressed(self, mock_query):
+        """Test GET small response with Accept-Encoding, should not be compressed"""
+        mock_query.get.return_value = self.author_obj_sample
+        cache.delete("author[1]")
+        resp = self.client.get("/api/v1/authors/1", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Content-Encoding", resp.headers)
+
+    def test_list_invalid_page(self):
+        """Test GET a list with invalid limit or cursor, should return 400"""
+        for url in ["/api/v1/authors?limit=0", "/api/v1/books?limit=abc",
+                    "/api/v1/books?limit=100000", "/api/v1/authors/1/books?cursor=%21%21"]:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 400, url)
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    @mock.patch("models.authors.Author.query")
+    @mock.patch("models.books.Book.query")
+    def test_list_books_invalidated(self, mock_book, mock_author, mock_db, mock_ids_db):
+        """Test book lists are cached, and reloaded after a book of the author is added"""
+        mock_book.all.return_value = self.__saved_books()
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        mock_author.get.return_value = self.author_obj_sample
+        mock_author_books = mock_author.options.return_value
+        mock_author_books.get.return_value = self.author_obj_sample
+        cache.delete("book[]")
+        cache.delete("books_from[1]")
+        self.client.get("/api/v1/books")
+        self.client.get("/api/v1/authors/1/books")
+        self.client.get("/api/v1/books")
+        self.client.get("/api/v1/authors/1/books")
+        mock_book.all.assert_called_once()
+        self.assertEqual(mock_author_books.get.call_count, 1)
+
+        self.client.post("/api/v1/books",
+            data=json.dumps(self.book_dict_sample),
+            content_type="application/json")
+        self.client.get("/api/v1/books")
+        self.client.get("/api/v1/authors/1/books")
+        self.assertEqual(mock_book.all.call_count, 2)
+        self.assertEqual(mock_author_books.get.call_count, 2)
+        mock_author_books.get.assert_called_with(1)
+
+    @mock.patch("services.export.db")
+    def test_export_books(self, mock_db):
+        """Test GET books as NDJSON and CSV, read in partitions of plain rows"""
+        rows = [(i, 1, f"Title {i}", "Some Description", datetime.datetime(2000, 1, i)) for i in range(1, 4)]
+        mock_db.session.execute.return_value.partitions.return_value = [rows[:2], rows[2:]]
+        resp = self.client.get("/api/v1/books/export?author_id=1&id_from=1")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content_type, "application/x-ndjson")
+        lines = resp.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [1, 2, 3])
+        self.assertEqual(json.loads(lines[0])["publish_date"], "2000-01-01 00:00:00")
+        mock_db.session.execute.return_value.close.assert_called_once()
+
+        resp = self.client.get("/api/v1/books/export?format=csv")
+        self.assertEqual(resp.content_type, "text/csv; charset=utf-8")
+        self.assertEqual(resp.get_data(as_text=True).splitlines()[0], "id,author_id,title,description,publish_date")
+
+        for url in ["/api/v1/books/export?format=xml", "/api/v1/books/export?id_to=x"]:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
     @mock.patch("models.books.Book.query")
     def test_get_book_success(self, mock_query):
         """Test GET book by id, should return 200 when successful"""
@@ -329,6 +683,29 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(body["data"], expected_data)
 
+    @mock.patch("models.books.Book.query")
+    def test_get_book_cached(self, mock_query):
+        """Test GET book twice, second response should be served from cache without a query"""
+        mock_query.get.return_value = self.book_obj_sample
+        cache.delete("book[1]")
+        first = self.client.get("/api/v1/books/1")
+        second = self.client.get("/api/v1/books/1")
+        mock_query.get.assert_called_once_with(1)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_data(), first.get_data())
+
+    @mock.patch("models.books.Book.query")
+    def test_book_bulk_load(self, mock_query):
+        """Test bulk loading cache bodies for warm-up, one query per key kind"""
+        mock_query.all.return_value = self.__saved_books()
+        mock_query.filter.return_value.all.return_value = [self.book_obj_sample]
+        self.book_obj_sample.id = 1
+        bodies = books.bulk_load(["book[]", "book[1]", "book[2]", "author[1]"])
+        self.assertEqual(sorted(bodies.keys()), ["book[1]", "book[]"])
+        self.assertEqual(json.loads(bodies["book[1]"])["data"], self.book_obj_sample.to_dict())
+        mock_query.all.assert_called_once()
+        mock_query.filter.assert_called_once()
+
     @mock.patch("models.books.Book.query")
     def test_get_book_not_found(self, mock_query):
         """Test GET non-existing book, should return 404"""
@@ -340,11 +717,31 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 404)
         self.assertEqual(body["data"], None)
 
-    @mock.patch("services.book.db")
+    @mock.patch("services.author.db")
     @mock.patch("models.authors.Author.query")
-    def test_post_book_success(self, mock_author, mock_db):
+    def test_get_author_negative_cache(self, mock_query, mock_db):
+        """Test GET missing author is answered from cache until the author is created"""
+        mock_query.get.return_value = None
+        cache.delete("author[2]")
+        self.assertEqual(self.client.get("/api/v1/authors/2").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/authors/2").status_code, 404)
+        mock_query.get.assert_called_once_with(2)
+
+        def add(author):
+            author.id = 2
+        mock_db.session.add.side_effect = add
+        self.client.post("/api/v1/authors",
+            data=json.dumps(self.author_dict_sample),
+            content_type="application/json")
+        mock_query.get.return_value = self.author_obj_sample
+        self.assertEqual(self.client.get("/api/v1/authors/2").status_code, 200)
+        self.assertEqual(mock_query.get.call_count, 2)
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    def test_post_book_success(self, mock_db, mock_ids_db):
         """Test POST book, should return 200 when successful"""
-        mock_author.get.return_value = self.author_obj_sample
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
         resp = self.client.post("/api/v1/books",
             data=json.dumps(self.book_dict_sample),
             content_type="application/json")
@@ -352,6 +749,120 @@ class TestApp(TestCase):
         mock_db.session.commit.assert_called_once()
         self.assertEqual(resp.status_code, 200)
 
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    def test_post_book_author_id_string(self, mock_db, mock_ids_db):
+        """Test POST book with a numeric string author_id, should return 200 like an integer"""
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        resp = self.client.post("/api/v1/books",
+            data=json.dumps({**self.book_dict_sample, "author_id": "1"}),
+            content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(mock_db.session.add.call_args[0][0].author_id, 1)
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    def test_post_book_known_author(self, mock_db, mock_ids_db):
+        """Test POST books of the same author, its existence is queried only once"""
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        for _ in range(3):
+            resp = self.client.post("/api/v1/books",
+                data=json.dumps(self.book_dict_sample),
+                content_type="application/json")
+            self.assertEqual(resp.status_code, 200)
+        mock_ids_db.session.query.assert_called_once()
+        self.assertEqual(mock_db.session.commit.call_count, 3)
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    def test_post_book_deleted_author(self, mock_db, mock_ids_db):
+        """Test POST book of a known author deleted by another process, the foreign key rejects it"""
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        authorids.existing({1})
+        mock_db.session.commit.side_effect = IntegrityError("INSERT", {}, Exception("FOREIGN KEY"))
+        resp = self.client.post("/api/v1/books",
+            data=json.dumps(self.book_dict_sample),
+            content_type="application/json")
+        body = json.loads(resp.get_data(as_text=True))
+        mock_db.session.rollback.assert_called_once()
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(body["meta"]["message"], "Author ID '1' is not in database")
+        # the author is looked up again by the next write
+        authorids.existing({1})
+        self.assertEqual(mock_ids_db.session.query.call_count, 2)
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.bulk_insert")
+    @mock.patch("services.book.db")
+    def test_post_books_batch(self, mock_db, mock_insert, mock_ids_db):
+        """Test POST a batch of books, valid ones are inserted and invalid ones reported"""
+        def insert(session, model, objs, columns):
+            for i, obj in enumerate(objs):
+                obj.id = 10 + i
+
+        mock_insert.side_effect = insert
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        items = [self.book_dict_sample, {**self.book_dict_sample, "title": ""},
+            {**self.book_dict_sample, "author_id": 2}, self.book_dict_sample]
+        resp = self.client.post("/api/v1/books:batch", data=json.dumps(items), content_type="application/json")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        mock_insert.assert_called_once()
+        mock_db.session.commit.assert_called_once()
+        self.assertEqual([book["id"] for book in body["data"]["created"]], [10, 11])
+        self.assertEqual(body["data"]["errors"], [
+            {"index": 1, "message": "Title cannot be empty"},
+            {"index": 2, "message": "Author ID '2' is not in database"},
+        ])
+
+    @mock.patch("services.author.bulk_insert")
+    @mock.patch("services.author.db")
+    def test_post_authors_batch(self, mock_db, mock_insert):
+        """Test POST a batch of authors, valid ones are inserted and invalid ones reported"""
+        def insert(session, model, objs, columns):
+            for i, obj in enumerate(objs):
+                obj.id = 10 + i
+
+        mock_insert.side_effect = insert
+        items = [self.author_dict_sample, {"name": "x"}, self.author_dict_sample]
+        resp = self.client.post("/api/v1/authors:batch", data=json.dumps(items), content_type="application/json")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        mock_db.session.commit.assert_called_once()
+        self.assertEqual([author["id"] for author in body["data"]["created"]], [10, 11])
+        self.assertEqual(body["data"]["errors"], [{"index": 1, "message": "Missing 'bio'"}])
+
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.bulk_insert")
+    @mock.patch("services.book.db")
+    def test_import_books(self, mock_db, mock_insert, mock_ids_db):
+        """Test POST books as NDJSON and CSV, rows are inserted and invalid ones reported"""
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+        ndjson = "\n".join(json.dumps(item) for item in [self.book_dict_sample, {**self.book_dict_sample, "author_id": 2}])
+        resp = self.client.post("/api/v1/books:import", data=ndjson, content_type="application/x-ndjson")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(body["data"], {"checkpoint": 2, "created": 1, "failed": 1,
+            "errors": [{"record": 2, "message": "Author ID '2' is not in database"}]})
+
+        csv = "author_id,title,description,publish_date\n1,Some Title,Some Description,2000-01-01\n"
+        resp = self.client.post("/api/v1/books:import?skip=0", data=csv, content_type="text/csv")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(body["data"]["created"], 1)
+        self.assertEqual(mock_insert.call_count, 2)
+        self.assertEqual(mock_db.session.commit.call_count, 2)
+
+        resp = self.client.post("/api/v1/books:import", data=csv, content_type="text/plain")
+        self.assertEqual(resp.status_code, 415)
+
+    @mock.patch("services.book.db")
+    def test_post_books_batch_invalid(self, mock_db):
+        """Test POST a batch that is not a list or is empty, should return 400"""
+        for data in ({}, [], [self.book_dict_sample] * 1001):
+            resp = self.client.post("/api/v1/books:batch", data=json.dumps(data), content_type="application/json")
+            self.assertEqual(resp.status_code, 400)
+        mock_db.session.commit.assert_not_called()
+
     @mock.patch("services.book.db")
     def test_post_book_validation_failed(self, mock_db):
         """Test POST book with invalid parameters, should return 400"""
@@ -365,11 +876,11 @@ class TestApp(TestCase):
             self.assertEqual(resp.status_code, 400, p["desc"])
             self.assertEqual(body["meta"]["message"], p["message"], p["desc"])
 
+    @mock.patch("services.authorids.db")
     @mock.patch("services.book.db")
-    @mock.patch("models.authors.Author.query")
-    def test_post_book_invalid_author(self, mock_author, mock_db):
+    def test_post_book_invalid_author(self, mock_db, mock_ids_db):
         """Test POST book with invalid author, should return 400"""
-        mock_author.get.return_value = None
+        mock_ids_db.session.query.return_value.filter.return_value = []
         resp = self.client.post("/api/v1/books",
             data=json.dumps(self.book_dict_sample),
             content_type="application/json")
@@ -379,13 +890,14 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 400)
         self.assertEqual(body["meta"]["message"], "Author ID '1' is not in database")
 
+    @mock.patch("services.authorids.db")
     @mock.patch("services.book.db")
-    @mock.patch("models.authors.Author.query")
     @mock.patch("models.books.Book.query")
-    def test_put_book_success(self, mock_book, mock_author, mock_db):
+    def test_put_book_success(self, mock_book, mock_db, mock_ids_db):
         """Test PUT book, should return 200 when successful"""
         mock_book.get.return_value = self.book_obj_sample
-        mock_author.get.return_value = self.author_obj_sample
+        mock_db.session.get.return_value = self.book_obj_sample
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
         cache.delete("book[1]")
         resp = self.client.put("/api/v1/books/1",
             data=json.dumps(self.book_dict_sample),
@@ -393,13 +905,13 @@ class TestApp(TestCase):
         mock_db.session.commit.assert_called_once()
         self.assertEqual(resp.status_code, 200)
 
+    @mock.patch("services.authorids.db")
     @mock.patch("services.book.db")
-    @mock.patch("models.authors.Author.query")
     @mock.patch("models.books.Book.query")
-    def test_put_book_validation_failed(self, mock_book, mock_author, mock_db):
+    def test_put_book_validation_failed(self, mock_book, mock_db, mock_ids_db):
         """Test PUT book with invalid parameters, should return 400"""
         mock_book.get.return_value = self.book_obj_sample
-        mock_author.get.return_value = self.author_obj_sample
+        mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
         for p in self.__invalid_book_params():
             cache.delete("book[1]")
             resp = self.client.put("/api/v1/books/1",
@@ -411,13 +923,13 @@ class TestApp(TestCase):
             self.assertEqual(resp.status_code, 400, p["desc"])
             self.assertEqual(body["meta"]["message"], p["message"], p["desc"])
 
+    @mock.patch("services.authorids.db")
     @mock.patch("services.book.db")
-    @mock.patch("models.authors.Author.query")
     @mock.patch("models.books.Book.query")
-    def test_put_book_invalid_author(self, mock_book, mock_author, mock_db):
+    def test_put_book_invalid_author(self, mock_book, mock_db, mock_ids_db):
         """Test PUT book with invalid author, should return 400"""
         mock_book.get.return_value = self.book_obj_sample
-        mock_author.get.return_value = None
+        mock_ids_db.session.query.return_value.filter.return_value = []
         cache.delete("book[1]")
         resp = self.client.put("/api/v1/books/1",
             data=json.dumps(self.book_dict_sample),
@@ -432,12 +944,67 @@ class TestApp(TestCase):
     def test_delete_book_success(self, mock_query, mock_db):
         """Test DELETE book, should return 200 when successful"""
         mock_query.get.return_value = self.book_obj_sample
+        mock_db.session.get.return_value = self.book_obj_sample
         cache.delete("book[1]")
         resp = self.client.delete("/api/v1/books/1")
         mock_db.session.delete.assert_called_once()
         mock_db.session.commit.assert_called_once()
         self.assertEqual(resp.status_code, 200)
 
+    @mock.patch("services.authorids.db")
+    @mock.patch("services.book.db")
+    @mock.patch("services.author.db")
+    @mock.patch("models.books.Book.query")
+    @mock.patch("models.authors.Author.query")
+    def test_writes_with_group_commit(self, mock_author, mock_book, mock_db, mock_book_db,
+            mock_ids_db):
+        """Test POST, PUT and DELETE with group commit, the writes are committed by the group
+        and the request session is closed before waiting for it"""
+        with tempfile.TemporaryDirectory() as dir:
+            engine = create_engine("sqlite:///" + os.path.join(dir, "test.db"))
+            db.metadata.create_all(engine)
+            group = GroupCommit(lambda: Session(engine, expire_on_commit=False), max_delay=0,
+                context=app.app_context)
+            mock_author.get.return_value = self.author_obj_sample
+            mock_book.get.return_value = self.book_obj_sample
+            mock_ids_db.session.query.return_value.filter.return_value = [mock.Mock(id=1)]
+            try:
+                with mock.patch("services.app.group_commit", group):
+                    resp = self.client.post("/api/v1/authors",
+                        data=json.dumps(self.author_dict_sample),
+                        content_type="application/json")
+                    self.assertEqual(resp.status_code, 200)
+                    resp = self.client.put("/api/v1/authors/1",
+                        data=json.dumps({**self.author_dict_sample, "name": "othername"}),
+                        content_type="application/json")
+                    self.assertEqual(resp.status_code, 200)
+                    resp = self.client.post("/api/v1/books",
+                        data=json.dumps(self.book_dict_sample),
+                        content_type="application/json")
+                    self.assertEqual(resp.status_code, 200)
+                    resp = self.client.put("/api/v1/books/1",
+                        data=json.dumps({**self.book_dict_sample, "title": "Other Title"}),
+                        content_type="application/json")
+                    self.assertEqual(resp.status_code, 200)
+                    with Session(engine) as session:
+                        self.assertEqual(session.get(Author, 1).name, "othername")
+                        self.assertEqual(session.get(Book, 1).title, "Other Title")
+                    resp = self.client.delete("/api/v1/books/1")
+                    self.assertEqual(resp.status_code, 200)
+                    resp = self.client.delete("/api/v1/authors/1")
+                    self.assertEqual(resp.status_code, 200)
+                    with Session(engine) as session:
+                        self.assertEqual(session.query(Author).count(), 0)
+                        self.assertEqual(session.query(Book).count(), 0)
+            finally:
+                group.close()
+                engine.dispose()
+        for session in (mock_db.session, mock_book_db.session):
+            session.commit.assert_not_called()
+            self.assertGreaterEqual(session.close.call_count, 2)
+        cache.delete("author[1]")
+        cache.delete("book[1]")
+
     @mock.patch("services.book.db")
     @mock.patch("models.books.Book.query")
     def test_delete_book_failed(self, mock_query, mock_db):
@@ -451,8 +1018,10 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 404)
         self.assertEqual(body["meta"]["message"], "Book ID '1' cannot be found")
 
-    def test_non_json_body(self):
+    @mock.patch("models.authors.Author.query")
+    def test_non_json_body(self, mock_query):
         """Test POST/PUT without content type being application/json, should return 415"""
+        mock_query.get.return_value = self.author_obj_sample
         resp = self.client.post("/api/v1/authors")
         body = json.loads(resp.get_data(as_text=True))
         self.assertEqual(resp.status_code, 415)
@@ -463,8 +1032,10 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 415)
         self.assertEqual(body["meta"]["message"], "Content type must be 'application/json'")
 
-    def test_invalid_json_body(self):
+    @mock.patch("models.authors.Author.query")
+    def test_invalid_json_body(self, mock_query):
         """Test POST/PUT with invalid json body, should return 400"""
+        mock_query.get.return_value = self.author_obj_sample
         resp = self.client.post("/api/v1/authors", data="{", content_type="application/json")
         body = json.loads(resp.get_data(as_text=True))
         self.assertEqual(resp.status_code, 400)
@@ -475,6 +1046,22 @@ class TestApp(TestCase):
         self.assertEqual(resp.status_code, 400)
         self.assertEqual(body["meta"]["message"], "Invalid JSON body")
 
+    @mock.patch("models.books.Book.query")
+    def test_cache_stats(self, mock_query):
+        """Test cache stats, should return 200 with counters per namespace"""
+        mock_query.get.return_value = self.book_obj_sample
+        cache.delete("book[1]")
+        self.client.get("/api/v1/books/1")
+        self.client.get("/api/v1/books/1")
+        resp = self.client.get("/admin/cache")
+        body = json.loads(resp.get_data(as_text=True))
+        self.assertEqual(resp.status_code, 200)
+        book_stats = body["data"]["namespaces"]["book"]
+        self.assertGreaterEqual(book_stats["hits"], 1)
+        self.assertGreaterEqual(book_stats["misses"], 1)
+        self.assertGreaterEqual(book_stats["load_ms"]["count"], 1)
+        self.assertIn("hit_rate", body["data"])
+
     def test_ping(self):
         """Test ping, should always return 200"""
         resp = self.client.get("/ping")
@@ -0,0 +1,73 @@
+"""Make sure list filters and sort orders are served by the indexes of the models"""
+
+import unittest
+from sqlalchemy import create_engine, select
+from app import app  # pylint: disable=unused-import
+from services.app import db
+from services import author, book
+from libs.filtering import Filters
+from libs.pagination import Page, Sort
+from models.authors import Author
+from models.books import Book
+
+
+class TestQueryPlan(unittest.TestCase):
+    """EXPLAIN QUERY PLAN of list queries on a separate SQLite database"""
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        db.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def plan(self, stmt):
+        compiled = stmt.compile(self.engine)
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), tuple(compiled.params.values()))
+            return " | ".join(row[-1] for row in rows)
+
+    def list_stmt(self, model, filters, args):
+        stmt = Filters.from_args(args, filters).apply(select(model))
+        sort = Sort.from_args(args, author.SORTS if model is Author else book.SORTS)
+        page = Page.from_args(args, sort)
+        if sort is not None:
+            stmt = stmt.order_by(*sort.order_by(model.id))
+            if page is not None and page.after is not None:
+                stmt = stmt.filter(sort.after(model.id, page.after))
+        return stmt
+
+    def assert_index(self, model, filters, args, index):
+        plan = self.plan(self.list_stmt(model, filters, args))
+        self.assertIn(f"INDEX {index}", plan, f"{args}: {plan}")
+        self.assertNotIn("TEMP B-TREE", plan, f"{args}: {plan}")
+        if "sort" not in args or "cursor" in args:
+            # filters and cursors seek in the index instead of scanning it
+            self.assertTrue(plan.startswith("SEARCH"), f"{args}: {plan}")
+
+    def test_book_filters(self):
+        examples = [
+            ({"author_id": "3"}, "ix_books_author_id_id"),
+            ({"published_from": "2000-01-01", "published_to": "2000-12-31"}, "ix_books_publish_date_id"),
+            ({"title_prefix": "Harry"}, "ix_books_title_id"),
+            ({"sort": "title"}, "ix_books_title_id"),
+            ({"sort": "-publish_date"}, "ix_books_publish_date_id"),
+            ({"sort": "title", "cursor": "WyJIYXJyeSIsMTJd"}, "ix_books_title_id"),
+        ]
+        for args, index in examples:
+            self.assert_index(Book, book.FILTERS, args, index)
+
+    def test_author_filters(self):
+        examples = [
+            ({"born_from": "1950-01-01"}, "ix_authors_birth_date_id"),
+            ({"name_prefix": "Jo"}, "ix_authors_name_id"),
+            ({"sort": "-name"}, "ix_authors_name_id"),
+            ({"sort": "birth_date"}, "ix_authors_birth_date_id"),
+        ]
+        for args, index in examples:
+            self.assert_index(Author, author.FILTERS, args, index)
+
+    def test_books_from_author_page(self):
+        stmt = select(Book).filter(Book.author_id == 3, Book.id > 10).order_by(Book.id).limit(20)
+        plan = self.plan(stmt)
+        self.assertIn("INDEX ix_books_author_id_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)